@@ -518,7 +518,7 @@ def emulate(conn_mat, scaling, n_gpus, steps, use_mps, cache_file='cache.db'):
 
 if __name__ == '__main__':
     import neurokernel.mpi_relaunch
-    import get_index_order
+    from neurokernel.tools.graph import greedy_order
 
     conn_mat_file = 's2.xlsx'
     scaling = 1
@@ -566,7 +566,7 @@ if __name__ == '__main__':
 
     # Get order in which LPUs (denoted by index into `conn_mat`) should be added
     # to maximize added number of ports for each additional LPU:
-    ind_order = get_index_order.get_index_order(conn_mat)
+    ind_order = greedy_order(conn_mat)
 
     # Make sure specified number of LPUs to partition over GPUs is at least as
     # large as the number of GPUs and no larger than the list of allowed LPUs
@@ -10,3 +10,10 @@ try:
     from version import __version__
 except:
     pass
+
+# MPI is only initialized when it is used (see neurokernel.tools.mpi.init()) so
+# that the multiprocessing backend can fork processes before MPI has been
+# initialized, which Open MPI does not support; this has no effect if mpi4py.MPI
+# has already been imported:
+import mpi4py
+mpi4py.rc.initialize = False
@@ -5,11 +5,17 @@ Core Neurokernel classes.
 """
 
 import atexit
+import collections
+import hashlib
 import time
+import uuid
+from timeit import default_timer
 
 import bidict
+from concurrent.futures import ProcessPoolExecutor
 from mpi4py import MPI
 import numpy as np
+import pandas as pd
 import pycuda.gpuarray as gpuarray
 import twiggy
 from random import randint
@@ -21,7 +27,10 @@ import mpi
 from tools.gpu import bufint, set_by_inds, set_by_inds_from_inds
 from tools.logging import setup_logger
 from tools.misc import catch_exception, dtype_to_mpi, renumber_in_order
-from tools.mpi import MPIOutput
+from tools.mpi import MPIOutput, finalize as finalize_mpi, \
+    init as init_mpi
+from tools.shm import SharedLink, supported as shm_supported
+from tools.timing import LogHistogram, Tracer, write_chrome_trace
 from pattern import Interface, Pattern
 from plsel import Selector, SelectorMethods
 from pm import BasePortMapper
@@ -35,6 +44,149 @@ CTRL_TAG = 1
 GPOT_TAG = CTRL_TAG+1
 SPIKE_TAG = CTRL_TAG+2
 
+# Phases of an execution step timed by modules when step statistics are
+# recorded: the execution of run_step(), the copying of output data into the
+# transmission buffers and posting of the transfers, the wait for the
+# transfers to complete, and the copying of received data into the port data
+# arrays:
+STEP_PHASES = ['run_step', 'gather', 'wait', 'scatter']
+
+# Functions registered with atexit by modules; modules run by the processes of
+# a persistent pool must not register the same function more than once:
+_atexit_funcs = set()
+
+def _register_atexit(f):
+    """
+    Register a function with atexit unless it has already been registered.
+    """
+
+    if f not in _atexit_funcs:
+        _atexit_funcs.add(f)
+        atexit.register(f)
+
+def _port_positions(sel):
+    """
+    Map the identifiers comprised by a selector to their positions in it.
+
+    Trailing blank tokens are stripped from the identifiers so that
+    identifiers padded to different numbers of levels can be compared.
+    """
+
+    if SelectorMethods.is_selector_empty(sel):
+        return {}
+    return {_strip_port(t): i for i, t in \
+            enumerate(SelectorMethods.expand(sel))}
+
+def _strip_port(t):
+    """
+    Strip trailing blank tokens from a port identifier.
+    """
+
+    t = tuple(t)
+    while t and t[-1] == '':
+        t = t[:-1]
+    return t
+
+def _ports_digest(ports):
+    """
+    Compute a digest of an ordered sequence of port identifiers.
+
+    Trailing blank tokens are stripped from the identifiers (see
+    `_strip_port()`) and their tokens are compared as strings.
+    """
+
+    h = hashlib.md5()
+    for p in ports:
+        h.update(repr(tuple([str(x) for x in _strip_port(p)])))
+    return h.hexdigest()
+
+def _compile_link_plans(pat, links, sels):
+    """
+    Compile the port indices of the connections defined by a pattern.
+
+    Parameters
+    ----------
+    pat : Pattern
+        Pattern connecting two modules.
+    links : list of tuple
+        Each entry `(src_id, dest_id, int_0, int_1)` describes a connection
+        from the module `src_id` connected to the pattern's interface `int_0`
+        to the module `dest_id` connected to the pattern's interface `int_1`.
+    sels : dict
+        Maps the identifiers of the connected modules to their
+        `(sel_gpot, sel_spike)` selectors.
+
+    Returns
+    -------
+    plans : dict
+        Maps each `(src_id, dest_id)` pair to a dict containing the positions
+        of the connected ports in the source module's port mappers (`src`),
+        the positions of the connected ports in the destination module's port
+        mappers (`dest`), and the positions in the transmitted buffer of the
+        data to copy into the latter (`buf`); each of these maps 'gpot' and
+        'spike' to an int32 array. The numbers of ports assumed to be in the
+        source and destination modules' port mappers are respectively stored
+        in `src_len` and `dest_len`, and digests of their ordered identifiers
+        (see `_ports_digest()`) in `src_digest` and `dest_digest`. If some of
+        the pattern's ports are not in the specified selectors, the plan is
+        set to None.
+    """
+
+    pos = {}
+    digests = {}
+    for id in sels:
+        pos[id] = {'gpot': _port_positions(sels[id][0]),
+                   'spike': _port_positions(sels[id][1])}
+        digests[id] = {t: _ports_digest(sorted(pos[id][t],
+                                               key=pos[id][t].get)) \
+                       for t in ['gpot', 'spike']}
+    plans = {}
+    for src_id, dest_id, int_0, int_1 in links:
+        plan = {'src': {}, 'dest': {}, 'buf': {},
+                'src_len': {}, 'dest_len': {},
+                'src_digest': digests[src_id], 'dest_digest': digests[dest_id]}
+        try:
+            for t in ['gpot', 'spike']:
+                src_pos = pos[src_id][t]
+                dest_pos = pos[dest_id][t]
+                plan['src'][t] = np.array([src_pos[_strip_port(p)] for p in \
+                    pat.src_idx(int_0, int_1, t, t)], dtype=np.int32)
+                plan['dest'][t] = np.array([dest_pos[_strip_port(p)] for p in \
+                    pat.dest_idx(int_0, int_1, t, t)], dtype=np.int32)
+
+                # Map each connection to the position in the transmitted
+                # buffer of its source port's data; this supports fan-out:
+                src_dup = [src_pos[_strip_port(p)] for p in \
+                           pat.src_idx(int_0, int_1, t, t, duplicates=True)]
+                plan['buf'][t] = np.array(renumber_in_order(src_dup),
+                                          dtype=np.int32)
+                plan['src_len'][t] = len(src_pos)
+                plan['dest_len'][t] = len(dest_pos)
+        except KeyError:
+            plan = None
+        plans[(src_id, dest_id)] = plan
+    return plans
+
+def _port_list(k, doc):
+    """
+    Create a property returning the identifiers of a class of module ports.
+
+    The list of identifiers is constructed from the rows of the ports in the
+    module's interface when first accessed.
+    """
+
+    def fget(self):
+        if k not in self._port_tuples:
+            idx = self.interface.index[self._port_rows[k]]
+            if idx.nlevels == 1:
+                self._port_tuples[k] = [(x,) for x in idx]
+            else:
+                self._port_tuples[k] = idx.tolist()
+        return self._port_tuples[k]
+    def fset(self, value):
+        self._port_tuples[k] = value
+    return property(fget, fset, doc=doc)
+
 class Module(mpi.Worker):
     """
     Processing module.
@@ -90,8 +242,46 @@ class Module(mpi.Worker):
     data : dict
         `data['gpot']` and `data['spike']` are arrays of data associated with 
         a module's graded potential and spiking ports.
+    batch_shape : tuple
+        Shape of the data associated with each port; always `()` because
+        replicas of the module's data (see `neurokernel.core.Module`) are not
+        supported on the GPU.
+    in_ports, out_ports, gpot_ports, spike_ports : list of tuple
+        Identifiers of the module's input, output, graded potential, and
+        spiking ports.
+    in_gpot_ports, in_spike_ports, out_gpot_ports, out_spike_ports : list of tuple
+        Identifiers of the module's input and output graded potential and
+        spiking ports.
+    in_gpot_inds, in_spike_inds, out_gpot_inds, out_spike_inds : numpy.ndarray
+        Positions of the module's input and output graded potential and
+        spiking ports in `pm['gpot']` and `pm['spike']`.
+    sync_flush_steps : int
+        Number of execution steps for which synchronization timing data is
+        accumulated before it is sent to the manager when `time_sync` is True.
+    record_step_stats : bool
+        If True, the time taken by each of the phases in `STEP_PHASES` is
+        recorded during every execution step; histograms of the recorded times
+        are sent to the manager after the module finishes running.
+    record_link_waits : bool
+        If True, the time between the posting of the receives during each
+        execution step and the arrival of all data from each source module is
+        accumulated in `link_wait_times` (keyed by source module ID) and sent
+        to the manager after the module finishes running.
+    record_comm : bool
+        If True, the number of bytes and messages sent to each destination
+        module is counted and sent to the manager after the module finishes
+        running.
     """
 
+    sync_flush_steps = 1000
+    record_step_stats = False
+    record_link_waits = False
+    record_comm = False
+
+    # Number of execution steps whose phase times are buffered before they are
+    # added to the histograms:
+    _step_stats_steps = 1024
+
     def __init__(self, sel, sel_in, sel_out,
                  sel_gpot, sel_spike, data_gpot, data_spike,
                  columns=['interface', 'io', 'type'],
@@ -123,34 +313,14 @@ class Module(mpi.Worker):
         # This is needed to ensure that MPI_Finalize is called before PyCUDA
         # attempts to clean up; see
         # https://groups.google.com/forum/#!topic/mpi4py/by0Rd5q0Ayw
-        atexit.register(MPI.Finalize)
+        _register_atexit(finalize_mpi)
 
         # Manually register the file close method associated with MPIOutput
         # so that it is called by atexit before MPI.Finalize() (if the file is
         # closed after MPI.Finalize() is called, an error will occur):
         for k, v in twiggy.emitters.iteritems():
              if isinstance(v._output, MPIOutput):       
-                 atexit.register(v._output.close)
-
-        # Ensure that the input and output port selectors respectively
-        # select mutually exclusive subsets of the set of all ports exposed by
-        # the module:
-        if not SelectorMethods.is_in(sel_in, sel):
-            raise ValueError('input port selector not in selector of all ports')
-        if not SelectorMethods.is_in(sel_out, sel):
-            raise ValueError('output port selector not in selector of all ports')
-        if not SelectorMethods.are_disjoint(sel_in, sel_out):
-            raise ValueError('input and output port selectors not disjoint')
-
-        # Ensure that the graded potential and spiking port selectors
-        # respectively select mutually exclusive subsets of the set of all ports
-        # exposed by the module:
-        if not SelectorMethods.is_in(sel_gpot, sel):
-            raise ValueError('gpot port selector not in selector of all ports')
-        if not SelectorMethods.is_in(sel_spike, sel):
-            raise ValueError('spike port selector not in selector of all ports')
-        if not SelectorMethods.are_disjoint(sel_gpot, sel_spike):
-            raise ValueError('gpot and spike port selectors not disjoint')
+                 _register_atexit(v._output.close)
 
         # Save routing table and mapping between MPI ranks and module IDs:
         self.routing_table = routing_table
@@ -173,47 +343,132 @@ class Module(mpi.Worker):
         # Reformat logger name:
         LoggerMixin.__init__(self, 'mod %s' % self.id)
 
-        # Create module interface given the specified ports:
+        # Create module interface given the specified ports and find the
+        # positions of the ports comprised by each of the other selectors in a
+        # single pass:
         self.interface = Interface(sel, columns)
+        rows = {}
+        for k, s in [('in', sel_in), ('out', sel_out),
+                     ('gpot', sel_gpot), ('spike', sel_spike)]:
+            rows[k] = self.interface.get_rows(s)
 
-        # Set the interface ID to 0; we assume that a module only has one interface:
-        self.interface[sel, 'interface'] = 0
-
-        # Set the port attributes:
-        self.interface[sel_in, 'io'] = 'in'
-        self.interface[sel_out, 'io'] = 'out'
-        self.interface[sel_gpot, 'type'] = 'gpot'
-        self.interface[sel_spike, 'type'] = 'spike'
-
-        # Find the input and output ports:
-        self.in_ports = self.interface.in_ports().to_tuples()
-        self.out_ports = self.interface.out_ports().to_tuples()
+        # Ensure that the input and output port selectors respectively
+        # select mutually exclusive subsets of the set of all ports exposed by
+        # the module:
+        N = len(self.interface)
+        mask = {}
+        for k in ['in', 'out', 'gpot', 'spike']:
+            mask[k] = np.zeros(N, dtype=np.bool_)
+            mask[k][rows[k][rows[k] >= 0]] = True
+        if (rows['in'] < 0).any():
+            raise ValueError('input port selector not in selector of all ports')
+        if (rows['out'] < 0).any():
+            raise ValueError('output port selector not in selector of all ports')
+        if (mask['in'] & mask['out']).any():
+            raise ValueError('input and output port selectors not disjoint')
 
-        # Find the graded potential and spiking ports:
-        self.gpot_ports = self.interface.gpot_ports().to_tuples()
-        self.spike_ports = self.interface.spike_ports().to_tuples()
+        # Ensure that the graded potential and spiking port selectors
+        # respectively select mutually exclusive subsets of the set of all ports
+        # exposed by the module:
+        if (rows['gpot'] < 0).any():
+            raise ValueError('gpot port selector not in selector of all ports')
+        if (rows['spike'] < 0).any():
+            raise ValueError('spike port selector not in selector of all ports')
+        if (mask['gpot'] & mask['spike']).any():
+            raise ValueError('gpot and spike port selectors not disjoint')
 
-        self.in_gpot_ports = self.interface.in_ports().gpot_ports().to_tuples()
-        self.in_spike_ports = self.interface.in_ports().spike_ports().to_tuples()
-        self.out_gpot_ports = self.interface.out_ports().gpot_ports().to_tuples()
-        self.out_spike_ports = self.interface.out_ports().spike_ports().to_tuples()
+        # Set the interface ID to 0 (we assume that a module only has one
+        # interface) and the port attributes:
+        df = self.interface.data
+        df['interface'] = np.zeros(N, dtype=object)
+        for c, a, b in [('io', 'in', 'out'), ('type', 'gpot', 'spike')]:
+            v = np.full(N, np.nan, dtype=object)
+            v[mask[a]] = a
+            v[mask[b]] = b
+            df[c] = v
+        self.interface.data = df
+
+        # Find the rows of the ports in each port class; the corresponding
+        # lists of port identifiers are only constructed when accessed:
+        self._port_rows = {}
+        self._port_tuples = {}
+        for k in ['in', 'out', 'gpot', 'spike']:
+            self._port_rows[k] = np.flatnonzero(mask[k])
+        for io in ['in', 'out']:
+            for t in ['gpot', 'spike']:
+                self._port_rows[io+'_'+t] = np.flatnonzero(mask[io] & mask[t])
 
         # Set up mapper between port identifiers and their associated data:
-        if len(data_gpot) != len(self.gpot_ports):
+        if len(data_gpot) != len(rows['gpot']):
             raise ValueError('incompatible gpot port data array length')
-        if len(data_spike) != len(self.spike_ports):
+        if len(data_spike) != len(rows['spike']):
             raise ValueError('incompatible spike port data array length')
+
+        # The GPU kernels that copy data to and from the transmission buffers
+        # only support 1D port data arrays:
+        if np.ndim(data_gpot) != 1 or np.ndim(data_spike) != 1:
+            raise ValueError('port data arrays must be 1D')
+        self.batch_shape = ()
         self.data = {}
         self.data['gpot'] = gpuarray.to_gpu(data_gpot)
         self.data['spike'] = gpuarray.to_gpu(data_spike)
-
         self.pm = {}
-        self.pm['gpot'] = GPUPortMapper(sel_gpot, self.data['gpot'], make_copy=False)
-        self.pm['spike'] = GPUPortMapper(sel_spike, self.data['spike'], make_copy=False)
+        for t in ['gpot', 'spike']:
+            self.pm[t] = GPUPortMapper.from_index(self.interface.index[rows[t]],
+                                                  self.data[t], make_copy=False)
+        self._port_digests = {}
+
+        # Find the positions of the input and output ports in the port mappers:
+        pos = {}
+        for t in ['gpot', 'spike']:
+            pos[t] = np.full(N, -1, dtype=np.int_)
+            pos[t][rows[t]] = np.arange(len(rows[t]))
+        self.in_gpot_inds = pos['gpot'][self._port_rows['in_gpot']]
+        self.in_spike_inds = pos['spike'][self._port_rows['in_spike']]
+        self.out_gpot_inds = pos['gpot'][self._port_rows['out_gpot']]
+        self.out_spike_inds = pos['spike'][self._port_rows['out_spike']]
 
         # MPI Request object for resolving asynchronous transfers:
         self.req = MPI.Request()
 
+    # Port indices of the module's connections compiled by the manager; see
+    # `Manager.compile_link_plans()`:
+    _link_plans = None
+
+    # MPI tags of the graded potential and spiking data transmitted over each
+    # of the module's connections, keyed by `(src_id, dest_id)`, and the MPI
+    # ranks of the processes running each module, keyed by module ID; both
+    # are set by the manager when several modules are run by the same process
+    # (see `ModuleGroup`). If None, all data is transmitted with `GPOT_TAG`
+    # and `SPIKE_TAG` and the ranks are looked up in `rank_to_id`:
+    _link_tags = None
+    _id_to_rank = None
+
+    # Set if the module is run by a ModuleGroup:
+    _in_group = False
+
+    # Prefix of the names of the shared memory segments used to transmit data
+    # to and from modules on the same machine; set by the manager. If None,
+    # all data is transmitted via MPI:
+    _shm_prefix = None
+
+    # Maximum time (in seconds) to wait for a module on the same machine to
+    # write or read the data transmitted via shared memory; set by the
+    # manager:
+    _shm_timeout = 60.0
+
+    in_ports = _port_list('in', 'Input port identifiers.')
+    out_ports = _port_list('out', 'Output port identifiers.')
+    gpot_ports = _port_list('gpot', 'Graded potential port identifiers.')
+    spike_ports = _port_list('spike', 'Spiking port identifiers.')
+    in_gpot_ports = _port_list('in_gpot',
+                               'Input graded potential port identifiers.')
+    in_spike_ports = _port_list('in_spike', 'Input spiking port identifiers.')
+    out_gpot_ports = _port_list('out_gpot',
+                                'Output graded potential port identifiers.')
+    out_spike_ports = _port_list('out_spike',
+                                 'Output spiking port identifiers.')
+
     def _init_gpu(self):
         """
         Initialize GPU device.
@@ -248,6 +503,151 @@ class Module(mpi.Worker):
                 atexit.register(self.gpu_ctx.pop)
                 self.log_info('GPU %s initialized' % self.device)
 
+    def _port_digest(self, t):
+        """
+        Return the digest of the identifiers of the ports of the specified type.
+
+        The identifiers are ordered as in the module's port mapper; see
+        `_ports_digest()`.
+        """
+
+        if t not in self._port_digests:
+            idx = self.pm[t].index
+            if idx.nlevels == 1:
+                ports = [(x,) for x in idx]
+            else:
+                ports = idx.tolist()
+            self._port_digests[t] = _ports_digest(ports)
+        return self._port_digests[t]
+
+    def _get_link_plan(self, src_id, dest_id):
+        """
+        Return the compiled plan of a connection to or from the current module.
+
+        Parameters
+        ----------
+        src_id, dest_id : str
+            Identifiers of the source and destination modules.
+
+        Returns
+        -------
+        plan : dict
+            Port indices of the connection compiled by the manager (see
+            `compile_link_plans()`). None is returned if no plan was received
+            or if the plan's ports don't match those of the current module's
+            port mappers (e.g., because the module constructs its selectors
+            differently from the arguments from which the manager compiled the
+            plan); the connection's port indices are then computed from its
+            pattern.
+        """
+
+        if not self._link_plans or (src_id, dest_id) not in self._link_plans:
+            return None
+        plan = self._link_plans[(src_id, dest_id)]
+        if plan is None:
+            return None
+        # Only the order of the ports of the types transmitted over the
+        # connection matters:
+        side = 'src' if src_id == self.id else 'dest'
+        for t in ['gpot', 'spike']:
+            if not len(plan[side][t]):
+                continue
+            if plan[side+'_len'][t] != len(self.pm[t]) or \
+               plan[side+'_digest'][t] != self._port_digest(t):
+                if 'pattern' not in self.routing_table[src_id, dest_id]:
+                    raise ValueError('ports of compiled plan for %s -> %s do '
+                                     'not match module ports' % \
+                                     (src_id, dest_id))
+                self.log_info('ports of compiled plan for %s -> %s do not '
+                              'match module ports - ignoring plan' % \
+                              (src_id, dest_id))
+                return None
+        return plan
+
+    def _get_rank(self, id):
+        """
+        Return the MPI rank of the process running the specified module.
+        """
+
+        if self._id_to_rank is not None:
+            return self._id_to_rank[id]
+        return self.rank_to_id.inv[id]
+
+    def _get_link_tags(self, src_id, dest_id):
+        """
+        Return the MPI tags of the data transmitted over a connection.
+
+        Parameters
+        ----------
+        src_id, dest_id : str
+            Identifiers of the source and destination modules.
+
+        Returns
+        -------
+        gpot_tag, spike_tag : int
+            Tags of the graded potential and spiking port data.
+        """
+
+        if self._link_tags is None:
+            return GPOT_TAG, SPIKE_TAG
+        return self._link_tags[(src_id, dest_id)]
+
+    def _init_shm_links(self):
+        """
+        Set up shared memory segments for connections within the same machine.
+
+        Connections to or from modules in other processes running on the same
+        machine as the current module (as reported by
+        `MPI.Get_processor_name()`) are removed from the lists of connections
+        over which data is transmitted via MPI; their data is instead
+        transmitted via `SharedLink` instances.
+
+        Notes
+        -----
+        Must be executed after `_init_comm_bufs()`.
+        """
+
+        self._shm_out = []
+        self._shm_in = []
+        names = self._processor_names
+        if self._shm_prefix is None or names is None:
+            return
+        local = [rank != self.rank and names[rank] == names[self.rank] \
+                 for rank in xrange(len(names))]
+
+        out = []
+        for dest_id, dest_rank, tags in \
+                zip(self._out_ids, self._out_ranks, self._out_tags):
+            types = [t for t in ['gpot', 'spike'] \
+                     if self._out_buf[t][dest_id] is not None]
+            if not (local[dest_rank] and types):
+                out.append((dest_id, dest_rank, tags))
+                continue
+            link = SharedLink(_shm_link_name(self._shm_prefix, self.id, dest_id),
+                              [self._out_buf[t][dest_id].dtype for t in types],
+                              [self._out_buf[t][dest_id].shape for t in types],
+                              create=True)
+            self._shm_out.append((dest_id, types, link))
+        self._out_ids, self._out_ranks, self._out_tags = \
+            [list(x) for x in zip(*out)] if out else ([], [], [])
+
+        inp = []
+        for src_id, src_rank, tags in \
+                zip(self._in_ids, self._in_ranks, self._in_tags):
+            types = [t for t in ['gpot', 'spike'] \
+                     if self._in_buf[t][src_id] is not None]
+            if not (local[src_rank] and types):
+                inp.append((src_id, src_rank, tags))
+                continue
+            link = SharedLink(_shm_link_name(self._shm_prefix, src_id, self.id),
+                              [self._in_buf[t][src_id].dtype for t in types],
+                              [self._in_buf[t][src_id].shape for t in types])
+            self._shm_in.append((src_id, types, link))
+        self._in_ids, self._in_ranks, self._in_tags = \
+            [list(x) for x in zip(*inp)] if inp else ([], [], [])
+        self.log_info('transmitting data to %s and from %s modules via shared '
+                      'memory' % (len(self._shm_out), len(self._shm_in)))
+
     def _init_port_dicts(self):
         """
         Initial dictionaries of source/destination ports in current module.
@@ -260,10 +660,20 @@ class Module(mpi.Worker):
         self._out_port_dict_ids['spike'] = {}
 
         self._out_ids = self.routing_table.dest_ids(self.id)
-        self._out_ranks = [self.rank_to_id.inv[i] for i in self._out_ids]
+        self._out_ranks = [self._get_rank(i) for i in self._out_ids]
+        self._out_tags = [self._get_link_tags(self.id, i) \
+                          for i in self._out_ids]
         for out_id in self._out_ids:
             self.log_info('extracting output ports for %s' % out_id)
 
+            # Use the port indices compiled by the manager if available:
+            plan = self._get_link_plan(self.id, out_id)
+            if plan is not None:
+                for t in ['gpot', 'spike']:
+                    self._out_port_dict_ids[t][out_id] = \
+                        gpuarray.to_gpu(plan['src'][t])
+                continue
+
             # Get interfaces of pattern connecting the current module to
             # destination module `out_id`; `int_0` is connected to the
             # current module, `int_1` is connected to the other module:
@@ -297,10 +707,22 @@ class Module(mpi.Worker):
         self._in_buf_len['spike'] = {}
 
         self._in_ids = self.routing_table.src_ids(self.id)
-        self._in_ranks = [self.rank_to_id.inv[i] for i in self._in_ids]
+        self._in_ranks = [self._get_rank(i) for i in self._in_ids]
+        self._in_tags = [self._get_link_tags(i, self.id) \
+                         for i in self._in_ids]
         for in_id in self._in_ids:
             self.log_info('extracting input ports for %s' % in_id)
 
+            # Use the port indices compiled by the manager if available:
+            plan = self._get_link_plan(in_id, self.id)
+            if plan is not None:
+                for t in ['gpot', 'spike']:
+                    self._in_port_dict_ids[t][in_id] = \
+                        gpuarray.to_gpu(plan['dest'][t])
+                    self._in_port_dict_buf_ids[t][in_id] = plan['buf'][t]
+                    self._in_buf_len[t][in_id] = len(plan['src'][t])
+                continue
+
             # Get interfaces of pattern connecting the current module to
             # source module `in_id`; `int_1` is connected to the current
             # module, `int_0` is connected to the other module:
@@ -408,104 +830,375 @@ class Module(mpi.Worker):
             else:
                 self._out_buf['spike'][out_id] = None
 
-    def _sync(self):
+    def _send_link(self, dest_id, dest_rank, gpot_tag, spike_tag, requests):
         """
-        Send output data and receive input data.
+        Copy the output data sent to a destination module and post its sends.
         """
 
-        if self.time_sync:
-            start = time.time()
-        requests = []
+        # Copy data into destination buffer:
+        if self._out_buf['gpot'][dest_id] is not None:
+            set_by_inds(self._out_buf['gpot'][dest_id],
+                        self._out_port_dict_ids['gpot'][dest_id],
+                        self.data['gpot'], 'src')
+            if not self.time_sync:
+                self.log_info('gpot data sent to %s: %s' % \
+                              (dest_id, str(self._out_buf['gpot'][dest_id])))
+            r = MPI.COMM_WORLD.Isend([self._out_buf_int['gpot'][dest_id],
+                                      self._out_buf_mtype['gpot'][dest_id]],
+                                     dest_rank, gpot_tag)
+            requests.append(r)
+        if self._out_buf['spike'][dest_id] is not None:
+            set_by_inds(self._out_buf['spike'][dest_id],
+                        self._out_port_dict_ids['spike'][dest_id],
+                        self.data['spike'], 'src')
+            if not self.time_sync:
+                self.log_info('spike data sent to %s: %s' % \
+                              (dest_id, str(self._out_buf['spike'][dest_id])))
+            r = MPI.COMM_WORLD.Isend([self._out_buf_int['spike'][dest_id],
+                                      self._out_buf_mtype['spike'][dest_id]],
+                                     dest_rank, spike_tag)
+            requests.append(r)
+        if not self.time_sync:
+            self.log_info('sending to %s' % dest_id)
+
+    def _write_shm_link(self, dest_id, types, link, n):
+        """
+        Copy the output data sent to a destination module into a shared memory segment.
+        """
+
+        slot = link.acquire_write(n, self._shm_timeout)
+        if slot is None:
+            raise RuntimeError('timed out in step %i waiting for %s to '
+                               'read data from shared memory link %s' % \
+                               (self.steps, dest_id, link.name))
+        for t, buf in zip(types, slot):
+            set_by_inds(self._out_buf[t][dest_id],
+                        self._out_port_dict_ids[t][dest_id],
+                        self.data[t], 'src')
+            self._out_buf[t][dest_id].get(buf)
+        link.publish(n)
+
+    def _send_data(self, requests):
+        """
+        Copy output data into the transmission buffers and post the sends.
+
+        Parameters
+        ----------
+        requests : list of mpi4py.MPI.Request
+            List to which the requests of the posted sends are appended.
+        """
 
         # For each destination module, extract elements from the current
         # module's port data array, copy them to a contiguous array, and
         # transmit the latter:
-        for dest_id, dest_rank in zip(self._out_ids, self._out_ranks):
-
-            # Copy data into destination buffer:
-            if self._out_buf['gpot'][dest_id] is not None:
-                set_by_inds(self._out_buf['gpot'][dest_id],
-                            self._out_port_dict_ids['gpot'][dest_id],
-                            self.data['gpot'], 'src')
-                if not self.time_sync:
-                    self.log_info('gpot data sent to %s: %s' % \
-                                  (dest_id, str(self._out_buf['gpot'][dest_id])))
-                r = MPI.COMM_WORLD.Isend([self._out_buf_int['gpot'][dest_id],
-                                          self._out_buf_mtype['gpot'][dest_id]],
-                                         dest_rank, GPOT_TAG)
-                requests.append(r)
-            if self._out_buf['spike'][dest_id] is not None:
-                set_by_inds(self._out_buf['spike'][dest_id],
-                            self._out_port_dict_ids['spike'][dest_id],
-                            self.data['spike'], 'src')
-                if not self.time_sync:
-                    self.log_info('spike data sent to %s: %s' % \
-                                  (dest_id, str(self._out_buf['spike'][dest_id])))
-                r = MPI.COMM_WORLD.Isend([self._out_buf_int['spike'][dest_id],
-                                          self._out_buf_mtype['spike'][dest_id]],
-                                         dest_rank, SPIKE_TAG)
-                requests.append(r)
-            if not self.time_sync:
-                self.log_info('sending to %s' % dest_id)
+        for dest_id, dest_rank, (gpot_tag, spike_tag) in \
+                zip(self._out_ids, self._out_ranks, self._out_tags):
+            self._send_link(dest_id, dest_rank, gpot_tag, spike_tag, requests)
+
+        # Copy the data transmitted to modules on the same machine directly
+        # into the shared memory segments:
+        n = self.steps+1
+        for dest_id, types, link in self._shm_out:
+            self._write_shm_link(dest_id, types, link, n)
+        if not self.time_sync:
+            self.log_info('sent all data from %s' % self.id)
+
+    def _send_data_traced(self, requests):
+        """
+        Send output data like `_send_data()` and record the time taken to
+        send the data to each destination module with the tracer.
+
+        Parameters
+        ----------
+        requests : list of mpi4py.MPI.Request
+            List to which the requests of the posted sends are appended.
+        """
+
+        tracer = self.tracer
+        for dest_id, dest_rank, (gpot_tag, spike_tag) in \
+                zip(self._out_ids, self._out_ranks, self._out_tags):
+            start = time.time()
+            self._send_link(dest_id, dest_rank, gpot_tag, spike_tag, requests)
+            tracer.add('send %s' % dest_id, 'send', start, time.time(),
+                       self.steps)
+        n = self.steps+1
+        for dest_id, types, link in self._shm_out:
+            start = time.time()
+            self._write_shm_link(dest_id, types, link, n)
+            tracer.add('send %s' % dest_id, 'send', start, time.time(),
+                       self.steps)
         if not self.time_sync:
             self.log_info('sent all data from %s' % self.id)
 
-        # For each source module, receive elements and copy them into the
-        # current module's port data array:
-        for src_id, src_rank in zip(self._in_ids, self._in_ranks):
+    def _recv_data(self, requests):
+        """
+        Post the receives of the input data.
+
+        Parameters
+        ----------
+        requests : list of mpi4py.MPI.Request
+            List to which the requests of the posted receives are appended.
+        """
+
+        for src_id, src_rank, (gpot_tag, spike_tag) in \
+                zip(self._in_ids, self._in_ranks, self._in_tags):
             if self._in_buf['gpot'][src_id] is not None:
                 r = MPI.COMM_WORLD.Irecv([self._in_buf_int['gpot'][src_id],
                                           self._in_buf_mtype['gpot'][src_id]],
-                                         source=src_rank, tag=GPOT_TAG)
+                                         source=src_rank, tag=gpot_tag)
                 requests.append(r)
             if self._in_buf['spike'][src_id] is not None:
                 r = MPI.COMM_WORLD.Irecv([self._in_buf_int['spike'][src_id],
                                           self._in_buf_mtype['spike'][src_id]],
-                                         source=src_rank, tag=SPIKE_TAG)
+                                         source=src_rank, tag=spike_tag)
                 requests.append(r)
             if not self.time_sync:
                 self.log_info('receiving from %s' % src_id)
+
+    def _unpack_link(self, src_id):
+        """
+        Copy the input data received from a source module into the data array.
+        """
+
+        if self._in_buf['gpot'][src_id] is not None:
+            if not self.time_sync:
+                self.log_info('gpot data received from %s: %s' % \
+                              (src_id, str(self._in_buf['gpot'][src_id])))
+            set_by_inds_from_inds(self.data['gpot'],
+                                  self._in_port_dict_ids['gpot'][src_id],
+                                  self._in_buf['gpot'][src_id],
+                                  self._in_port_dict_buf_ids['gpot'][src_id])
+        if self._in_buf['spike'][src_id] is not None:
+            if not self.time_sync:
+                self.log_info('spike data received from %s: %s' % \
+                              (src_id, str(self._in_buf['spike'][src_id])))
+            set_by_inds_from_inds(self.data['spike'],
+                                  self._in_port_dict_ids['spike'][src_id],
+                                  self._in_buf['spike'][src_id],
+                                  self._in_port_dict_buf_ids['spike'][src_id])
+
+    def _wait_shm_link(self, src_id, link, n):
+        """
+        Wait for a source module to write its data into a shared memory segment.
+
+        Returns
+        -------
+        slot : list of numpy.ndarray
+            Arrays containing the data written by the source module.
+        """
+
+        slot = link.acquire_read(n, self._shm_timeout)
+        if slot is None:
+            raise RuntimeError('timed out in step %i waiting for %s to '
+                               'write data to shared memory link %s' % \
+                               (self.steps, src_id, link.name))
+        return slot
+
+    def _read_shm_link(self, src_id, types, link, slot, n):
+        """
+        Copy the input data in a shared memory segment into the data array.
+        """
+
+        for t, buf in zip(types, slot):
+            self._in_buf[t][src_id].set(buf)
+            set_by_inds_from_inds(self.data[t],
+                                  self._in_port_dict_ids[t][src_id],
+                                  self._in_buf[t][src_id],
+                                  self._in_port_dict_buf_ids[t][src_id])
+        link.release(n)
+
+    def _unpack_data(self):
+        """
+        Copy received input data into the current module's data array.
+        """
+
+        for src_id in self._in_ids:
+            self._unpack_link(src_id)
+
+        # Copy the data received from modules on the same machine directly
+        # from the shared memory segments:
+        n = self.steps+1
+        for src_id, types, link in self._shm_in:
+            slot = self._wait_shm_link(src_id, link, n)
+            self._read_shm_link(src_id, types, link, slot, n)
+
+    def _unpack_data_tracked(self):
+        """
+        Copy received input data like `_unpack_data()` and track each incoming
+        connection.
+
+        The time spent waiting for the data in each shared memory segment is
+        accumulated in `link_wait_times` if `record_link_waits` is set; the
+        waits and the copying of the data of each source module are recorded
+        by the tracer if one is set.
+        """
+
+        tracer = self.tracer
+        if tracer is None:
+            for src_id in self._in_ids:
+                self._unpack_link(src_id)
+        else:
+            for src_id in self._in_ids:
+                start = time.time()
+                self._unpack_link(src_id)
+                tracer.add('unpack %s' % src_id, 'unpack', start, time.time(),
+                           self.steps)
+
+        n = self.steps+1
+        times = []
+        for src_id, types, link in self._shm_in:
+            start = time.time()
+            slot = self._wait_shm_link(src_id, link, n)
+            now = time.time()
+            self._read_shm_link(src_id, types, link, slot, n)
+            times.append((src_id, start, now, time.time()))
+
+        if self.record_link_waits:
+            for src_id, start, now, end in times:
+                self.link_wait_times[src_id] += now-start
+        if tracer is not None:
+            for src_id, start, now, end in times:
+                tracer.add('recv %s' % src_id, 'recv', start, now, self.steps)
+                tracer.add('unpack %s' % src_id, 'unpack', now, end,
+                           self.steps)
+
+    def _sync(self, tracked=False):
+        """
+        Send output data and receive input data.
+
+        Parameters
+        ----------
+        tracked : bool
+            If True, track each connection as described in `_wait_links()`
+            and `_unpack_data_tracked()` and record the sends with the tracer
+            if one is set.
+        """
+
+        if self.time_sync:
+            start = time.time()
+        if self.record_step_stats:
+            step_times = self._step_times[self._step_count]
+            t = default_timer()
+        requests = []
+        if tracked and self.tracer is not None:
+            self._send_data_traced(requests)
+        else:
+            self._send_data(requests)
+        self._recv_data(requests)
+        if self.record_step_stats:
+            now = default_timer()
+            step_times[1] = now-t
+            t = now
         if requests:
-            self.req.Waitall(requests)
+            if tracked:
+                self._wait_links(requests)
+            else:
+                self.req.Waitall(requests)
+        if self.record_step_stats:
+            now = default_timer()
+            step_times[2] = now-t
+            t = now
         if not self.time_sync:
             self.log_info('all data were received by %s' % self.id)
 
         # Copy received elements into the current module's data array:
-        for src_id in self._in_ids:
-            if self._in_buf['gpot'][src_id] is not None:
-                if not self.time_sync:
-                    self.log_info('gpot data received from %s: %s' % \
-                                  (src_id, str(self._in_buf['gpot'][src_id])))
-                set_by_inds_from_inds(self.data['gpot'],
-                                      self._in_port_dict_ids['gpot'][src_id],
-                                      self._in_buf['gpot'][src_id],
-                                      self._in_port_dict_buf_ids['gpot'][src_id])
-            if self._in_buf['spike'][src_id] is not None:
-                if not self.time_sync:
-                    self.log_info('spike data received from %s: %s' % \
-                                  (src_id, str(self._in_buf['spike'][src_id])))
-                set_by_inds_from_inds(self.data['spike'],
-                                      self._in_port_dict_ids['spike'][src_id],
-                                      self._in_buf['spike'][src_id],
-                                      self._in_port_dict_buf_ids['spike'][src_id])
-
-        # Save timing data:
+        if tracked:
+            self._unpack_data_tracked()
+        else:
+            self._unpack_data()
+
+        if self.record_step_stats:
+            step_times[3] = default_timer()-t
+
+        # The amount of data sent to each destination module during each
+        # execution step is fixed by the transmission buffers, so only the
+        # number of executed synchronizations needs to be counted:
+        if self.record_comm:
+            self._comm_steps += 1
+
+        # Save timing data; the accumulated data is sent to the manager
+        # whenever the buffer is full:
         if self.time_sync:
-            stop = time.time()
-            n_gpot = 0
-            n_spike = 0
-            for src_id in self._in_ids:
-                n_gpot += len(self._in_buf['gpot'][src_id])
-                n_spike += len(self._in_buf['spike'][src_id])
-            self.log_info('sent timing data to master')
-            self.intercomm.isend(['sync_time',
-                                  (self.rank, self.steps, start, stop,
-                                   n_gpot*self.pm['gpot'].dtype.itemsize+\
-                                   n_spike*self.pm['spike'].dtype.itemsize)],
-                                 dest=0, tag=self._ctrl_tag)
+            self._sync_times[self._sync_count] = \
+                (self.steps, start, time.time(), self._sync_nbytes)
+            self._sync_count += 1
+            if self._sync_count == len(self._sync_times):
+                self._flush_sync_times()
         else:
             self.log_info('saved all data received by %s' % self.id)
 
+    def _wait_links(self, requests):
+        """
+        Wait for data transfers to complete and track each incoming connection.
+
+        The time between the invocation of this method (i.e., after all
+        receives have been posted) and the arrival of all data from each source
+        module is accumulated in `link_wait_times` if `record_link_waits` is
+        set and recorded by the tracer if one is set.
+
+        Parameters
+        ----------
+        requests : list of mpi4py.MPI.Request
+            Requests of the transfers posted by `_sync()`; the requests for
+            the receives from the source modules must follow all of the
+            requests for the sends.
+        """
+
+        start = time.time()
+        srcs = [src_id for src_id in self._in_ids for t in ['gpot', 'spike'] \
+                if self._in_buf[t][src_id] is not None]
+        offset = len(requests)-len(srcs)
+        remaining = collections.Counter(srcs)
+        arrivals = []
+        while True:
+            inds = MPI.Request.Waitsome(requests)
+            if inds is None:
+                break
+            now = time.time()
+            for i in inds:
+                if i < offset:
+                    continue
+
+                # Attribute the time spent waiting to the source module once
+                # all of its data has arrived:
+                src_id = srcs[i-offset]
+                remaining[src_id] -= 1
+                if not remaining[src_id]:
+                    arrivals.append((src_id, now))
+
+        if self.record_link_waits:
+            for src_id, now in arrivals:
+                self.link_wait_times[src_id] += now-start
+        if self.tracer is not None:
+            for src_id, now in arrivals:
+                self.tracer.add('recv %s' % src_id, 'recv', start, now,
+                                self.steps)
+
+    def _update_step_stats(self):
+        """
+        Add the buffered execution step phase times to the histograms.
+        """
+
+        for i, phase in enumerate(STEP_PHASES):
+            self.step_stats[phase].add(self._step_times[:self._step_count, i])
+        self._step_count = 0
+
+    def _flush_sync_times(self):
+        """
+        Send accumulated synchronization timing data to the manager.
+        """
+
+        if self._sync_count:
+            if self._sync_req is not None:
+                self._sync_req.Wait()
+            self._sync_req = \
+                self.intercomm.isend(['sync_times',
+                                      (self.rank,
+                                       self._sync_times[:self._sync_count])],
+                                     dest=0, tag=self._ctrl_tag)
+            self._sync_count = 0
+            self.log_info('sent timing data to master')
+
     def pre_run(self):
         """
         Code to run before main loop.
@@ -522,6 +1215,48 @@ class Module(mpi.Worker):
         # Initialize transmission buffers:
         self._init_comm_bufs()
 
+        # Preallocate an array for the step number, synchronization start and
+        # stop times, and number of bytes received during each step (the
+        # latter is fixed by the size of the receive buffers):
+        if self.time_sync:
+            self._sync_times = np.empty((self.sync_flush_steps, 4), np.double)
+            self._sync_count = 0
+            self._sync_req = None
+            self._sync_nbytes = 0
+            for src_id in self._in_ids:
+                for t in ['gpot', 'spike']:
+                    if self._in_buf[t][src_id] is not None:
+                        self._sync_nbytes += self._in_buf[t][src_id].nbytes
+
+        # Preallocate a buffer for the times taken by the phases of each
+        # execution step:
+        if self.record_step_stats:
+            self._step_times = np.zeros((self._step_stats_steps,
+                                         len(STEP_PHASES)), np.double)
+            self._step_count = 0
+            self.step_stats = {phase: LogHistogram() for phase in STEP_PHASES}
+
+        # Find the number of bytes and messages sent to each destination
+        # module during each execution step:
+        if self.record_comm:
+            self._comm_steps = 0
+            self._comm_per_step = {}
+            for dest_id in self._out_ids:
+                bufs = [self._out_buf[t][dest_id] for t in ['gpot', 'spike'] \
+                        if self._out_buf[t][dest_id] is not None]
+                self._comm_per_step[dest_id] = \
+                    (sum([b.nbytes for b in bufs]), len(bufs))
+
+        # Track the completion of the transfers from each source module
+        # separately if required:
+        self._track_links = self.tracer is not None or self.record_link_waits
+        if self.record_link_waits:
+            self.link_wait_times = dict.fromkeys(self._in_ids, 0.0)
+
+        # Transmit data to and from modules on the same machine via shared
+        # memory:
+        self._init_shm_links()
+
         # Start timing the main loop:
         if self.time_sync:
             self.intercomm.isend(['start_time', (self.rank, time.time())],
@@ -538,16 +1273,55 @@ class Module(mpi.Worker):
 
         self.log_info('running code after body of worker %s' % self.rank)
 
+        for dest_id, types, link in self._shm_out:
+            link.close()
+        for src_id, types, link in self._shm_in:
+            link.close()
+
         # Stop timing the main loop before shutting down the emulation:
         if self.time_sync:
+            self._flush_sync_times()
+            if self._sync_req is not None:
+                self._sync_req.Wait()
             self.intercomm.isend(['stop_time', (self.rank, time.time())],
                                  dest=0, tag=self._ctrl_tag)
 
             self.log_info('sent stop time to manager')
 
-        # Send acknowledgment message:
-        self.intercomm.isend(['done', self.rank], 0, self._ctrl_tag)
-        self.log_info('done message sent to manager')
+        # Send the execution step phase time histograms to the manager:
+        if self.record_step_stats:
+            self._update_step_stats()
+            self.intercomm.send(['step_stats', (self.rank, self.step_stats)],
+                                dest=0, tag=self._ctrl_tag)
+            self.log_info('sent step statistics to manager')
+
+        # Send the accumulated connection wait times to the manager:
+        if self.record_link_waits:
+            self.intercomm.send(['link_waits', (self.rank, self.link_wait_times)],
+                                dest=0, tag=self._ctrl_tag)
+            self.log_info('sent connection wait times to manager')
+
+        # Send the amount of data sent to each destination module to the
+        # manager:
+        if self.record_comm:
+            comm = {dest_id: (nbytes*self._comm_steps, nmsgs*self._comm_steps) \
+                    for dest_id, (nbytes, nmsgs) in \
+                    self._comm_per_step.iteritems()}
+            self.intercomm.send(['comm', (self.rank, comm, self._comm_steps)],
+                                dest=0, tag=self._ctrl_tag)
+            self.log_info('sent communication counts to manager')
+
+        # Send the recorded trace events to the manager:
+        if self.tracer is not None:
+            self.intercomm.send(['trace', (self.rank, self.tracer)],
+                                dest=0, tag=self._ctrl_tag)
+            self.log_info('sent trace events to manager')
+
+        # Send acknowledgment message; modules run by a group are acknowledged
+        # by the latter:
+        if not self._in_group:
+            self.intercomm.isend(['done', self.rank], 0, self._ctrl_tag)
+            self.log_info('done message sent to manager')
 
     def run_step(self):
         """
@@ -581,21 +1355,260 @@ class Module(mpi.Worker):
         control message.
         """
 
+        if self.record_step_stats:
+            t = default_timer()
+        if self.tracer is not None:
+            start = time.time()
+
         # If the debug flag is set, don't catch exceptions so that
         # errors will lead to visible failures:
         if self.debug:
 
             # Run the processing step:
             self.run_step()
+            if self.record_step_stats:
+                self._step_times[self._step_count, 0] = default_timer()-t
+            if self.tracer is not None:
+                self.tracer.add('run_step', 'compute', start, time.time(),
+                                self.steps)
 
             # Synchronize:
-            self._sync()
+            self._sync(self._track_links)
         else:
 
             # Run the processing step:
             catch_exception(self.run_step, self.log_info)
+            if self.record_step_stats:
+                self._step_times[self._step_count, 0] = default_timer()-t
+            if self.tracer is not None:
+                self.tracer.add('run_step', 'compute', start, time.time(),
+                                self.steps)
 
             # Synchronize:
+            catch_exception(self._sync, self.log_info, self._track_links)
+
+        if self.record_step_stats:
+            self._step_count += 1
+            if self._step_count == self._step_stats_steps:
+                self._update_step_stats()
+
+def _shm_link_name(prefix, src_id, dest_id):
+    """
+    Name of the shared memory segment of a connection between two modules.
+    """
+
+    return '%s-%s' % (prefix, hashlib.md5(repr((src_id, dest_id))).hexdigest())
+
+def _local_link_inds(src, dest):
+    """
+    Compose the port indices of a connection between two modules in one process.
+
+    Parameters
+    ----------
+    src, dest : Module
+        Source and destination modules; their port dictionaries must have been
+        initialized.
+
+    Returns
+    -------
+    inds : list of tuple
+        Each entry `(t, src_inds, dest_inds)` contains the positions in
+        `src.data[t]` of the data to copy into the positions `dest_inds` of
+        `dest.data[t]`; both index arrays are stored in GPU memory. Port types
+        over which no data is transmitted are omitted.
+    """
+
+    inds = []
+    for t in ['gpot', 'spike']:
+        dest_inds = dest._in_port_dict_ids[t][src.id]
+        if not len(dest_inds):
+            continue
+        src_inds = src._out_port_dict_ids[t][dest.id]
+        if isinstance(dest_inds, gpuarray.GPUArray):
+            dest_inds = dest_inds.get()
+        if isinstance(src_inds, gpuarray.GPUArray):
+            src_inds = src_inds.get()
+
+        # Map each destination port directly to its source port rather than
+        # to its position in the transmitted buffer:
+        src_inds = np.asarray(src_inds)[dest._in_port_dict_buf_ids[t][src.id]]
+        inds.append((t, gpuarray.to_gpu(np.asarray(src_inds, np.int32)),
+                     gpuarray.to_gpu(np.asarray(dest_inds, np.int32))))
+    return inds
+
+def _local_links(modules):
+    """
+    Find the connections between modules run by the same process.
+
+    The connections are removed from the modules' lists of connections over
+    which data is transmitted via MPI.
+
+    Parameters
+    ----------
+    modules : list of Module
+        Modules run by the process; their port dictionaries must have been
+        initialized.
+
+    Returns
+    -------
+    links : list of tuple
+        Each entry `(src, dest, t, src_inds, dest_inds)` specifies that the
+        data in the positions `src_inds` of `src.data[t]` must be copied into
+        the positions `dest_inds` of `dest.data[t]` during each step.
+    """
+
+    ids = {m.id: m for m in modules}
+    links = []
+    for m in modules:
+        out = [(i, r, tags) for i, r, tags in \
+               zip(m._out_ids, m._out_ranks, m._out_tags) \
+               if i not in ids]
+        m._out_ids, m._out_ranks, m._out_tags = \
+            [list(x) for x in zip(*out)] if out else ([], [], [])
+        inp = [(i, r, tags) for i, r, tags in \
+               zip(m._in_ids, m._in_ranks, m._in_tags) \
+               if i not in ids]
+        for src_id in m.routing_table.src_ids(m.id):
+            if src_id in ids:
+                for t, src_inds, dest_inds in \
+                        _local_link_inds(ids[src_id], m):
+                    links.append((ids[src_id], m, t, src_inds, dest_inds))
+        m._in_ids, m._in_ranks, m._in_tags = \
+            [list(x) for x in zip(*inp)] if inp else ([], [], [])
+    return links
+
+class ModuleGroup(mpi.Worker):
+    """
+    Executor of several modules in a single MPI process.
+
+    The modules are stepped in lockstep: the `run_step()` methods of all of
+    the modules are executed before their data is synchronized. Data
+    transmitted between modules in the group is copied directly between
+    their data arrays; only data transmitted to or from modules in other
+    processes is transmitted via MPI.
+
+    Parameters
+    ----------
+    modules : list of tuple
+        Each entry `(index, kwargs)` contains the index in `targets` of a
+        module class and the arguments to pass to its constructor.
+    targets : list of str
+        Module classes serialized by `ProcessManager._serialize_target()`.
+    ctrl_tag : int
+        MPI tag to identify control messages transmitted to worker nodes.
+    routing_table : neurokernel.routing_table.RoutingTable
+        Routing table describing data connections to or from the modules.
+
+    Attributes
+    ----------
+    modules : list of Module
+        Module instances run by the group.
+
+    Notes
+    -----
+    Groups are created by the manager for modules added with the `group`
+    argument of `Manager.add()`. Execution statistics cannot be recorded for
+    the modules in a group, and their `time_sync` flags must not be set.
+    """
+
+    _link_plans = None
+    _link_tags = None
+    _id_to_rank = None
+    _shm_prefix = None
+    _shm_timeout = 60.0
+
+    def __init__(self, modules, targets, ctrl_tag=CTRL_TAG,
+                 routing_table=None):
+        super(ModuleGroup, self).__init__(ctrl_tag)
+
+        # Each class must only be loaded once so that all of its instances
+        # have the same type as the class in the global scope:
+        targets = [mpi.load_target(data)[0] for data in targets]
+        self.modules = []
+        for index, kwargs in modules:
+            kwargs = dict(kwargs, routing_table=routing_table)
+            self.modules.append(targets[index](**kwargs))
+        self.debug = any([m.debug for m in self.modules])
+
+        # MPI Request object for resolving asynchronous transfers:
+        self.req = MPI.Request()
+
+    def pre_run(self):
+        """
+        Initialize the modules and the connections between them.
+        """
+
+        super(ModuleGroup, self).pre_run()
+        for m in self.modules:
+            m._in_group = True
+            m._link_plans = self._link_plans
+            m._link_tags = self._link_tags
+            m._id_to_rank = self._id_to_rank
+            m._shm_prefix = self._shm_prefix
+            m._shm_timeout = self._shm_timeout
+            m.pre_run()
+
+        # Connections between modules in the group are not transmitted via MPI:
+        self._local_links = _local_links(self.modules)
+        self.log_info('%s connections between modules in group' % \
+                      len(self._local_links))
+
+    def post_run(self):
+        """
+        Finalize the modules.
+        """
+
+        for m in self.modules:
+            m.post_run()
+        super(ModuleGroup, self).post_run()
+
+    def _sync(self):
+        """
+        Transmit data between the modules and to/from other processes.
+        """
+
+        requests = []
+        for m in self.modules:
+            m._send_data(requests)
+        for m in self.modules:
+            m._recv_data(requests)
+
+        # Copy data between modules in the group while the transfers to and
+        # from other processes are in progress:
+        for src, dest, t, src_inds, dest_inds in self._local_links:
+            set_by_inds_from_inds(dest.data[t], dest_inds,
+                                  src.data[t], src_inds)
+
+        if requests:
+            self.req.Waitall(requests)
+        for m in self.modules:
+            m._unpack_data()
+
+    def run(self):
+        """
+        Body of process.
+        """
+
+        # Don't allow keyboard interruption of process:
+        with IgnoreKeyboardInterrupt():
+
+            # Activate execution loop:
+            super(ModuleGroup, self).run()
+
+    def do_work(self):
+        """
+        Execute a step of each module and synchronize their data.
+        """
+
+        for m in self.modules:
+            m.steps = self.steps
+            if m.debug:
+                m.run_step()
+            else:
+                catch_exception(m.run_step, m.log_info)
+        if self.debug:
+            self._sync()
+        else:
             catch_exception(self._sync, self.log_info)
 
 class Manager(mpi.WorkerManager):
@@ -606,35 +1619,121 @@ class Manager(mpi.WorkerManager):
     emulation. All modules and connections must be added to a module manager
     instance before they can be run.
 
+    Parameters
+    ----------
+    required_args : list of str
+        Arguments that the constructors of the module classes must accept.
+    ctrl_tag : int
+        MPI tag to identify control messages.
+    pool : mpi_proc.ProcessPool
+        Pool of processes on which to run the modules.
+    backend : str
+        Backend that runs the modules. If 'mpi', the modules are run by
+        processes spawned via MPI. If 'multiprocessing', they are run by
+        processes forked from the current process and the program need not
+        be relaunched via `neurokernel.mpi_relaunch`; all of the processes
+        then run on the current machine.
+
     Attributes
     ----------
     ctrl_tag : int
         MPI tag to identify control messages.
     modules : dict
         Module instances. Keyed by module object ID.
+    pool : mpi_proc.ProcessPool
+        Pool of processes on which to run the modules; new processes are
+        spawned for the modules if None.
     routing_table : routing_table.RoutingTable
         Table of data transmission connections between modules.
     rank_to_id : bidict.bidict
-        Mapping between MPI ranks and module object IDs.
+        Mapping between MPI ranks and module object IDs; the ranks of processes
+        running groups of modules are mapped to the groups' identifiers.
+    id_to_rank : dict
+        MPI ranks of the processes running each module. Keyed by module ID.
+    groups : dict
+        IDs of the modules in each group of modules run by a single process.
+        Keyed by group identifier.
+    sync_time_percentiles : list of float
+        Percentiles of the step synchronization time to compute when the
+        modules' `time_sync` flags are set.
+    step_sync_time_percentiles : dict
+        Computed step synchronization time percentiles. Keyed by percentile.
+    record_step_stats : bool
+        If True, the modules record the time taken by each of the phases in
+        `STEP_PHASES` during every execution step.
+    step_stats : dict
+        Histograms of the execution step phase times recorded by each module.
+        Keyed by module ID; each entry is a dict of
+        neurokernel.tools.timing.LogHistogram instances keyed by phase.
+    trace_file : str
+        If not None, the modules record the times of their execution steps,
+        run_step() invocations, and per-connection sends, receive waits, and
+        data unpacking; the recorded events are merged into a Chrome trace
+        event JSON file with this name after the emulation finishes.
+    tracers : dict
+        Tracers containing the events recorded by each module. Keyed by MPI
+        rank.
+    record_link_waits : bool
+        If True, the modules accumulate the time spent waiting for data from
+        each of their source modules.
+    link_wait_times : dict of dict
+        `link_wait_times[x][y]` is the total time that module `x` spent
+        waiting for data from module `y`.
+    record_comm : bool
+        If True, the modules count the number of bytes and messages that they
+        send to each of their destination modules.
+    comm_bytes, comm_msgs : dict of dict
+        `comm_bytes[x][y]` and `comm_msgs[x][y]` are the total number of
+        bytes and messages sent by module `x` to module `y`.
+    comm_steps : dict
+        Number of execution steps during which the data in `comm_bytes` and
+        `comm_msgs` was sent. Keyed by module ID.
+    link_plan_pool_ports : int
+        Minimum total number of ports in the interfaces of the patterns in
+        the routing table above which `compile_link_plans()` compiles the
+        plans in a pool of processes by default.
+    use_shm : bool
+        If True, data transmitted between modules in different processes on
+        the same machine is transmitted via shared memory rather than MPI.
+        Ignored by the multiprocessing backend, which always transmits data
+        via shared memory. Shared memory is only supported on machines with
+        x86 processors; `use_shm` is therefore False by default on other
+        machines, and `spawn()` raises a ValueError if shared memory is
+        requested (or the multiprocessing backend is used) on them.
+    shm_timeout : float
+        Maximum time (in seconds) that a module waits for a module on the same
+        machine to write or read the data transmitted via shared memory during
+        a step; a RuntimeError is raised by the waiting module if the time
+        elapses (e.g., because the other module's process died).
     """
 
+    link_plan_pool_ports = 100000
+
     def __init__(self, required_args=['sel', 'sel_in', 'sel_out',
                                       'sel_gpot', 'sel_spike'],
-                 ctrl_tag=CTRL_TAG):
-        super(Manager, self).__init__(ctrl_tag)
+                 ctrl_tag=CTRL_TAG, pool=None, backend='mpi'):
+        super(Manager, self).__init__(ctrl_tag, pool, backend)
 
         # Required constructor args:
         self.required_args = required_args
 
-        # One-to-one mapping between MPI rank and module ID:
+        # One-to-one mapping between MPI rank and module (or module group) ID:
         self.rank_to_id = bidict.bidict()
 
+        # Mapping between module ID and MPI rank and IDs of the modules in
+        # each module group:
+        self.id_to_rank = {}
+        self.groups = {}
+
         # Unique object ID:
         self.id = uid()
 
         # Set up a dynamic table to contain the routing table:
         self.routing_table = RoutingTable()
 
+        # Compiled port indices of the connections between modules:
+        self.link_plans = {}
+
         # Number of emulation steps to run:
         self.steps = np.inf
 
@@ -648,6 +1747,33 @@ class Manager(mpi.WorkerManager):
         self.total_sync_nbytes = 0.0
         self.received_data = {}
 
+        # Percentiles of the step synchronization time to compute:
+        self.sync_time_percentiles = [50, 90, 99]
+        self.step_sync_time_percentiles = {}
+
+        # Execution step phase time histograms reported by the modules:
+        self.record_step_stats = False
+        self.step_stats = {}
+
+        # Trace events recorded by the modules:
+        self.trace_file = None
+        self.tracers = {}
+
+        # Time spent by the modules waiting for data from their source modules:
+        self.record_link_waits = False
+        self.link_wait_times = {}
+
+        # Data sent between modules:
+        self.record_comm = False
+        self.comm_bytes = {}
+        self.comm_msgs = {}
+        self.comm_steps = {}
+
+        # Transmit data between modules on the same machine via shared memory
+        # if the processor supports it:
+        self.use_shm = shm_supported()
+        self.shm_timeout = 60.0
+
         # Average step synchronization time:
         self._average_step_sync_time = 0.0
 
@@ -727,10 +1853,19 @@ class Manager(mpi.WorkerManager):
         kwargs : dict
             Named arguments to pass to the constructor of the class
             associated with identifier `id`.
+        group : hashable
+            If specified, the module is run by the same MPI process as all
+            other modules added with the same group identifier (see
+            `ModuleGroup`). Group identifiers must differ from module IDs.
         """
 
+        group = kwargs.pop('group', None)
         if not issubclass(target, Module):
             raise ValueError('target is not a Module subclass')
+        if id in self.id_to_rank or id in self.groups:
+            raise ValueError('duplicate module id %s' % id)
+        if group is not None and group in self.id_to_rank:
+            raise ValueError('group identifier %s is a module id' % group)
 
         # Selectors must be passed to the module upon instantiation;
         # the module manager must know about them to assess compatibility:
@@ -746,8 +1881,21 @@ class Manager(mpi.WorkerManager):
         # dict in mpi_backend.py:
         kwargs['id'] = id
         kwargs['rank_to_id'] = self.rank_to_id
-        rank = super(Manager, self).add(target, *args, **kwargs)
-        self.rank_to_id[rank] = id
+        if group is None:
+            rank = super(Manager, self).add(target, *args, **kwargs)
+            self.rank_to_id[rank] = id
+        else:
+            module = (target, mpi.args_to_dict(target.__init__, *args, **kwargs))
+            if group in self.groups:
+                rank = self.rank_to_id.inv[group]
+                self._kwargs[rank]['modules'].append(module)
+            else:
+                rank = super(Manager, self).add(ModuleGroup, [module], [],
+                                                self._ctrl_tag)
+                self.rank_to_id[rank] = group
+                self.groups[group] = []
+            self.groups[group].append(id)
+        self.id_to_rank[id] = rank
 
     def connect(self, id_0, id_1, pat, int_0=0, int_1=1):
         """
@@ -766,12 +1914,16 @@ class Manager(mpi.WorkerManager):
 
         if not isinstance(pat, Pattern):
             raise ValueError('pat is not a Pattern instance')
-        if id_0 not in self.rank_to_id.values():
+        if id_0 not in self.id_to_rank:
             raise ValueError('unrecognized module id %s' % id_0)
-        if id_1 not in self.rank_to_id.values():
+        if id_1 not in self.id_to_rank:
             raise ValueError('unrecognized module id %s' % id_1)
         if not (int_0 in pat.interface_ids and int_1 in pat.interface_ids):
             raise ValueError('unrecognized pattern interface identifiers')
+        shapes = [self._batch_shape(id_0), self._batch_shape(id_1)]
+        if None not in shapes and shapes[0] != shapes[1]:
+            raise ValueError('modules {0} and {1} have different numbers of '
+                             'replicas'.format(id_0, id_1))
         self.log_info('connecting modules {0} and {1}'
                       .format(id_0, id_1))
 
@@ -788,6 +1940,341 @@ class Manager(mpi.WorkerManager):
 
         self.log_info('connected modules {0} and {1}'.format(id_0, id_1))
 
+    def connectivity_matrix(self):
+        """
+        Matrix of the amount of data transmitted between modules per step.
+
+        Returns
+        -------
+        m : numpy.ndarray
+            `m[i, j]` is the number of ports in the module with MPI rank `i`
+            whose data is transmitted to the module with MPI rank `j` during
+            each execution step, as specified by the routing table.
+        """
+
+        N = len(self.rank_to_id)
+        m = np.zeros((N, N))
+        for id_0, id_1 in self.routing_table.connections:
+            data = self.routing_table[id_0, id_1]
+            n = len(data['pattern'].src_idx(data['int_0'], data['int_1']))
+            m[self.id_to_rank[id_0], self.id_to_rank[id_1]] += n
+        return m
+
+    def place(self, n_nodes, ranks_per_node, mat=None, hosts=None):
+        """
+        Assign modules to nodes so as to minimize inter-node traffic.
+
+        The modules are partitioned into at most `n_nodes` groups of at most
+        `ranks_per_node` modules such that the amount of data transmitted
+        between modules in different groups is minimized; the modules are then
+        assigned new MPI ranks such that the ranks of the modules in each group
+        are consecutive.
+
+        Parameters
+        ----------
+        n_nodes : int
+            Number of nodes.
+        ranks_per_node : int
+            Maximum number of modules (i.e., MPI processes) per node.
+        mat : numpy.ndarray
+            Matrix of the amount of data transmitted between modules, ordered
+            by the modules' current MPI ranks (e.g., as returned by
+            `comm_matrix()` after a previous run of the same emulation). If
+            None, the matrix returned by `connectivity_matrix()` is used.
+        hosts : sequence of str
+            Names of the nodes. If specified, the modules in each group are
+            spawned on the corresponding host.
+
+        Returns
+        -------
+        placement : list of list
+            IDs of the modules assigned to each node.
+
+        Notes
+        -----
+        Must be invoked after all modules are added and connected and before
+        `spawn()`.
+        """
+
+        from tools.graph import partition
+
+        if hosts is not None and len(hosts) != n_nodes:
+            raise ValueError('number of hosts must equal number of nodes')
+        N = len(self)
+        if mat is None:
+            mat = self.connectivity_matrix()
+        elif np.shape(mat) != (N, N):
+            raise ValueError('invalid matrix shape')
+        parts = partition(mat, n_nodes, ranks_per_node)
+
+        # Assign consecutive ranks to the modules on each node, preserving
+        # their original order:
+        order = np.lexsort((np.arange(N), parts))
+        targets, kwargs, attrs = self._targets, self._kwargs, self._attrs
+        ids = dict(self.rank_to_id)
+        self._targets, self._kwargs, self._attrs = {}, {}, {}
+        self.rank_to_id.clear()
+        for rank, old_rank in enumerate(order):
+            self._targets[rank] = targets[old_rank]
+            self._kwargs[rank] = kwargs[old_rank]
+            if old_rank in attrs:
+                self._attrs[rank] = attrs[old_rank]
+            self.rank_to_id[rank] = ids[old_rank]
+        new_ranks = np.argsort(order)
+        for id, old_rank in self.id_to_rank.items():
+            self.id_to_rank[id] = int(new_ranks[old_rank])
+
+        placement = [[ids[i] for i in order if parts[i] == k] \
+                     for k in xrange(n_nodes)]
+        if hosts is not None:
+            self.hosts = [(host, len(p)) for host, p in zip(hosts, placement)]
+        self.log_info('module placement: %s' % placement)
+        return placement
+
+    def _module_kwargs(self, rank):
+        """
+        Return the IDs and constructor arguments of the modules run by a process.
+
+        Parameters
+        ----------
+        rank : int
+            MPI rank of the process.
+
+        Returns
+        -------
+        modules : list of tuple
+            Each entry is a `(module_id, kwargs)` tuple.
+        """
+
+        if self._targets[rank] is ModuleGroup:
+            return [(kwargs['id'], kwargs) for target, kwargs in \
+                    self._kwargs[rank]['modules']]
+        return [(self.rank_to_id[rank], self._kwargs[rank])]
+
+    def _batch_shape(self, id):
+        """
+        Return the shape of the data associated with each port of a module.
+
+        Parameters
+        ----------
+        id : str
+            Module ID.
+
+        Returns
+        -------
+        shape : tuple
+            Shape of the data of each port in the module's port data arrays
+            (see `Module.batch_shape`), or None if the module's constructor
+            arguments do not include any nonempty port data arrays.
+        """
+
+        kwargs = dict(self._module_kwargs(self.id_to_rank[id]))[id]
+        for k in ['data_gpot', 'data_spike']:
+            if kwargs.get(k) is not None and np.size(kwargs[k]):
+                return np.shape(kwargs[k])[1:]
+        return None
+
+    def compile_link_plans(self, max_workers=None):
+        """
+        Compile the port indices of all connections between modules.
+
+        The plans of the connections defined by each pattern in the routing
+        table are stored in the `link_plans` attribute. Each module receives
+        the plans of its own connections when it is spawned and uses them
+        instead of processing the patterns itself.
+
+        Parameters
+        ----------
+        max_workers : int
+            Maximum number of processes to use to compile the plans of
+            different patterns in parallel. If None, the plans are compiled
+            in the current process unless the patterns' interfaces contain
+            at least `link_plan_pool_ports` ports in total, in which case as
+            many processes as there are processors on the machine are used.
+            If 1, the plans are always compiled in the current process. The
+            plans are also compiled in the current process if MPI has
+            already been initialized in it, as forking processes after
+            initializing MPI is not supported by Open MPI.
+
+        Returns
+        -------
+        link_plans : dict
+            Maps `(src_id, dest_id)` pairs to compiled plans (see
+            `_compile_link_plans()`). Connections to or from modules whose
+            constructor arguments do not include the `sel_gpot` and
+            `sel_spike` selectors do not have plans.
+        """
+
+        # Selectors used by each module to create its port mappers:
+        sels = {}
+        for rank in self._targets:
+            for mod_id, kwargs in self._module_kwargs(rank):
+                if 'sel_gpot' in kwargs and 'sel_spike' in kwargs:
+                    sels[mod_id] = (kwargs['sel_gpot'], kwargs['sel_spike'])
+
+        # Group the connections by pattern so that each pattern is only
+        # transmitted to and processed by a single process:
+        tasks = {}
+        for src_id, dest_id, data in self.routing_table.data.edges_iter(data=True):
+            if src_id not in sels or dest_id not in sels:
+                continue
+            pat = data['pattern']
+            if id(pat) not in tasks:
+                tasks[id(pat)] = (pat, [], {})
+            tasks[id(pat)][1].append((src_id, dest_id,
+                                      data['int_0'], data['int_1']))
+            tasks[id(pat)][2][src_id] = sels[src_id]
+            tasks[id(pat)][2][dest_id] = sels[dest_id]
+
+        self.log_info('compiling link plans for %s patterns' % len(tasks))
+        # Forking a pool of processes costs more than it saves for small
+        # patterns, so it is only used when requested or when the patterns are
+        # large:
+        if max_workers is None:
+            n_ports = sum([len(pat.interface) for pat, links, s in \
+                           tasks.itervalues()])
+            use_pool = n_ports >= self.link_plan_pool_ports
+        else:
+            use_pool = max_workers > 1
+
+        # Open MPI does not support forking processes once MPI has been
+        # initialized (which is deferred until MPI is used; see
+        # neurokernel.tools.mpi.init()):
+        if use_pool and MPI.Is_initialized():
+            self.log_info('MPI initialized - compiling link plans in current '
+                          'process')
+            use_pool = False
+        self.link_plans = {}
+        if len(tasks) > 1 and use_pool:
+            with ProcessPoolExecutor(max_workers) as executor:
+                fs = [executor.submit(_compile_link_plans, *task) \
+                      for task in tasks.itervalues()]
+                for f in fs:
+                    self.link_plans.update(f.result())
+        else:
+            for task in tasks.itervalues():
+                self.link_plans.update(_compile_link_plans(*task))
+        return self.link_plans
+
+    def spawn(self):
+        """
+        Compile the connections' plans and spawn the modules.
+        """
+
+        if self._is_parent:
+            self.compile_link_plans()
+            if self.groups:
+                if self.record_step_stats or self.trace_file is not None or \
+                   self.record_link_waits or self.record_comm:
+                    raise ValueError('execution statistics cannot be recorded '
+                                     'for module groups')
+                for group in self.groups:
+                    for mod_id, kwargs in \
+                            self._module_kwargs(self.rank_to_id.inv[group]):
+                        if kwargs.get('time_sync'):
+                            raise ValueError('time_sync is not supported for '
+                                             'module groups')
+                link_tags = self._compile_link_tags()
+
+            if (self.use_shm or self.backend == 'multiprocessing') and \
+               not shm_supported():
+                raise ValueError('shared memory transport is only supported '
+                                 'on x86 processors')
+
+            # The names of the shared memory segments must be unique among
+            # all emulations running on the same machine:
+            shm_prefix = 'neurokernel-%s' % uuid.uuid4().hex
+
+            # Only send each module the plans of its own connections:
+            for rank, mod_id in self.rank_to_id.iteritems():
+                ids = set([i for i, kwargs in self._module_kwargs(rank)])
+                self._attrs.setdefault(rank, {})['_link_plans'] = \
+                    {k: v for k, v in self.link_plans.iteritems() \
+                     if k[0] in ids or k[1] in ids}
+                if self.groups:
+                    self._attrs[rank]['_link_tags'] = \
+                        {k: v for k, v in link_tags.iteritems() \
+                         if k[0] in ids or k[1] in ids}
+                    self._attrs[rank]['_id_to_rank'] = self.id_to_rank
+                if self.record_step_stats:
+                    self._attrs[rank]['record_step_stats'] = True
+                if self.trace_file is not None:
+                    self._attrs[rank]['tracer'] = Tracer(rank, mod_id)
+                if self.record_link_waits:
+                    self._attrs[rank]['record_link_waits'] = True
+                if self.record_comm:
+                    self._attrs[rank]['record_comm'] = True
+                if self.use_shm or self.backend == 'multiprocessing':
+                    self._attrs[rank]['_shm_prefix'] = shm_prefix
+                    self._attrs[rank]['_shm_timeout'] = self.shm_timeout
+
+            # Each distinct class of the modules in each group is serialized in
+            # the same manner as the targets run by the processes:
+            for group in self.groups:
+                rank = self.rank_to_id.inv[group]
+                class_index = {}
+                targets = []
+                modules = []
+                for target, kwargs in self._kwargs[rank]['modules']:
+                    if target not in class_index:
+                        class_index[target] = len(targets)
+                        targets.append(self._serialize_target(target))
+                    modules.append((class_index[target], kwargs))
+                self._kwargs[rank] = dict(self._kwargs[rank], modules=modules,
+                                          targets=targets)
+        super(Manager, self).spawn()
+
+    def _compile_link_tags(self):
+        """
+        Assign distinct MPI tags to the data transmitted over each connection.
+
+        The data transmitted over different connections between modules in the
+        same pair of processes can then be distinguished regardless of the
+        order in which the transfers are posted.
+
+        Returns
+        -------
+        link_tags : dict
+            Maps `(src_id, dest_id)` pairs to the tags of the transmitted
+            graded potential and spiking port data.
+        """
+
+        link_tags = {}
+        for k, (src_id, dest_id) in \
+                enumerate(sorted(self.routing_table.connections)):
+            link_tags[(src_id, dest_id)] = (SPIKE_TAG+1+2*k, SPIKE_TAG+2+2*k)
+        # The multiprocessing backend transmits all data via shared memory
+        # (and must not initialize MPI):
+        if link_tags and self.backend == 'mpi':
+            init_mpi()
+            if SPIKE_TAG+2*len(link_tags) > \
+               MPI.COMM_WORLD.Get_attr(MPI.TAG_UB):
+                raise ValueError('too many connections for available MPI tags')
+        return link_tags
+
+    def _routing_table_for(self, rank, routing_table):
+        """
+        Return the routing table to transmit to the process with the specified rank.
+
+        Only the connections to or from the modules run by the process are
+        transmitted. The
+        patterns of the connections with compiled plans are omitted because
+        the module does not need them.
+        """
+
+        ids = [i for i, kwargs in self._module_kwargs(rank)]
+        r = routing_table.neighborhood(ids[0])
+        for id in ids[1:]:
+            for src_id, dest_id, data in \
+                    routing_table.neighborhood(id).data.edges_iter(data=True):
+                r.data.add_edge(src_id, dest_id, data)
+            if routing_table.has_node(id):
+                r.data.add_node(id)
+        for src_id, dest_id, data in r.data.edges_iter(data=True):
+            if self.link_plans.get((src_id, dest_id)) is not None:
+                del data['pattern']
+        return r
+
     def process_worker_msg(self, msg):
 
         # Process timing data sent by workers:
@@ -803,65 +2290,331 @@ class Manager(mpi.WorkerManager):
             if stop_time > self.stop_time or self.stop_time == 0.0:
                 self.stop_time = stop_time
                 self.log_info('setting latest stop time: %s' % stop_time)
-        elif msg[0] == 'sync_time':
-            rank, steps, start, stop, nbytes = msg[1]
-            self.log_info('sync time data: %s' % str(msg[1]))
+        elif msg[0] == 'comm':
+            rank, comm, steps = msg[1]
+            src_id = self.rank_to_id[rank]
+            self.comm_bytes[src_id] = {k: v[0] for k, v in comm.iteritems()}
+            self.comm_msgs[src_id] = {k: v[1] for k, v in comm.iteritems()}
+            self.comm_steps[src_id] = steps
+        elif msg[0] == 'link_waits':
+            rank, link_wait_times = msg[1]
+            self.link_wait_times[self.rank_to_id[rank]] = link_wait_times
+        elif msg[0] == 'trace':
+            rank, tracer = msg[1]
+            self.tracers[rank] = tracer
+            self.log_info('trace events from %s: %s' % \
+                          (self.rank_to_id[rank], len(tracer.events)))
+        elif msg[0] == 'step_stats':
+            rank, step_stats = msg[1]
+            self.step_stats[self.rank_to_id[rank]] = step_stats
+            self.log_info('step phase times of %s (mean/p99): %s' % \
+                (self.rank_to_id[rank],
+                 ', '.join(['%s %s/%s' % (phase, h.mean,
+                                          h.percentile(99)) \
+                            for phase, h in sorted(step_stats.iteritems())])))
+        elif msg[0] == 'sync_times':
+            rank, sync_times = msg[1]
+            self.log_info('sync time data: %s steps from %s' % \
+                          (len(sync_times), rank))
+            self.received_data.setdefault(rank, []).append(sync_times)
 
-            # Collect timing data for each execution step:
-            if steps not in self.received_data:
-                self.received_data[steps] = {}                    
-            self.received_data[steps][rank] = (start, stop, nbytes)
+    @property
+    def link_wait_matrix(self):
+        """
+        Matrix of the time spent by modules waiting for data from other modules.
 
-            # After adding the latest timing data for a specific step, check
-            # whether data from all modules has arrived for that step:
-            if set(self.received_data[steps].keys()) == set(self.rank_to_id.keys()):
+        Returns
+        -------
+        m : pandas.DataFrame
+            `m.loc[x, y]` is the total time that module `x` spent waiting for
+            data from module `y`; the entry is 0 if `x` does not receive data
+            from `y`.
+        """
 
-                # Exclude the very first step to avoid including delays due to
-                # PyCUDA kernel compilation:
-                if steps != 0:
+        return pd.DataFrame(self.link_wait_times).T.fillna(0.0)
 
-                    # The duration of an execution step is assumed to be the
-                    # longest of the received intervals:
-                    step_sync_time = max([(d[1]-d[0]) for d in self.received_data[steps].values()])
+    def comm_matrix(self, kind='bytes', per_step=False):
+        """
+        Matrix of the data sent between modules.
 
-                    # Obtain the total number of bytes received by all of the
-                    # modules during the execution step:
-                    step_nbytes = sum([d[2] for d in self.received_data[steps].values()])
+        Parameters
+        ----------
+        kind : {'bytes', 'msgs'}
+            Return the number of bytes or messages.
+        per_step : bool
+            If True, divide the counts by the number of execution steps.
 
-                    self.total_sync_time += step_sync_time
-                    self.total_sync_nbytes += step_nbytes
+        Returns
+        -------
+        m : numpy.ndarray
+            `m[i, j]` is the amount of data sent by the module with MPI rank
+            `i` to the module with MPI rank `j` (i.e., rows and columns are
+            ordered like the modules in `rank_to_id`).
+        """
 
-                    self.average_throughput = (self.average_throughput*self.counter+\
-                                              step_nbytes/step_sync_time)/(self.counter+1)
-                    self.average_step_sync_time = (self.average_step_sync_time*self.counter+\
-                                                   step_sync_time)/(self.counter+1)
+        if kind == 'bytes':
+            counts = self.comm_bytes
+        elif kind == 'msgs':
+            counts = self.comm_msgs
+        else:
+            raise ValueError('invalid kind')
+        N = len(self.rank_to_id)
+        m = np.zeros((N, N))
+        for src_id, d in counts.iteritems():
+            i = self.rank_to_id.inv[src_id]
+            for dest_id, n in d.iteritems():
+                m[i, self.rank_to_id.inv[dest_id]] = n
+            if per_step and self.comm_steps[src_id]:
+                m[i] /= self.comm_steps[src_id]
+        return m
+
+    def write_comm_matrix(self, file_name, kind='bytes', per_step=False):
+        """
+        Write the matrix of the data sent between modules to a CSV file.
 
-                    self.counter += 1
-                else:
+        Parameters
+        ----------
+        file_name : str
+            Name of CSV file to write. The first row and column contain the
+            IDs of the destination and source modules, respectively.
+        kind : {'bytes', 'msgs'}
+            Write the number of bytes or messages.
+        per_step : bool
+            If True, divide the counts by the number of execution steps.
+        """
 
-                    # To exclude the time taken by the first step, set the start
-                    # time to the latest stop time of the first step:
-                    self.start_time = max([d[1] for d in self.received_data[steps].values()])
-                    self.log_info('setting start time to skip first step: %s' % self.start_time)
+        ids = [self.rank_to_id[i] for i in xrange(len(self.rank_to_id))]
+        pd.DataFrame(self.comm_matrix(kind, per_step),
+                     index=ids, columns=ids).to_csv(file_name)
 
-                # Clear the data for the processed execution step so that
-                # that the received_data dict doesn't consume unnecessary memory:
-                del self.received_data[steps]
+    def straggler_report(self):
+        """
+        Rank modules by the time that other modules spent waiting for them.
 
-            # Compute throughput using accumulated timing data:
-            if self.total_sync_time > 0:
-                self.total_throughput = self.total_sync_nbytes/self.total_sync_time
-            else:
-                self.total_throughput = 0.0
+        Returns
+        -------
+        report : list of tuple
+            Tuples containing a module ID, the total time spent by all other
+            modules waiting for data from that module, the ID of the module
+            that waited the longest for it, and the latter module's wait time,
+            sorted in order of decreasing total wait time.
+        """
 
-    def wait(self):
-        super(Manager, self).wait()
+        m = self.link_wait_matrix
+        report = []
+        for src_id in m.columns:
+            col = m[src_id]
+            report.append((src_id, col.sum(), col.idxmax(), col.max()))
+        return sorted(report, key=lambda r: r[1], reverse=True)
+
+    def _compute_sync_stats(self):
+        """
+        Compute synchronization statistics from the timing data sent by the modules.
+
+        Only execution steps for which timing data was received from all of
+        the modules are included. The first step is excluded to avoid including
+        delays due to PyCUDA kernel compilation.
+        """
+
+        if set(self.received_data.keys()) != set(self.rank_to_id.keys()):
+            return
+
+        # Arrange the intervals and number of bytes received by all of the
+        # modules in arrays whose rows correspond to execution steps and whose
+        # columns correspond to modules:
+        data = {rank: np.concatenate(d) for rank, d in \
+                self.received_data.iteritems()}
+        steps = reduce(np.intersect1d, [d[:, 0] for d in data.values()])
+        if not len(steps):
+            return
+        times = np.empty((len(steps), len(data)))
+        stops = np.empty((len(steps), len(data)))
+        nbytes = np.empty((len(steps), len(data)))
+        for j, d in enumerate(data.values()):
+            d = d[np.unique(d[:, 0], return_index=True)[1]]
+            d = d[np.searchsorted(d[:, 0], steps)]
+            times[:, j] = d[:, 2]-d[:, 1]
+            stops[:, j] = d[:, 2]
+            nbytes[:, j] = d[:, 3]
+
+        # To exclude the time taken by the first step, set the start time to
+        # the latest stop time of the first step:
+        if steps[0] == 0:
+            self.start_time = stops[0].max()
+            self.log_info('setting start time to skip first step: %s' % \
+                          self.start_time)
+            times = times[1:]
+            nbytes = nbytes[1:]
+        if not len(times):
+            return
+
+        # The duration of an execution step is assumed to be the longest of
+        # the received intervals; the number of bytes received during the step
+        # is the total received by all of the modules:
+        step_sync_time = times.max(axis=1)
+        step_nbytes = nbytes.sum(axis=1)
+
+        self.counter = len(step_sync_time)
+        self.total_sync_time = step_sync_time.sum()
+        self.total_sync_nbytes = step_nbytes.sum()
+        self.average_step_sync_time = step_sync_time.mean()
+        self.average_throughput = (step_nbytes/step_sync_time).mean()
+        self.step_sync_time_percentiles = \
+            dict(zip(self.sync_time_percentiles,
+                     np.percentile(step_sync_time, self.sync_time_percentiles)))
+        if self.total_sync_time > 0:
+            self.total_throughput = self.total_sync_nbytes/self.total_sync_time
+        else:
+            self.total_throughput = 0.0
+
+    def wait(self, timeout=None):
+        if not super(Manager, self).wait(timeout):
+            return False
+        self._compute_sync_stats()
+        if self.link_wait_times:
+            for src_id, total, dest_id, t in self.straggler_report():
+                self.log_info('modules waited %s s for %s (longest: %s, %s s)' % \
+                              (total, src_id, dest_id, t))
+        if self.trace_file is not None:
+            write_chrome_trace([self.tracers[k] for k in sorted(self.tracers)],
+                               self.trace_file)
+            self.log_info('wrote trace events to %s' % self.trace_file)
         self.log_info('avg step sync time/avg per-step throughput' \
                       '/total transm throughput/run loop duration:' \
                       '%s, %s, %s, %s' % \
                       (self.average_step_sync_time, self.average_throughput, 
                        self.total_throughput, self.stop_time-self.start_time))
+        return True
         
+class LocalManager(Manager):
+    """
+    Module manager that runs all modules sequentially in the current process.
+
+    The modules are instantiated and initialized by `spawn()` and executed in
+    lockstep by `start()`: the `run_step()` methods of all of the modules are
+    executed, after which the data transmitted over each connection is copied
+    directly between the modules' data arrays using the compiled link plans.
+    Since each module receives the same data during each step as when it is
+    run in its own process, the results are identical to those obtained with
+    `Manager`.
+
+    No processes are spawned and no MPI transfers are performed, so the
+    emulation starts quickly and the execution of the modules' `run_step()`
+    methods can be profiled directly, e.g., with
+    `cProfile.run('man.start(100)')`.
+
+    Parameters
+    ----------
+    required_args : list of str
+        Arguments that the constructors of the module classes must accept.
+    ctrl_tag : int
+        MPI tag to identify control messages.
+
+    Notes
+    -----
+    Modules added with the `group` argument of `add()` are run like all of
+    the other modules. Execution statistics cannot be recorded, and the
+    modules' `time_sync` flags must not be set.
+    """
+
+    def __init__(self, required_args=['sel', 'sel_in', 'sel_out',
+                                      'sel_gpot', 'sel_spike'],
+                 ctrl_tag=CTRL_TAG):
+        super(LocalManager, self).__init__(required_args, ctrl_tag)
+
+        # Module instances in the order in which they were added:
+        self.modules = collections.OrderedDict()
+
+        # Connections over which data is copied after each step:
+        self._local_links = []
+
+        # Number of steps executed:
+        self._steps = 0
+
+    def spawn(self):
+        """
+        Instantiate the modules and initialize the connections between them.
+        """
+
+        if self.record_step_stats or self.trace_file is not None or \
+           self.record_link_waits or self.record_comm:
+            raise ValueError('execution statistics cannot be recorded by '
+                             'LocalManager')
+        self.compile_link_plans(max_workers=1)
+        for rank in sorted(self._targets):
+            if self._targets[rank] is ModuleGroup:
+                modules = self._kwargs[rank]['modules']
+            else:
+                modules = [(self._targets[rank], self._kwargs[rank])]
+            for target, kwargs in modules:
+                m = target(**dict(kwargs, routing_table=self.routing_table))
+                if m.time_sync:
+                    raise ValueError('time_sync is not supported by '
+                                     'LocalManager')
+                m._in_group = True
+                m._link_plans = self.link_plans
+                m._id_to_rank = self.id_to_rank
+                self.modules[m.id] = m
+        for m in self.modules.itervalues():
+            m.pre_run()
+        self._local_links = _local_links(self.modules.values())
+        self.log_info('%s connections between modules' % \
+                      len(self._local_links))
+
+    def start(self, steps=float('inf'), ctrl_interval=None):
+        """
+        Execute the modules for the specified number of steps.
+
+        Unlike `Manager.start()`, this method returns after the steps have
+        been executed; it may be invoked repeatedly to continue the emulation.
+
+        Parameters
+        ----------
+        steps : int
+            Number of steps to execute.
+        ctrl_interval : int
+            Ignored.
+        """
+
+        if steps == float('inf'):
+            raise ValueError('number of steps must be finite')
+        self.start_time = time.time()
+        for i in xrange(int(steps)):
+            for m in self.modules.itervalues():
+                m.steps = self._steps
+                if m.debug:
+                    m.run_step()
+                else:
+                    catch_exception(m.run_step, m.log_info)
+            for src, dest, t, src_inds, dest_inds in self._local_links:
+                set_by_inds_from_inds(dest.data[t], dest_inds,
+                                      src.data[t], src_inds)
+            self._steps += 1
+        self.stop_time = time.time()
+        self.log_info('executed %s steps' % steps)
+
+    def stop(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def wait(self, timeout=None):
+        """
+        Finalize the modules.
+
+        Returns
+        -------
+        result : bool
+            Always True.
+        """
+
+        for m in self.modules.itervalues():
+            m.steps = self._steps
+            m.post_run()
+        self.log_info('finished running modules')
+        return True
+
 if __name__ == '__main__':
     import neurokernel.mpi_relaunch
 
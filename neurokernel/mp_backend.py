@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+"""
+Backend that runs targets in processes created with multiprocessing.
+
+Targets run by this backend do not require MPI: control messages are
+exchanged with the manager over pipes, and the data transmitted between
+modules is transmitted via shared memory (see `neurokernel.tools.shm`). Since
+the processes are forked from the manager's process, the targets and their
+arguments need not be serialized; the backend is therefore limited to a
+single machine.
+
+MPI must not have been initialized when the processes are forked, as Open MPI
+does not support forking initialized processes; only the constants defined by
+mpi4py are used by this backend (importing neurokernel prevents mpi4py from
+initializing MPI when it is imported).
+"""
+
+import collections
+import errno
+import socket
+import time
+
+from mpi4py import MPI
+import twiggy
+
+import neurokernel.tools.mpi
+from neurokernel.mpi_proc import Process
+from neurokernel.tools.shm import wait_until
+
+class PipeComm(object):
+    """
+    Communicator that transmits objects over multiprocessing pipes.
+
+    Implements the subset of the mpi4py communicator interface used to
+    exchange control messages between a manager and its workers.
+
+    Parameters
+    ----------
+    conns : list of multiprocessing.Connection
+        Connections to the remote processes, ordered by rank.
+
+    Notes
+    -----
+    Objects are transmitted as soon as they are sent; the requests returned
+    by `isend()` are therefore always complete. Received objects
+    whose tags do not match the requested tag are queued until they are
+    requested. Objects sent to processes that have exited are discarded.
+    """
+
+    def __init__(self, conns):
+        self._conns = conns
+        self._queued = [collections.deque() for conn in conns]
+
+        # Ranks of the processes that closed their end of the connection:
+        self._closed = set()
+
+    def Get_remote_size(self):
+        return len(self._conns)
+
+    def send(self, obj, dest, tag=0):
+        if dest in self._closed:
+            return
+        try:
+            self._conns[dest].send((tag, obj))
+        except IOError as e:
+            if e.errno != errno.EPIPE:
+                raise
+            self._closed.add(dest)
+
+    def isend(self, obj, dest, tag=0):
+        self.send(obj, dest, tag)
+        return PipeRequest()
+
+    def _find(self, source, tag):
+        """
+        Find the first received object with the specified source and tag.
+
+        Returns
+        -------
+        result : tuple
+            Source and position in the source's queue of the object, or None
+            if no matching object has been received.
+        """
+
+        if source == MPI.ANY_SOURCE:
+            sources = xrange(len(self._conns))
+        else:
+            sources = [source]
+        for s in sources:
+            conn = self._conns[s]
+            try:
+                while s not in self._closed and conn.poll():
+                    self._queued[s].append(conn.recv())
+            except EOFError:
+                self._closed.add(s)
+            for i, (t, obj) in enumerate(self._queued[s]):
+                if tag == MPI.ANY_TAG or t == tag:
+                    return s, i
+        return None
+
+    def Iprobe(self, source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
+        return self._find(source, tag) is not None
+
+    def recv(self, buf=None, source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
+        result = []
+        wait_until(lambda: result.append(self._find(source, tag)) or \
+                   result[-1] is not None)
+        s, i = result[-1]
+        t, obj = self._queued[s][i]
+        del self._queued[s][i]
+        return obj
+
+class PipeRequest(object):
+    """
+    Completed request of an object sent by `PipeComm.isend()`.
+
+    Unlike `MPI.REQUEST_NULL`, waiting for the request does not require MPI to
+    have been initialized.
+    """
+
+    def Wait(self):
+        pass
+
+    def Test(self):
+        return True
+
+def run_target(target, kwargs, attrs, routing_table, conn, rank, size,
+               start_time):
+    """
+    Instantiate and run a target in a process forked by the manager.
+
+    Parameters
+    ----------
+    target : Process
+        Class to instantiate and run.
+    kwargs : dict
+        Named arguments to pass to the target class constructor.
+    attrs : dict
+        Attributes to set on the instantiated target.
+    routing_table : neurokernel.routing_table.RoutingTable
+        Routing table to pass to the target class constructor.
+    conn : multiprocessing.Connection
+        Connection to the manager.
+    rank : int
+        Rank assigned to the target.
+    size : int
+        Number of targets run by the manager.
+    start_time : float
+        Time at which the manager started the process.
+    """
+
+    # MPI I/O cannot be used by the forked processes; the messages they log
+    # via MPIOutput emitters are instead written to separate files:
+    for k, v in twiggy.emitters.items():
+        if isinstance(v._output, neurokernel.tools.mpi.MPIOutput):
+            twiggy.add_emitters((k, v.min_level, None,
+                twiggy.outputs.FileOutput('%s.%s' % (v._output.filename, rank),
+                                          v._output._format, 'w')))
+
+    # The properties of Process that are otherwise obtained from MPI are set
+    # for all instances in the process (including the members of module
+    # groups); all processes run on the same machine:
+    Process._rank = rank
+    Process._size = size
+    Process._intercomm = PipeComm([conn])
+    Process._intracomm = MPI.COMM_NULL
+    Process._processor_names = [socket.gethostname()]*size
+
+    instance = target(**dict(kwargs, routing_table=routing_table))
+    for k, v in attrs.iteritems():
+        setattr(instance, k, v)
+    instance._startup_latency = ('fork', 0.0, time.time()-start_time)
+    instance.run()
@@ -9,14 +9,81 @@ import os
 import re
 import subprocess
 import sys
+import time
+import uuid
 
 from mpi4py import MPI
 
-from mpi_proc import getargnames, Process, ProcessManager
+from mpi_proc import args_to_dict, getargnames, load_target, Process, \
+    ProcessManager
 from mixins import LoggerMixin
 from tools.logging import setup_logger, set_excepthook
 from tools.misc import memoized_property
 
+def _probe_idle(comm, source, tag, timeout=None, max_interval=0.01):
+    """
+    Wait for a message without occupying the processor.
+
+    Blocking receives and waits in some MPI implementations poll for messages
+    continuously; this function polls with exponentially increasing sleep
+    intervals instead.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+        Communicator on which to wait for the message.
+    source : int
+        Rank of the sender.
+    tag : int
+        Message tag.
+    timeout : float
+        Maximum time (in seconds) to wait. If None, wait indefinitely.
+    max_interval : float
+        Maximum time (in seconds) between polls.
+
+    Returns
+    -------
+    result : bool
+        True if a message can be received, False if the timeout elapsed
+        before a message arrived.
+    """
+
+    if timeout is not None:
+        deadline = time.time()+timeout
+    interval = 1e-5
+    while not comm.Iprobe(source=source, tag=tag):
+        if timeout is None:
+            time.sleep(interval)
+        else:
+            remaining = deadline-time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(interval, remaining))
+        interval = min(2*interval, max_interval)
+    return True
+
+def _recv_idle(comm, source, tag):
+    """
+    Receive a message without occupying the processor while waiting for it.
+
+    Parameters
+    ----------
+    comm : mpi4py.MPI.Comm
+        Communicator on which to receive the message.
+    source : int
+        Rank of the sender.
+    tag : int
+        Message tag.
+
+    Returns
+    -------
+    msg : object
+        Received message.
+    """
+
+    _probe_idle(comm, source, tag)
+    return comm.recv(source=source, tag=tag)
+
 class Worker(Process):
     """
     MPI worker class.
@@ -27,8 +94,21 @@ class Worker(Process):
     ----------
     ctrl_tag : int
         MPI tag to identify control messages transmitted to worker nodes.
+
+    Attributes
+    ----------
+    tracer : neurokernel.tools.timing.Tracer
+        If not None, the start and stop times of each execution step are
+        recorded by the tracer.
     """
 
+    tracer = None
+
+    # Identifier of the manager's run; set by the manager. Control messages
+    # sent for other runs (e.g., to the previous worker run by a process in a
+    # persistent pool) are discarded:
+    _run_id = None
+
     def __init__(self, ctrl_tag=1, *args, **kwargs):
         super(Worker, self).__init__(*args, **kwargs)
 
@@ -55,6 +135,23 @@ class Worker(Process):
                       (self._max_steps, value))
         self._max_steps = value
 
+    # Number of execution steps between checks for control messages while the
+    # work method is being executed:
+    _ctrl_interval = 1
+    @property
+    def ctrl_interval(self):
+        """
+        Number of execution steps between checks for control messages.
+        """
+        return self._ctrl_interval
+    @ctrl_interval.setter
+    def ctrl_interval(self, value):
+        if value < 1:
+            raise ValueError('invalid control message interval')
+        self.log_info('control message interval changed: %s -> %s' % \
+                      (self._ctrl_interval, value))
+        self._ctrl_interval = value
+
     def do_work(self):
         """
         Work method.
@@ -95,29 +192,41 @@ class Worker(Process):
         Main body of worker process.
         """
 
+        # Report the startup latency recorded by the backend to the manager:
+        if self._startup_latency is not None:
+            self.log_info('startup latency (%s): load %s s, total %s s' % \
+                          self._startup_latency)
+            self.intercomm.isend(['startup', (self.rank,)+self._startup_latency],
+                                 0, self._ctrl_tag)
+
         self.pre_run()
 
         self.log_info('running body of worker %s' % self.rank)
 
-        # Start listening for control messages from parent process:
-        r_ctrl = []
-        try:
-            d = self.intercomm.irecv(source=0, tag=self._ctrl_tag)
-        except TypeError:
-            # irecv() in mpi4py 1.3.1 stable uses 'dest' instead of 'source':
-            d = self.intercomm.irecv(dest=0, tag=self._ctrl_tag)
-        r_ctrl.append(d)
-
         running = False
-        req = MPI.Request()
         self.steps = 0
         while True:
 
-            # Handle control messages (this assumes that only one control
-            # message will arrive at a time):
-            flag, msg_list = req.testall(r_ctrl)
-            if flag:
-                msg = msg_list[0]
+            # Block until a control message arrives while the work method is
+            # not being executed; while it is being executed, only check for
+            # control messages every `ctrl_interval` steps (this assumes that
+            # only one control message will arrive at a time):
+            if not running:
+                msg = _recv_idle(self.intercomm, 0, self._ctrl_tag)
+            elif self.steps % self.ctrl_interval == 0 and \
+                    self.intercomm.Iprobe(source=0, tag=self._ctrl_tag):
+                msg = self.intercomm.recv(source=0, tag=self._ctrl_tag)
+            else:
+                msg = None
+
+            if msg is not None:
+                run_id, msg = msg
+                if run_id != self._run_id:
+                    self.log_info('discarding control message of another '
+                                  'run: %s' % str(msg))
+                    msg = None
+
+            if msg is not None:
 
                 # Start executing work method:
                 if msg[0] == 'start':
@@ -140,6 +249,10 @@ class Worker(Process):
                         self.max_steps = int(msg[1])
                     self.log_info('setting maximum steps to %s' % self.max_steps)
 
+                # Set the number of steps between checks for control messages:
+                elif msg[0] == 'ctrl_interval':
+                    self.ctrl_interval = int(msg[1])
+
                 # Quit:
                 elif msg[0] == 'quit':
                     if self.max_steps == float('inf'):
@@ -148,21 +261,18 @@ class Worker(Process):
                     else:
                         self.log_info('max steps set - not quitting')
 
-                # Get next message:
-                r_ctrl = []
-                try:
-                    d = self.intercomm.irecv(source=0, tag=self._ctrl_tag)
-                except TypeError:
-                    # irecv() in mpi4py 1.3.1 stable uses 'dest' instead of 'source':
-                    d = self.intercomm.irecv(dest=0, tag=self._ctrl_tag)
-                r_ctrl.append(d)
-
             # Execute work method; the work method may send data back to the master
             # as a serialized control message containing two elements, e.g.,
             # self.intercomm.isend(['foo', str(self.rank)],
             #                      dest=0, tag=self._ctrl_tag)            
             if running:
-                self.do_work()
+                if self.tracer is None:
+                    self.do_work()
+                else:
+                    start = time.time()
+                    self.do_work()
+                    self.tracer.add('step', 'step', start, time.time(),
+                                    self.steps)
                 self.steps += 1
                 self.log_info('execution step: %s' % self.steps)
 
@@ -171,6 +281,14 @@ class Worker(Process):
                 self.log_info('maximum steps reached')
                 break
 
+        # Discard any control messages that have not been received (e.g., a
+        # stop message sent after the maximum number of steps was reached) so
+        # that they are not received by workers of subsequent runs on the same
+        # process:
+        while self.intercomm.Iprobe(source=0, tag=self._ctrl_tag):
+            msg = self.intercomm.recv(source=0, tag=self._ctrl_tag)
+            self.log_info('discarding control message: %s' % str(msg[1]))
+
         self.post_run()
 
 class WorkerManager(ProcessManager):
@@ -190,18 +308,24 @@ class WorkerManager(ProcessManager):
     ctrl_tag : int
         MPI tag to identify control messages transmitted to worker nodes.
         May not be equal to mpi4py.MPI.ANY_TAG
+    pool : neurokernel.mpi_proc.ProcessPool
+        Pool of processes on which to run the workers. If None, new processes
+        are spawned for the workers.
+    backend : str
+        Backend that runs the workers; see `neurokernel.mpi_proc.ProcessManager`.
 
     Notes
     -----
-    This class requires MPI-2 dynamic processing management.
+    This class requires MPI-2 dynamic processing management unless the
+    multiprocessing backend is used.
 
     See Also
     --------
     Worker
     """
 
-    def __init__(self, ctrl_tag=1):
-        super(WorkerManager, self).__init__()
+    def __init__(self, ctrl_tag=1, pool=None, backend='mpi'):
+        super(WorkerManager, self).__init__(pool, backend)
 
         # Validate control tag.
         assert ctrl_tag != MPI.ANY_TAG                           
@@ -209,6 +333,17 @@ class WorkerManager(ProcessManager):
         # Tag used to distinguish MPI control messages:
         self._ctrl_tag = ctrl_tag
 
+        # Startup latencies reported by the workers:
+        self.startup_latency = {}
+
+        # Ranks of the workers that have not finished running; initialized by
+        # the first invocation of wait():
+        self._workers = None
+
+        # Identifier sent with each control message so that the workers can
+        # discard messages sent by other managers:
+        self._run_id = uuid.uuid4().hex
+
     def add(self, target, *args, **kwargs):
         """
         Add a worker to an MPI application.
@@ -227,6 +362,16 @@ class WorkerManager(ProcessManager):
         self.log_info('adding class %s' % target.__name__)
         return ProcessManager.add(self, target, *args, **kwargs)
 
+    def spawn(self):
+        """
+        Spawn MPI processes for and execute each of the managed workers.
+        """
+
+        # The workers discard control messages sent with other run IDs:
+        for rank in self._targets:
+            self._attrs.setdefault(rank, {})['_run_id'] = self._run_id
+        return super(WorkerManager, self).spawn()
+
     def process_worker_msg(self, msg):
         """
         Process the specified deserialized message from a worker.
@@ -234,63 +379,109 @@ class WorkerManager(ProcessManager):
         
         self.log_info('got ctrl msg: %s' % str(msg))
 
-    def wait(self):
+    def wait(self, timeout=None):
         """
         Wait for execution to complete.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximum time (in seconds) to wait for the workers to finish. If
+            None, wait indefinitely.
+
+        Returns
+        -------
+        result : bool
+            True if all of the workers finished, False if the timeout elapsed
+            first; `wait()` may be invoked again in the latter case.
         """
 
-        # Start listening for control messages:
-        r_ctrl = []
-        try:
-            d = self.intercomm.irecv(source=MPI.ANY_SOURCE,
-                                     tag=self._ctrl_tag)
-        except TypeError:
-            # irecv() in mpi4py 1.3.1 stable uses 'dest' instead of 'source':
-            d = self.intercomm.irecv(dest=MPI.ANY_SOURCE,
-                                     tag=self._ctrl_tag)
-        r_ctrl.append(d)
-        workers = range(len(self))
-        req = MPI.Request()
-        while True:
-            # Check for control messages from workers:
-            flag, msg_list = req.testall(r_ctrl)
-            if flag:
-                msg = msg_list[0]
+        if self._workers is None:
+            self._workers = range(len(self))
+        if timeout is not None:
+            deadline = time.time()+timeout
+        while self._workers:
+
+            # Wait for control messages from the workers without occupying
+            # the processor:
+            if timeout is None:
+                remaining = None
+            else:
+                remaining = max(deadline-time.time(), 0)
+            if not _probe_idle(self.intercomm, MPI.ANY_SOURCE, self._ctrl_tag,
+                               remaining):
+                self.log_info('timed out waiting for workers %s' % \
+                              self._workers)
+                return False
+
+            # Process all queued control messages:
+            while self.intercomm.Iprobe(source=MPI.ANY_SOURCE,
+                                        tag=self._ctrl_tag):
+                msg = self.intercomm.recv(source=MPI.ANY_SOURCE,
+                                          tag=self._ctrl_tag)
                 if msg[0] == 'done':
                     self.log_info('removing %s from worker list' % msg[1])
-                    workers.remove(msg[1])
+                    self._workers.remove(msg[1])
+
+                # Record how each worker's target was loaded, the time taken to
+                # load it, and the total time taken to start the worker:
+                elif msg[0] == 'startup':
+                    rank, path, load_time, total_time = msg[1]
+                    self.startup_latency[rank] = (path, load_time, total_time)
+                    self.log_info('startup latency of worker %s (%s): '
+                                  'load %s s, total %s s' % msg[1])
 
                 # Additional control messages from the workers are processed
                 # here:
                 else:
                     self.process_worker_msg(msg)
 
-                # Get new control messages:
-                r_ctrl = []
-                try:
-                    d = self.intercomm.irecv(source=MPI.ANY_SOURCE,
-                                             tag=self._ctrl_tag)
-                except TypeError:
-                    # irecv() in mpi4py 1.3.1 stable uses 'dest' instead of 'source':
-                    d = self.intercomm.irecv(dest=MPI.ANY_SOURCE,
-                                             tag=self._ctrl_tag)
-                r_ctrl.append(d)
-
-            if not workers:
-                self.log_info('finished running manager')
-                break
+        self._join()
+        self.log_info('finished running manager')
+        return True
 
-    def start(self, steps=float('inf')):
+    def _send_ctrl(self, msg):
+        """
+        Send a control message to all of the workers.
+
+        Parameters
+        ----------
+        msg : list
+            Control message.
+        """
+
+        requests = [self.intercomm.isend((self._run_id, msg), dest,
+                                         self._ctrl_tag) \
+                    for dest in xrange(len(self))]
+
+        # The multiprocessing backend transmits the messages immediately and
+        # does not initialize MPI:
+        if self.backend == 'mpi':
+            MPI.Request.Waitall(requests)
+
+    def start(self, steps=float('inf'), ctrl_interval=None):
         """
         Tell the workers to start processing data.
+
+        Parameters
+        ----------
+        steps : int
+            Number of steps to execute.
+        ctrl_interval : int
+            Number of execution steps between the workers' checks for control
+            messages. Larger values reduce the per-step overhead of the
+            workers but delay their response to `stop()` and `quit()`. If
+            None, the workers' current setting is retained.
         """
 
+        if ctrl_interval is not None:
+            self.log_info('sending control message interval (%s)' % \
+                          ctrl_interval)
+            self._send_ctrl(['ctrl_interval', str(ctrl_interval)])
         self.log_info('sending steps message (%s)' % steps)
-        for dest in xrange(len(self)):
-            self.intercomm.isend(['steps', str(steps)], dest, self._ctrl_tag)
+        self._send_ctrl(['steps', str(steps)])
         self.log_info('sending start message')
-        for dest in xrange(len(self)):
-            self.intercomm.isend(['start'], dest, self._ctrl_tag)
+        self._send_ctrl(['start'])
 
     def stop(self):
         """
@@ -298,8 +489,7 @@ class WorkerManager(ProcessManager):
         """
 
         self.log_info('sending stop message')
-        for dest in xrange(len(self)):
-            self.intercomm.isend(['stop'], dest, self._ctrl_tag)
+        self._send_ctrl(['stop'])
 
     def quit(self):
         """
@@ -307,8 +497,7 @@ class WorkerManager(ProcessManager):
         """
 
         self.log_info('sending quit message')
-        for dest in xrange(len(self)):
-            self.intercomm.isend(['quit'], dest, self._ctrl_tag)
+        self._send_ctrl(['quit'])
 
 if __name__ == '__main__':
     import neurokernel.mpi_relaunch
@@ -4,7 +4,13 @@
 Backend program invoked by MPI spawn.
 """
 
-import importlib
+import time
+
+# Time at which the process started; used to report the startup latency (the
+# names are prefixed with an underscore to avoid being clobbered by the
+# transmitted globals inserted into the script's scope below):
+_now = time.time
+_start_time = _now()
 
 # Use dill for mpi4py object serialization to accomodate a wider range of argument
 # possibilities than possible with pickle:
@@ -30,7 +36,11 @@ def save_property(pickler, obj):
 # https://github.com/uqfoundation/dill/issues/91
 import atexit
 
+import numpy as np
 import twiggy
+
+# MPI is initialized here when mpi4py.MPI is imported; this must precede the
+# import of neurokernel, which defers the initialization of MPI:
 from mpi4py import MPI
 
 # mpi4py has changed the method to override pickle with dill various times
@@ -63,7 +73,7 @@ rank = MPI.COMM_WORLD.Get_rank()
 parent = MPI.Comm.Get_parent()
 
 # Get emitters transmitted from spawning process:
-emitters = parent.recv()
+emitters = dill.loads(parent.recv())
 
 # If any of the emitters contain MPIOutput instances, they need to be replaced
 # by newly initialized instances so that they write to valid file handles and
@@ -84,20 +94,68 @@ for k, v in emitters.iteritems():
     else:
         twiggy.emitters[k] = v
 
-# Get the routing table:
-routing_table =  parent.bcast(None, root=0)
-
-# Get the target class/function and its constructor arguments:
-target, target_globals, kwargs = parent.recv()
-
-# Insert the transmitted globals into the current scope:
-globals()[target.__name__] = target
-for k, n in target_globals.iteritems():
-    globals()[k] = n
-
-# Add the routing table to the target arguments:
-kwargs['routing_table'] = routing_table
-
-# Instantiate and run the target class:
-instance = target(**kwargs)
-instance.run()
+# Find the processors on which all of the spawned processes are running so
+# that the targets can determine which of their peers run on the same machine:
+Process._processor_names = MPI.COMM_WORLD.allgather(MPI.Get_processor_name())
+
+# Run the targets assigned by the parent; if the processes belong to a
+# persistent pool, they wait for further runs (retaining any imported modules)
+# until they are told to exit (the loop variables are prefixed with an
+# underscore for the same reason as the start time):
+_first_run = True
+while True:
+    _command, _persistent, _num_targets = parent.bcast(None, root=0)
+    if _command == 'exit':
+        break
+
+    # The startup latency of subsequent runs only includes the time taken to
+    # receive and instantiate the target:
+    if not _first_run:
+        _start_time = _now()
+    _first_run = False
+
+    # Get the serialized target classes/functions and the globals they require:
+    targets = parent.bcast(None, root=0)
+
+    # Processes in a pool that are not assigned a target during a run wait for
+    # the next run:
+    if rank >= _num_targets:
+        continue
+
+    # Get the part of the routing table required by the target; the data sent
+    # by the parent to start a run has tag 0, which distinguishes it from
+    # control messages sent to the workers of previous runs that were not
+    # received by them:
+    routing_table = dill.loads(parent.recv(source=0, tag=0))
+
+    # Get the index of the target to instantiate, its constructor arguments, and the
+    # attributes to set on the instantiated target; numpy arrays in the constructor
+    # arguments are received separately as raw buffers:
+    target_index, kwargs, arrays, attrs = dill.loads(parent.recv(source=0,
+                                                                 tag=0))
+    for k, dtype, shape in arrays:
+        kwargs[k] = np.empty(shape, dtype)
+        parent.Recv([kwargs[k], MPI.BYTE], source=0, tag=0)
+
+    # Only deserialize the target that is instantiated by this process; targets
+    # that can be imported are transmitted by reference:
+    _load_start_time = _now()
+    target, _target_path = \
+        neurokernel.mpi_proc.load_target(targets[target_index])
+    del targets
+    _load_time = _now()-_load_start_time
+
+    # Add the routing table to the target arguments:
+    kwargs['routing_table'] = routing_table
+
+    # Instantiate and run the target class:
+    instance = target(**kwargs)
+    for k, v in attrs.iteritems():
+        setattr(instance, k, v)
+
+    # Record how the target was loaded, the time taken to load it, and the time
+    # elapsed between the start of the process and the instantiation of the target:
+    instance._startup_latency = (_target_path, _load_time, _now()-_start_time)
+    instance.run()
+    if not _persistent:
+        break
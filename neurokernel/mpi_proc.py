@@ -4,9 +4,12 @@
 Classes for managing MPI-based processes.
 """
 
+import importlib
 import inspect
+import multiprocessing
 import os
 import sys
+import time
 from routing_table import RoutingTable
 
 # Use dill for mpi4py object serialization to accomodate a wider range of argument
@@ -18,6 +21,7 @@ import dill
 def save_property(pickler, obj):
     pickler.save_reduce(property, (obj.fget, obj.fset, obj.fdel), obj=obj)
 
+import numpy as np
 import twiggy
 from mpi4py import MPI
 
@@ -37,6 +41,7 @@ except AttributeError:
 
 from mixins import LoggerMixin
 from tools.logging import set_excepthook
+from tools.mpi import init as init_mpi
 from tools.misc import memoized_property
 from all_global_vars import all_global_vars
 
@@ -96,13 +101,66 @@ def args_to_dict(f, *args, **kwargs):
         d[arg] = val
     return d
 
+def load_target(data):
+    """
+    Load a target class serialized by `ProcessManager._serialize_target()`.
+
+    Parameters
+    ----------
+    data : str
+        Serialized target class or reference to it.
+
+    Returns
+    -------
+    target : Process
+        Target class.
+    target_path : str
+        'ref' if the class was imported by name, 'dill' if it was deserialized.
+
+    Notes
+    -----
+    The class and the globals transmitted with it are inserted into the
+    namespace of the `__main__` module (i.e., the backend script), in which
+    the functions of classes serialized by value look up their globals.
+    """
+
+    target_path, data = dill.loads(data)
+    if target_path == 'ref':
+        module_name, name, path = data
+        if path not in sys.path:
+            sys.path.append(path)
+        target = getattr(importlib.import_module(module_name), name)
+        target_globals = {}
+    else:
+        target, target_globals = data
+
+    main_globals = sys.modules['__main__'].__dict__
+    main_globals[target.__name__] = target
+    for k, n in target_globals.iteritems():
+        main_globals[k] = n
+    return target, target_path
+
 class Process(LoggerMixin):
     """
     Process class.
+
+    Notes
+    -----
+    MPI is initialized when the process' MPI properties are first accessed
+    unless they were set by the backend that runs the process.
     """
 
+    # How the process' class was loaded by the MPI backend, the time taken to
+    # load it, and the time elapsed between the start of the process and the
+    # instantiation of the class; set by the backend:
+    _startup_latency = None
+
+    # Names of the processors on which the processes spawned together with the
+    # current process are running, ordered by rank; set by the backend:
+    _processor_names = None
+
     def __init__(self, *args, **kwargs):        
-        LoggerMixin.__init__(self, 'prc %s' % MPI.COMM_WORLD.Get_rank())
+        LoggerMixin.__init__(self, 'prc %s' % self.rank)
         set_excepthook(self.logger, True)
 
         self._args = args
@@ -114,6 +172,7 @@ class Process(LoggerMixin):
         Intracommunicator to access peer processes.
         """
 
+        init_mpi()
         return MPI.COMM_WORLD
 
     @memoized_property
@@ -122,6 +181,7 @@ class Process(LoggerMixin):
         Intercommunicator to access parent process.
         """
 
+        init_mpi()
         return MPI.Comm.Get_parent()
 
     @memoized_property
@@ -130,6 +190,7 @@ class Process(LoggerMixin):
         MPI process rank.
         """
 
+        init_mpi()
         return MPI.COMM_WORLD.Get_rank()
 
     @memoized_property
@@ -138,6 +199,7 @@ class Process(LoggerMixin):
         Number of peer processes.
         """
 
+        init_mpi()
         return MPI.COMM_WORLD.Get_size()
 
     def run(self):
@@ -171,20 +233,195 @@ class Process(LoggerMixin):
     def recv_peer(self, source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
         return self.intracomm.recv(source=source, tag=tag)
 
+class ProcessPool(LoggerMixin):
+    """
+    Pool of MPI processes that execute the targets of process managers.
+
+    Processes in a persistent pool keep running after the targets assigned to
+    them by a process manager finish and wait for the targets of the next
+    manager that uses the pool; the modules imported by the processes (and any
+    state cached by those modules) therefore persist across runs, avoiding
+    the cost of spawning and initializing new processes for each run.
+
+    Parameters
+    ----------
+    size : int
+        Number of processes in the pool.
+    persistent : bool
+        If False, the processes exit after running the targets of a single
+        manager.
+    hosts : sequence of tuple
+        Hosts on which to spawn the processes. Each entry is a tuple containing
+        a host name and the number of processes to spawn on that host; the
+        processes are assigned consecutive ranks in the order of the entries.
+        If None, the processes are placed by the MPI implementation.
+
+    Notes
+    -----
+    A run may use fewer targets than the number of processes in the pool; the
+    remaining processes idle until the next run. The processes of a persistent
+    pool must be explicitly told to exit with the `close()` method.
+    """
+
+    def __init__(self, size, persistent=True, hosts=None):
+        LoggerMixin.__init__(self, 'pool')
+        if size < 1:
+            raise ValueError('invalid pool size')
+        if hosts is not None and sum([n for host, n in hosts]) != size:
+            raise ValueError('number of processes on hosts must equal pool size')
+        self.size = size
+        self.persistent = persistent
+        self.hosts = hosts
+
+        # Number of runs started on the pool:
+        self.runs = 0
+        self._intercomm = MPI.COMM_NULL
+
+    @property
+    def intercomm(self):
+        """
+        Intercommunicator to pooled processes.
+
+        Notes
+        -----
+        Set to COMM_NULL until the processes are spawned.
+        """
+
+        return self._intercomm
+
+    def spawn(self):
+        """
+        Spawn the pooled processes if they are not already running.
+
+        Returns
+        -------
+        nbytes : int
+            Number of bytes transmitted to each spawned process; 0 if the
+            processes are already running.
+        """
+
+        if self._intercomm != MPI.COMM_NULL:
+            return 0
+        init_mpi()
+
+        # Find the path to the mpi_backend.py script (which should be in the
+        # same directory as this module:
+        parent_dir = os.path.dirname(__file__)
+        mpi_backend_path = os.path.join(parent_dir, 'mpi_backend.py')
+
+        # Spawn processes:
+        self.log_info('spawning %s processes' % self.size)
+        if self.hosts is None:
+            self._intercomm = MPI.COMM_SELF.Spawn(sys.executable,
+                                                  args=[mpi_backend_path],
+                                                  maxprocs=self.size)
+        else:
+            hosts = [(host, n) for host, n in self.hosts if n > 0]
+            info = []
+            for host, n in hosts:
+                info.append(MPI.Info.Create())
+                info[-1].Set('host', host)
+            self._intercomm = \
+                MPI.COMM_SELF.Spawn_multiple([sys.executable]*len(hosts),
+                                             args=[[mpi_backend_path]]*len(hosts),
+                                             maxprocs=[n for host, n in hosts],
+                                             info=info)
+            for i in info:
+                i.Free()
+
+        # Transmit twiggy logging emitters to spawned processes so that they
+        # can configure their logging facilities:
+        emitters = dill.dumps(twiggy.emitters)
+        for i in xrange(self.size):
+            self._intercomm.send(emitters, i)
+        return len(emitters)
+
+    def start(self, n):
+        """
+        Start a run of targets on the pooled processes.
+
+        Parameters
+        ----------
+        n : int
+            Number of targets to run; the targets are run by the processes
+            with ranks 0 through `n-1`.
+
+        Returns
+        -------
+        nbytes : int
+            Number of bytes transmitted to each process to start the run.
+        """
+
+        if n > self.size:
+            raise ValueError('number of targets exceeds pool size')
+        if self.runs and not self.persistent:
+            raise ValueError('non-persistent pool cannot be reused')
+        nbytes = self.spawn()
+        self._intercomm.bcast(('run', self.persistent, n), root=MPI.ROOT)
+        self.runs += 1
+        return nbytes
+
+    def close(self):
+        """
+        Tell the pooled processes to exit.
+        """
+
+        if self.persistent and self._intercomm != MPI.COMM_NULL:
+            self.log_info('closing pool')
+            self._intercomm.bcast(('exit', False, 0), root=MPI.ROOT)
+        self._intercomm = MPI.COMM_NULL
+
 class ProcessManager(LoggerMixin):
     """
     Process manager class.
+
+    Parameters
+    ----------
+    pool : ProcessPool
+        Pool of processes on which to run the managed targets. If None, new
+        processes are spawned for the targets and exit after running them.
+    backend : str
+        Backend that runs the targets. If 'mpi', the targets are run by
+        processes spawned via MPI. If 'multiprocessing', the targets are run
+        by processes forked from the current process with the multiprocessing
+        module (see `neurokernel.mp_backend`); this does not require MPI
+        dynamic process management, but all of the processes run on the
+        current machine. MPI must then not have been initialized in the
+        current process (e.g., by logging via MPI I/O).
+
+    Attributes
+    ----------
+    hosts : sequence of tuple
+        Hosts on which to spawn the processes if no pool is specified; see
+        ProcessPool.
     """
 
-    def __init__(self):
+    def __init__(self, pool=None, backend='mpi'):
         LoggerMixin.__init__(self, 'man')
         set_excepthook(self.logger, True)
 
+        if backend not in ['mpi', 'multiprocessing']:
+            raise ValueError('unsupported backend: %s' % backend)
+        if backend != 'mpi' and pool is not None:
+            raise ValueError('process pools require the MPI backend')
+        self.pool = pool
+        self.backend = backend
+        self.hosts = None
+
         self._targets = {}
         self._args = {}
         self._kwargs = {}
+
+        # Attributes to set on each target instance before it is run:
+        self._attrs = {}
+
+        # Number of bytes transmitted to each spawned process during startup:
+        self.spawn_nbytes = {}
         self._intercomm = MPI.COMM_NULL
 
+        # Processes started by the multiprocessing backend:
+        self._procs = []
+
         self._rank = 0
 
     @property
@@ -233,61 +470,226 @@ class ProcessManager(LoggerMixin):
     def _is_parent(self):
         """
         True if the current MPI process is the spawning parent.
+
+        Processes spawned via MPI initialize MPI on startup; a process in
+        which MPI has not been initialized is therefore not spawned.
         """
 
+        if not MPI.Is_initialized():
+            return True
         return MPI.Comm.Get_parent() == MPI.COMM_NULL
 
     def spawn(self):
         """
         Spawn MPI processes for and execute each of the managed targets.
-        """
 
-        if self._is_parent:
-            # Find the path to the mpi_backend.py script (which should be in the
-            # same directory as this module:
-            parent_dir = os.path.dirname(__file__)
-            mpi_backend_path = os.path.join(parent_dir, 'mpi_backend.py')
-
-            # Spawn processes:
-            self._intercomm = MPI.COMM_SELF.Spawn(sys.executable,
-                                            args=[mpi_backend_path],
-                                            maxprocs=len(self))
+        If the manager was given a process pool, the targets are executed by
+        the pool's processes (which are only spawned if they are not already
+        running).
+        """
 
-            # First, transmit twiggy logging emitters to spawned processes so
-            # that they can configure their logging facilities:
+        if self._is_parent and self.backend == 'multiprocessing':
+            self._fork()
+        elif self._is_parent:
+            # Spawn processes for the targets unless a pool of already
+            # running processes is available; the logging emitters are
+            # transmitted to newly spawned processes so that they can
+            # configure their logging facilities:
+            if self.pool is None:
+                pool = ProcessPool(len(self), False, self.hosts)
+            else:
+                pool = self.pool
+            nbytes = pool.start(len(self))
+            self._intercomm = pool.intercomm
+
+            # The data transmitted to each process is serialized explicitly
+            # so that the number of bytes received by each process can be
+            # recorded:
+            self.spawn_nbytes = {i: nbytes for i in self._targets.keys()}
+
+            # Serialize each distinct class to instantiate (or a reference to
+            # it if it can be imported by the child nodes) and the globals
+            # required by it once and broadcast them to all of the child nodes;
+            # each node only deserializes the class that it instantiates:
+            class_index = {}
+            classes = []
+            for i in self._targets.keys():
+                if self._targets[i] not in class_index:
+                    class_index[self._targets[i]] = len(classes)
+                    classes.append(self._serialize_target(self._targets[i]))
+            self._intercomm.bcast(classes, root=MPI.ROOT)
             for i in self._targets.keys():
-                self._intercomm.send(twiggy.emitters, i)
+                self.spawn_nbytes[i] += sum(map(len, classes))
 
-            # Next, serialize the routing table ONCE and then transmit it to all
-            # of the child nodes:
+            # Next, transmit to each of the child nodes the part of the
+            # routing table that it requires:
             try:
                 routing_table = self.routing_table
             except:
                 routing_table = RoutingTable()
                 self.log_warning('Routing Table is null, using empty routing table.')
 
-            self._intercomm.bcast(routing_table, root=MPI.ROOT)
-
-            # Transmit class to instantiate, globals required by the class, and
-            # the constructor arguments; the backend will wait to receive
-            # them and then start running the targets on the appropriate nodes.
             req = MPI.Request()
             r_list = []
             for i in self._targets.keys():
-                target_globals = all_global_vars(self._targets[i])
+                data = dill.dumps(self._routing_table_for(i, routing_table))
+                r_list.append(self._intercomm.isend(data, i))
+                self.spawn_nbytes[i] += len(data)
+            req.Waitall(r_list)
 
-                # Serializing atexit with dill appears to fail in virtualenvs
-                # sometimes if atexit._exithandlers contains an unserializable function:
-                if 'atexit' in target_globals:
-                    del target_globals['atexit']
-                data = (self._targets[i], target_globals, self._kwargs[i])
+            # Transmit the index of the class to instantiate, the constructor
+            # arguments, and the attributes to set on the instantiated class;
+            # numpy arrays in the constructor arguments are transmitted
+            # separately as raw buffers. The backend will wait to receive them
+            # and then start running the targets on the appropriate nodes.
+            r_list = []
+            buf_list = []
+            for i in self._targets.keys():
+                kwargs = {}
+                arrays = []
+                bufs = []
+                for k, v in self._kwargs[i].iteritems():
+                    if type(v) == np.ndarray and not v.dtype.hasobject:
+                        arrays.append((k, v.dtype, v.shape))
+                        bufs.append(np.ascontiguousarray(v))
+                    else:
+                        kwargs[k] = v
+                data = dill.dumps((class_index[self._targets[i]], kwargs,
+                                   arrays, self._attrs.get(i, {})))
                 r_list.append(self._intercomm.isend(data, i))
+                self.spawn_nbytes[i] += len(data)
+                for buf in bufs:
+                    r_list.append(self._intercomm.Isend([buf, MPI.BYTE], i))
+                    self.spawn_nbytes[i] += buf.nbytes
 
-                # Need to clobber data to prevent all_global_vars from
-                # including it in its output:
-                del data
+                # The buffers must not be freed before they are transmitted:
+                buf_list.extend(bufs)
             req.Waitall(r_list)
 
+            for i in self._targets.keys():
+                self.log_info('bytes sent to process %s during spawn: %s' % \
+                              (i, self.spawn_nbytes[i]))
+
+    def _fork(self):
+        """
+        Start a process for each of the managed targets with multiprocessing.
+
+        The targets and their arguments are inherited by the forked processes
+        rather than transmitted to them.
+        """
+
+        import mp_backend
+
+        if MPI.Is_initialized():
+            self.log_warning('forking processes after MPI was initialized; '
+                             'this is not supported by all MPI '
+                             'implementations')
+
+        try:
+            routing_table = self.routing_table
+        except:
+            routing_table = RoutingTable()
+            self.log_warning('Routing Table is null, using empty routing table.')
+
+        conns = []
+        for i in self._targets.keys():
+            conn, child_conn = multiprocessing.Pipe()
+            args = (self._targets[i], self._kwargs[i], self._attrs.get(i, {}),
+                    self._routing_table_for(i, routing_table), child_conn, i,
+                    len(self), time.time())
+            p = multiprocessing.Process(target=mp_backend.run_target, args=args)
+            p.daemon = True
+            p.start()
+
+            # Close the manager's copy of the child's end of the pipe so that
+            # the manager can detect the exit of the child:
+            child_conn.close()
+            conns.append(conn)
+            self._procs.append(p)
+            self.spawn_nbytes[i] = 0
+        self._intercomm = mp_backend.PipeComm(conns)
+        self.log_info('started %s processes' % len(self._procs))
+
+    def _join(self):
+        """
+        Wait for the processes started by the multiprocessing backend to exit.
+        """
+
+        for p in self._procs:
+            p.join()
+        self._procs = []
+
+    def _serialize_target(self, target):
+        """
+        Serialize a target class or a reference to it.
+
+        Parameters
+        ----------
+        target : Process
+            Class to instantiate and run in MPI process.
+
+        Returns
+        -------
+        data : str
+            Serialized tuple. If the class can be imported by name from the
+            module in which it is defined, the tuple is `('ref', (module_name,
+            class_name, path))`, where `path` is the directory from which the
+            module's top-level package is imported. Otherwise (e.g., for
+            classes defined in `__main__`), the tuple is `('dill', (target,
+            target_globals))`, where `target_globals` contains the globals
+            required by the class.
+
+        Notes
+        -----
+        `all_global_vars()` also looks up the symbols accessed by the class in
+        the locals of its caller; it is invoked here rather than in `spawn()`
+        so as to not include the latter's locals in the class' globals.
+        """
+
+        module = sys.modules.get(target.__module__)
+        if target.__module__ != '__main__' and \
+           getattr(module, target.__name__, None) is target and \
+           getattr(module, '__file__', None):
+
+            # Find the directory containing the module's top-level package:
+            path = os.path.dirname(os.path.abspath(module.__file__))
+            n = target.__module__.count('.')
+            if os.path.splitext(os.path.basename(module.__file__))[0] == \
+               '__init__':
+                n += 1
+            for i in xrange(n):
+                path = os.path.dirname(path)
+            return dill.dumps(('ref', (target.__module__, target.__name__,
+                                       path)))
+
+        target_globals = all_global_vars(target)
+
+        # Serializing atexit with dill appears to fail in virtualenvs
+        # sometimes if atexit._exithandlers contains an unserializable function:
+        if 'atexit' in target_globals:
+            del target_globals['atexit']
+        return dill.dumps(('dill', (target, target_globals)))
+
+    def _routing_table_for(self, rank, routing_table):
+        """
+        Return the routing table to transmit to the process with the specified rank.
+
+        Parameters
+        ----------
+        rank : int
+            MPI rank of the process.
+        routing_table : neurokernel.routing_table.RoutingTable
+            Routing table of all the managed processes.
+
+        Returns
+        -------
+        routing_table : neurokernel.routing_table.RoutingTable
+            Routing table to transmit. By default, the full routing table is
+            transmitted to every process.
+        """
+
+        return routing_table
+
     def send(self, data, dest, tag=0):
         """
         Send data to child process.
@@ -6,7 +6,10 @@ Represent connectivity pattern using pandas DataFrame.
 
 from collections import OrderedDict
 import itertools
+import json
 import re
+import struct
+import zipfile
 
 import networkx as nx
 import numpy as np
@@ -78,6 +81,42 @@ class Interface(object):
 
         # Dictionary containing mappers for different port types:
         self.pm = {}
+
+    # Integer codes of the attribute columns and rows of the ports in each
+    # port class; see `_get_cache()`:
+    _cache = None
+
+    @property
+    def data(self):
+        """
+        Port attribute data.
+        """
+
+        return self._data
+
+    @data.setter
+    def data(self, d):
+        self._data = d
+        self._cache = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cache'] = None
+        return state
+
+    def _get_cache(self):
+        """
+        Return cached attribute codes and port class rows.
+
+        The cache is discarded whenever the ports' attributes are modified via
+        `__setitem__()` or the data or its index are replaced (e.g., by
+        sorting). Attributes modified by assigning directly to the columns of
+        `data` are not detected.
+        """
+
+        if self._cache is None or self._cache['index'] is not self._data.index:
+            self._cache = {'index': self._data.index, 'codes': {}, 'rows': {}}
+        return self._cache
         
     def __validate_index__(self, idx):
         """
@@ -131,6 +170,7 @@ class Interface(object):
 
         for k, v in data.iteritems():
             self.data[k].ix[idx] = v
+        self._cache = None
 
     def __setitem__(self, key, value):
         if type(key) == tuple:
@@ -181,7 +221,8 @@ class Interface(object):
                                       len(self.index.shape))
         for k, v in data.iteritems():
             self.data[k].ix[s] = v
-        
+        self._cache = None
+
     @property
     def index(self):
         """
@@ -193,6 +234,7 @@ class Interface(object):
     @index.setter
     def index(self, i):
         self.data.index = i
+        self._cache = None
 
     @property
     def interface_ids(self):
@@ -200,7 +242,11 @@ class Interface(object):
         Interface identifiers.
         """
 
-        return set(self.data['interface'])
+        codes, categories = self._codes('interface')
+        result = set(categories)
+        if np.any(codes < 0):
+            result.add(np.nan)
+        return result
 
     @property
     def io_inv(self):
@@ -237,6 +283,7 @@ class Interface(object):
         """
 
         self.data.drop(self.data.index, inplace=True)
+        self._cache = None
 
     def data_select(self, f, inplace=False):
         """
@@ -338,6 +385,74 @@ class Interface(object):
         df = pd.DataFrame.from_csv(file_name, **kwargs)
         return cls.from_df(df)
 
+    @classmethod
+    def load(cls, file_name, mmap=True):
+        """
+        Load an Interface from a file written by `Interface.save()`.
+
+        Parameters
+        ----------
+        file_name : str
+            Name of file containing interface data.
+        mmap : bool
+            If True, memory-map the stored arrays rather than reading them
+            into memory.
+
+        Returns
+        -------
+        i : Interface
+            Loaded Interface instance.
+        """
+
+        header, arrays = _load_arrays(file_name, mmap)
+        if header['class'] != 'Interface':
+            raise ValueError('file does not contain an Interface')
+        return cls._from_arrays(header['interface'], arrays, 'int_')
+
+    @classmethod
+    def _from_arrays(cls, header, arrays, prefix):
+        """
+        Create an Interface from arrays generated by `_df_to_arrays`.
+
+        The stored index is assumed to be valid, so it is neither expanded
+        into selectors nor validated.
+        """
+
+        return cls._from_valid_df(_arrays_to_df(header, arrays, prefix),
+                                  header['num_levels'])
+
+    @classmethod
+    def _from_valid_df(cls, df, num_levels):
+        """
+        Create an Interface from a DataFrame whose index is known to be valid.
+
+        Unlike `Interface.from_df()`, the DataFrame's index is not converted
+        into a selector and the DataFrame is not copied.
+        """
+
+        i = cls('', df.columns)
+        i.data = df
+        i.num_levels = num_levels
+        return i
+
+    def save(self, file_name):
+        """
+        Save Interface to a file.
+
+        The port identifiers are stored as per-level category tables and int32
+        codes and the port attributes as typed columns in an uncompressed
+        .npz file that can be memory-mapped by `Interface.load()`.
+
+        Parameters
+        ----------
+        file_name : str
+            Output file name.
+        """
+
+        header, arrays = _df_to_arrays(self.data, 'int_')
+        _save_arrays(file_name, {'class': 'Interface', 'interface': header},
+                     arrays)
+
     @classmethod
     def from_dict(cls, d):
         """
@@ -453,27 +568,7 @@ class Interface(object):
             corresponding to the expanded ports.
         """
 
-        if i is None:
-            try:
-                df = self.data[self.data['type'] == 'gpot']
-            except:
-                df = None
-        else:
-            try:
-                df = self.data[(self.data['type'] == 'gpot') & \
-                               (self.data['interface'] == i)]
-            except:
-                df = None
-        if tuples:
-            if df is None:
-                return []
-            else:
-                return df.index.tolist()
-        else:
-            if df is None:
-                return Interface()
-            else:
-                return self.from_df(df)
+        return self._ports(self._rows(i, t='gpot'), tuples)
 
     def in_ports(self, i=None, tuples=False):
         """
@@ -495,27 +590,7 @@ class Interface(object):
             corresponding to the expanded ports.
         """
 
-        if i is None:
-            try:
-                df = self.data[self.data['io'] == 'in']
-            except:
-                df = None
-        else:
-            try:
-                df = self.data[(self.data['io'] == 'in') & \
-                               (self.data['interface'] == i)]
-            except:
-                df = None
-        if tuples:
-            if df is None:
-                return []
-            else:
-                return df.index.tolist()
-        else:
-            if df is None:
-                return Interface()
-            else:
-                return self.from_df(df)
+        return self._ports(self._rows(i, io='in'), tuples)
 
     def interface_ports(self, i=None, tuples=False):
         """
@@ -543,57 +618,141 @@ class Interface(object):
             else:
                 return self.copy()
         else:
-            try:
-                df = self.data[self.data['interface'] == i]
-            except:
-                df = None
-            if tuples:
-                if df is None:
-                    return []
-                else:
-                    return df.index.tolist()
-            else:
-                if df is None:
-                    return Interface()
-                else:
-                    return self.from_df(df)
+            return self._ports(self._rows(i), tuples)
 
-    def _merge_on_interfaces(self, a, i, b):
+    def _codes(self, k):
         """
-        Merge contents of this and another Interface instance.
+        Encode the values in a data column as small integer codes.
+
+        Parameters
+        ----------
+        k : str
+            Column name.
+
+        Returns
+        -------
+        codes : numpy.ndarray
+            Position of each port's value in `categories`; null values are 
+            denoted by -1. The codes are stored in the smallest signed integer
+            type that can represent them.
+        categories : pandas.Index
+            Distinct non-null values in the column.
+        """
+
+        cache = self._get_cache()['codes']
+        if k not in cache:
+            codes, categories = pd.factorize(self._data[k].values)
+            for dtype in [np.int8, np.int16, np.int32]:
+                if len(categories) <= np.iinfo(dtype).max:
+                    codes = codes.astype(dtype)
+                    break
+            cache[k] = codes, pd.Index(categories)
+        return cache[k]
+
+    def _rows(self, i=None, io=None, t=None):
+        """
+        Find the rows of the ports in a port class.
+
+        Parameters
+        ----------
+        i : int
+            Interface identifier. If None, ports in all interfaces are found.
+        io : str or unicode
+            If not None, only find ports with the specified 'io' attribute.
+        t : str or unicode
+            If not None, only find ports with the specified 'type' attribute.
+
+        Returns
+        -------
+        rows : numpy.ndarray
+            Integer positions of the selected ports in the Interface's data.
+            The returned array is cached and must not be modified.
+        """
+
+        cache = self._get_cache()['rows']
+        key = (i, io, t)
+        if key not in cache:
+            mask = np.ones(len(self._data), dtype=np.bool_)
+            for k, v in [('interface', i), ('io', io), ('type', t)]:
+                if v is None:
+                    continue
+                codes, categories = self._codes(k)
+                try:
+                    mask &= codes == categories.get_loc(v)
+                except KeyError:
+                    mask[:] = False
+            cache[key] = np.flatnonzero(mask)
+        return cache[key]
+
+    def _ports(self, rows, tuples=False):
+        """
+        Return the ports in the specified rows.
+
+        Parameters
+        ----------
+        rows : numpy.ndarray
+            Integer positions of ports in the Interface's data.
+        tuples : bool
+            If True, return a list of tuples; if False, return an
+            Interface instance.
+
+        Returns
+        -------
+        interface : Interface or list of tuples
+            Either an Interface instance containing the ports and their
+            attributes or a list of tuples corresponding to the expanded ports.
+        """
+
+        if tuples:
+            return self.index[rows].tolist()
+        df = self.data.iloc[rows]
+        if len(df):
+            return self._from_valid_df(df, self.num_levels)
+        else:
+            return self.from_df(df)
+
+    def _align_on_interfaces(self, a, i, b, t=None):
+        """
+        Match the ports in this and another Interface instance.
+
+        Parameters
+        ----------
+        a : int
+            Identifier of interface in the current instance.
+        i : Interface
+            Interface instance containing the other interface.
+        b : int
+            Identifier of interface in instance `i`.
+        t : str or unicode
+            If not None, only match ports with the specified type.
+
+        Returns
+        -------
+        rows_a, rows_b : numpy.ndarray
+            Integer positions of the selected ports in the data of this and the
+            other Interface instance, respectively.
+        idx_a, idx_b : pandas.MultiIndex
+            Identifiers of the selected ports; both indices are padded
+            with blank entries to the same number of levels.
+        match : numpy.ndarray
+            Position in `rows_b` of the port matching each port in
+            `rows_a`, or -1 if the latter has no match.
 
         Notes
         -----
-        If the number of levels in one Interface instance's DataFrame index is
-        greater than that of the other, the number of levels in the index of the
-        merged DataFrames instances is set to the former and the index with the
-        smaller number is padded with blank entries to enable Panda's merge
-        mechanism to function properly.
+        If the number of levels in one Interface instance's index is greater
+        than that of the other, the index with the smaller number of levels is
+        padded with blank entries so that identifiers of the form
+        ('foo', 0, '') and ('foo', 0) match.
         """
 
         assert isinstance(i, Interface)
-        df_left = self.data[self.data['interface'] == a]
-        df_right = i.data[i.data['interface'] == b]
-        n_left_names = len(self.data.index.names)
-        n_right_names = len(i.data.index.names)
-
-        # Pandas' merge mechanism fails if the number of levels in each of the 
-        # merged MultiIndex indices differs and there is overlap of more than
-        # one level; we therefore pad the index with the smaller number of
-        # levels before attempting the merge:
-        if n_left_names > n_right_names:
-            for n in xrange(i.num_levels, i.num_levels+(n_left_names-n_right_names)):
-                new_col = str(n)
-                df_right[new_col] = ''
-                df_right.set_index(new_col, append=True, inplace=True)
-        elif n_left_names < n_right_names:
-            for n in xrange(self.num_levels, self.num_levels+(n_right_names-n_left_names)):
-                new_col = str(n)
-                df_left[new_col] = ''
-                df_left.set_index(new_col, append=True, inplace=True)
-        return pd.merge(df_left, df_right,                            
-                        left_index=True,
-                        right_index=True)
+        rows_a = self._rows(a, t=t)
+        rows_b = i._rows(b, t=t)
+        n = max(self.idx_levels, i.idx_levels)
+        idx_a = _pad_index(self.index[rows_a], n)
+        idx_b = _pad_index(i.index[rows_b], n)
+        return rows_a, rows_b, idx_a, idx_b, idx_b.get_indexer(idx_a)
 
     def get_common_ports(self, a, i, b, t=None):
         """
@@ -625,25 +784,49 @@ class Interface(object):
         The order of the returned port identifiers is not guaranteed.
         """
 
-        if t is None:
-            x = self.data[self.data['interface'] == a]
-            y = i.data[i.data['interface'] == b]
-        else:
-            x = self.data[(self.data['interface'] == a) & (self.data['type'] == t)]
-            y = i.data[(i.data['interface'] == b) & (i.data['type'] == t)]
-        if isinstance(x.index, pd.MultiIndex):
-            x_list = [tuple(a for a in b if a != '') \
-                      for b in x.index]
-        else:
-            x_list = [(a,) for a in x.index]
-        if isinstance(y.index, pd.MultiIndex):
-            y_list = [tuple(a for a in b if a != '') \
-                      for b in y.index]
-        else:
-            y_list = [(a,) for a in y.index]
+        rows_a, rows_b, idx_a, idx_b, match = self._align_on_interfaces(a, i, b, t)
+        if idx_a.nlevels == 1:
+            return [(x,) for x in idx_a[match >= 0].get_level_values(0)]
+        return [tuple(x for x in row if x != '') \
+                for row in idx_a[match >= 0].tolist()]
+
+    def get_rows(self, selector):
+        """
+        Find the rows of the ports comprised by a selector.
+
+        Parameters
+        ----------
+        selector : Selector, str, unicode, or sequence
+            Unambiguous selector string (e.g., '/foo[0:2]') or sequence of
+            token sequences (e.g., [['foo', (0, 2)]]).
+
+        Returns
+        -------
+        rows : numpy.ndarray of int
+            Integer positions in the Interface's data of the identifiers
+            comprised by the selector, in the order in which they appear in
+            the selector. Identifiers that are not in the Interface are
+            denoted by -1.
+        """
+
+        if self.sel.is_selector_empty(selector):
+            return np.array([], dtype=np.int_)
+
+        # Identifiers with more levels than the Interface cannot be in it:
+        n = self.num_levels
+        ids = self.sel.expand(selector, n)
+        valid = np.array([len(x) == n for x in ids], dtype=np.bool_)
+        rows = np.full(len(ids), -1, dtype=np.int_)
+        if not valid.all():
+            ids = [x for x, v in itertools.izip(ids, valid) if v]
+        if ids:
+            if isinstance(self.index, pd.MultiIndex):
+                target = pd.MultiIndex.from_tuples(ids)
+            else:
+                target = pd.Index([x[0] for x in ids], dtype=object)
+            rows[valid] = self.index.get_indexer(target)
+        return rows
 
-        return list(set(x_list).intersection(y_list))
-        
     def is_compatible(self, a, i, b, allow_subsets=False):
         """
         Check whether two interfaces can be connected.
@@ -678,54 +861,62 @@ class Interface(object):
         Assumes that the port identifiers in both interfaces are sorted in the
         same order.
         """
-        
-        # Merge the interface data on their indices (i.e., their port identifiers):
-        data_merged = self._merge_on_interfaces(a, i, b)
 
-        # Check whether there are compatible subsets, i.e., at least one pair of
-        # ports from the two interfaces that are compatible with each other:
+        # Match the ports in the two interfaces on their identifiers:
+        rows_a, rows_b, idx_a, idx_b, match = self._align_on_interfaces(a, i, b)
+        found = match >= 0
+        rows_b = rows_b[match[found]]
+        rows_a = rows_a[found]
+
         if allow_subsets:
 
             # If the interfaces share no identical port identifiers, they are
             # incompatible:
-            if not len(data_merged):
+            if not len(rows_a):
                 return False
-
-            # Compatible identifiers must have the same non-null 'type'
-            # attribute and their non-null 'io' attributes must be the inverse
-            # of each other:
-            if not data_merged.apply(lambda row: \
-                    ((row['type_x'] == row['type_y']) or \
-                     (pd.isnull(row['type_x']) and pd.isnull(row['type_y']))) and \
-                    ((row['io_x'] == 'out' and row['io_y'] == 'in') or \
-                     (row['io_x'] == 'in' and row['io_y'] == 'out') or \
-                     (pd.isnull(row['io_x']) and pd.isnull(row['io_y']))),
-                                     axis=1).any():
-                return False
-
-        # Require that all ports in the two interfaces be compatible:
         else:
-            
+
             # If one interface contains identifiers not in the other, they are
             # incompatible:
-            if len(data_merged) < max(len(self.data[self.data['interface'] == a]),
-                                      len(i.data[i.data['interface'] == b])):
+            if len(rows_a) < max(len(found), len(idx_b)):
                 return False
 
-            # Compatible identifiers must have the same non-null 'type'
-            # attribute and their non-null 'io' attributes must be the inverse
-            # of each other:
-            if not data_merged.apply(lambda row: \
-                    ((row['type_x'] == row['type_y']) or \
-                     (pd.isnull(row['type_x']) and pd.isnull(row['type_y']))) and \
-                    ((row['io_x'] == 'out' and row['io_y'] == 'in') or \
-                     (row['io_x'] == 'in' and row['io_y'] == 'out') or \
-                     (pd.isnull(row['io_x']) and pd.isnull(row['io_y']))),
-                                     axis=1).all():
-                return False
+        # Compatible identifiers must have the same non-null 'type'
+        # attribute and their non-null 'io' attributes must be the inverse
+        # of each other:
+        type_a, cat_a = self._codes('type')
+        type_b, cat_b = i._codes('type')
+        type_a = type_a[rows_a].astype(np.int64)
+        type_b = type_b[rows_b].astype(np.int64)
+
+        # Translate the type codes of the other interface into codes of this
+        # interface; types that don't occur in this interface are denoted by -2:
+        m = cat_a.get_indexer(cat_b)
+        m[m < 0] = -2
+        set_b = type_b >= 0
+        type_b[set_b] = m[type_b[set_b]]
+        type_ok = type_a == type_b
+
+        io_a, cat_a = self._codes('io')
+        io_b, cat_b = i._codes('io')
+        io_a = io_a[rows_a]
+        io_b = io_b[rows_b]
+        in_a, out_a = cat_a.get_indexer(['in', 'out'])
+        in_b, out_b = cat_b.get_indexer(['in', 'out'])
+        io_ok = ((io_a == out_a) & (out_a >= 0) & (io_b == in_b) & (in_b >= 0)) | \
+                ((io_a == in_a) & (in_a >= 0) & (io_b == out_b) & (out_b >= 0)) | \
+                ((io_a == -1) & (io_b == -1))
+
+        if allow_subsets:
 
-        # All tests passed:
-        return True
+            # Check whether there are compatible subsets, i.e., at least one
+            # pair of ports from the two interfaces that are compatible with
+            # each other:
+            return bool(np.any(type_ok & io_ok))
+        else:
+
+            # Require that all ports in the two interfaces be compatible:
+            return bool(np.all(type_ok & io_ok))
 
     def is_in_interfaces(self, s):
         """
@@ -780,27 +971,7 @@ class Interface(object):
             corresponding to the expanded ports.
         """
 
-        if i is None:
-            try:
-                df = self.data[self.data['io'] == 'out']
-            except:
-                df = None
-        else:
-            try:
-                df = self.data[(self.data['io'] == 'out') & \
-                               (self.data['interface'] == i)]
-            except:
-                df = None
-        if tuples:
-            if df is None:
-                return []
-            else:
-                return df.index.tolist()
-        else:
-            if df is None:
-                return Interface()
-            else:
-                return self.from_df(df)
+        return self._ports(self._rows(i, io='out'), tuples)
 
     def port_select(self, f, inplace=False):
         """
@@ -851,27 +1022,7 @@ class Interface(object):
             corresponding to the expanded ports.
         """
 
-        if i is None:
-            try:
-                df = self.data[self.data['type'] == 'spike']
-            except:
-                df = None
-        else:
-            try:
-                df = self.data[(self.data['type'] == 'spike') & \
-                               (self.data['interface'] == i)]
-            except:
-                df = None
-        if tuples:
-            if df is None:
-                return []
-            else:
-                return df.index.tolist()
-        else:
-            if df is None:
-                return Interface()
-            else:
-                return self.from_df(df)
+        return self._ports(self._rows(i, t='spike'), tuples)
 
     def to_selectors(self, i=None):
         """
@@ -916,17 +1067,13 @@ class Interface(object):
         """
 
         if i is None:
-            if isinstance(self.index, pd.MultiIndex):
-                return self.index.tolist()
-            else:
-                return [(t,) for t in self.index]
-        try:
-            if isinstance(self.index, pd.MultiIndex):
-                return self.data[self.data['interface'] == i].index.tolist()
-            else:
-                return [(t,) for t in self.data[self.data['interface'] == i].index]
-        except:
-            return []
+            idx = self.index
+        else:
+            idx = self.index[self._rows(i)]
+        if isinstance(idx, pd.MultiIndex):
+            return idx.tolist()
+        else:
+            return [(t,) for t in idx]
     
     def which_int(self, s):
         """
@@ -967,7 +1114,7 @@ class Interface(object):
         Make a copy of this object.
         """
 
-        return self.from_df(self.data)
+        return self._from_valid_df(self.data.copy(), self.num_levels)
     copy = __copy__
     copy.__doc__ = __copy__.__doc__
 
@@ -1130,6 +1277,33 @@ class Pattern(object):
         return slice(self.num_levels['from'],        
                      self.num_levels['from']+self.num_levels['to'])
 
+    # Callable that creates the connection data on first access; used to
+    # defer construction of data loaded from a file:
+    _data_loader = None
+
+    @property
+    def data(self):
+        """
+        Connection attribute data.
+        """
+
+        if self._data_loader is not None:
+            self._data = self._data_loader()
+            self._data_loader = None
+        return self._data
+
+    @data.setter
+    def data(self, d):
+        self._data_loader = None
+        self._data = d
+
+    def __getstate__(self):
+
+        # Construct deferred data so that pickled instances don't refer
+        # to memory-mapped files:
+        self.data
+        return self.__dict__.copy()
+
     @property
     def index(self):
         """
@@ -1849,6 +2023,63 @@ class Pattern(object):
         # Restore MultiIndex level names:
         self.data.index.names = index_names
 
+    @classmethod
+    def load(cls, file_name, mmap=True):
+        """
+        Load a Pattern from a file written by `Pattern.save()`.
+
+        Parameters
+        ----------
+        file_name : str
+            Name of file containing pattern data.
+        mmap : bool
+            If True, memory-map the stored arrays rather than reading them
+            into memory. The pattern's connection data is only constructed
+            when it is first accessed.
+
+        Returns
+        -------
+        p : Pattern
+            Loaded Pattern instance.
+        """
+
+        header, arrays = _load_arrays(file_name, mmap)
+        if header['class'] != 'Pattern':
+            raise ValueError('file does not contain a Pattern')
+
+        # Create pattern with phony selectors:
+        p = cls('/foo[0]', '/bar[0]')
+        p.interface = Interface._from_arrays(header['interface'], arrays, 'int_')
+        p.num_levels = {'from': p.interface.num_levels,
+                        'to': p.interface.num_levels}
+        if mmap:
+            p._data_loader = lambda: _arrays_to_df(header['pattern'], arrays,
+                                                   'pat_')
+        else:
+            p.data = _arrays_to_df(header['pattern'], arrays, 'pat_')
+        return p
+
+    def save(self, file_name):
+        """
+        Save Pattern to a file.
+
+        The pattern's interface and connections are stored as per-level
+        category tables, int32 codes, and typed attribute columns in an
+        uncompressed .npz file that can be memory-mapped by `Pattern.load()`.
+
+        Parameters
+        ----------
+        file_name : str
+            Output file name.
+        """
+
+        int_header, int_arrays = _df_to_arrays(self.interface.data, 'int_')
+        pat_header, pat_arrays = _df_to_arrays(self.data, 'pat_')
+        int_arrays.update(pat_arrays)
+        _save_arrays(file_name, {'class': 'Pattern',
+                                 'interface': int_header,
+                                 'pattern': pat_header}, int_arrays)
+
     @classmethod
     def from_graph(cls, g):
         """Convert a NetworkX directed graph into a Pattern instance.
@@ -1873,45 +2104,70 @@ class Pattern(object):
 
         assert type(g) == nx.DiGraph
 
-        # Group port identifiers by interface number and whether the ports are
-        # graded potential, or spiking:
-        ports_by_int = {}
-        ports_gpot = []
-        ports_spike = []
-        ports_from = []
-        ports_to = []
-        for n, data in g.nodes(data=True):
-            assert SelectorMethods.is_identifier(n)
+        # Parse each port identifier into a token tuple once and collect the
+        # port attributes column-wise:
+        node_pos = {}
+        tuples = []
+        int_col = []
+        type_col = []
+        for n, data in g.nodes_iter(data=True):
             assert data.has_key('interface')
-            if not ports_by_int.has_key(data['interface']):
-                ports_by_int[data['interface']] = []
-            ports_by_int[data['interface']].append(n)
+            node_pos[n] = len(tuples)
+            tuples.append(_identifier_to_tuple(n))
+            int_col.append(data['interface'])
+            type_col.append(data['type'] if data.get('type') in \
+                            ['gpot', 'spike'] else np.nan)
+        from_pos = np.empty(g.number_of_edges(), dtype=np.int64)
+        to_pos = np.empty(g.number_of_edges(), dtype=np.int64)
+        for k, (f, t) in enumerate(g.edges_iter()):
+            from_pos[k] = node_pos[f]
+            to_pos[k] = node_pos[t]
+
+        # Prohibit fan-in connections and ports that both receive input and
+        # send output:
+        if len(np.unique(to_pos)) < len(to_pos):
+            raise ValueError('Fan-in pattern entries detected.')
+        if len(np.intersect1d(from_pos, to_pos)):
+            raise ValueError('Ports cannot both receive input and send output.')
 
-            if data.has_key('type'):
-                if data['type'] == 'gpot':
-                    ports_gpot.append(n)
-                elif data['type'] == 'spike':
-                    ports_spike.append(n)
+        # Number the interfaces consecutively in the order of the sorted
+        # 'interface' attribute values:
+        int_map = {k: n for n, k in enumerate(sorted(set(int_col)))}
 
         # Use connection direction to determine whether ports are source or
         # destination (XXX should this check whether the io attributes are
         # consistent with the connection directions?):
-        for f, t in g.edges():
-            ports_from.append(f)
-            ports_to.append(t)
-
-        # Create selectors for each interface number:
-        selector_list = []
-        for interface in sorted(ports_by_int.keys()):
-            selector_list.append(','.join(ports_by_int[interface]))
-
-        p = cls.from_concat(*selector_list,
-                            from_sel=','.join(ports_from),
-                            to_sel=','.join(ports_to),
-                            gpot_sel=','.join(ports_gpot),
-                            spike_sel=','.join(ports_spike),
-                            data=1)
+        io_col = np.empty(len(tuples), dtype=object)
+        io_col[:] = np.nan
+        io_col[from_pos] = 'in'
+        io_col[to_pos] = 'out'
+
+        level_arrays, num_levels = _tuples_to_level_arrays(tuples)
+        names = range(num_levels)
+        if num_levels == 1:
+            int_idx = pd.Index(level_arrays[0], name=names[0], dtype=object)
+        else:
+            int_idx = pd.MultiIndex.from_arrays(level_arrays, names=names)
+        df_int = pd.DataFrame({'interface': np.array([int_map[k] for k in int_col],
+                                                     dtype=object),
+                               'io': io_col,
+                               'type': np.array(type_col, dtype=object)},
+                              index=int_idx, columns=['interface', 'io', 'type'])
+
+        names = ['from_%s' % i for i in xrange(num_levels)]+ \
+                ['to_%s' % i for i in xrange(num_levels)]
+        pat_idx = pd.MultiIndex.from_arrays([a[from_pos] for a in level_arrays]+\
+                                            [a[to_pos] for a in level_arrays],
+                                            names=names)
+        df_pat = pd.DataFrame({'conn': np.ones(len(pat_idx), dtype=object)},
+                              index=pat_idx, columns=['conn'])
 
+        # Create pattern with phony selectors:
+        p = cls('/foo[0]', '/bar[0]')
+        p.interface = Interface._from_valid_df(df_int, num_levels)
+        p.interface.__validate_index__(int_idx)
+        p.num_levels = {'from': num_levels, 'to': num_levels}
+        p.data = df_pat
         p.data.sort_index(inplace=True)
         p.interface.data.sort_index(inplace=True)
         return p
@@ -1960,36 +2216,499 @@ class Pattern(object):
 
         g = nx.DiGraph()
 
-        # Add all of the ports as nodes:
-        for t in self.interface.data.index:    
-            if not isinstance(self.interface.data.index,
-                              pd.MultiIndex):
-                t = (t,)
-            id = self.sel.tokens_to_str(t)
+        # Convert each port identifier to a string once:
+        ids = [self.sel.tokens_to_str(t) for t in self.interface.to_tuples()]
+
+        # Add all of the ports as nodes; NaNs are replaced with empty strings:
+        int_data = self.interface.data
+        cols = [[(v if str(v) != 'nan' else '') for v in int_data[k].tolist()] \
+                for k in int_data.columns]
+        g.add_nodes_from(zip(ids, [dict(zip(int_data.columns, row)) \
+                                   for row in zip(*cols)]))
+
+        # Add all of the connections as edges; the 'conn' attribute is
+        # discarded because the existence of the edge indicates that the
+        # connection exists:
+        if isinstance(int_data.index, pd.MultiIndex):
+            id_map = dict(zip(int_data.index, ids))
+        else:
+            id_map = dict(zip([(t,) for t in int_data.index], ids))
+        from_ids = []
+        to_ids = []
+        for t in self.data.index:
+            for l, u in ((from_ids, t[self.from_slice]),
+                         (to_ids, t[self.to_slice])):
+                try:
+                    l.append(id_map[u])
+                except KeyError:
+                    l.append(self.sel.tokens_to_str(u))
+        data_cols = [k for k in self.data.columns if k != 'conn']
+        cols = [self.data[k].tolist() for k in data_cols]
+        if cols:
+            attrs = [dict(zip(data_cols, row)) for row in zip(*cols)]
+        else:
+            attrs = [{} for i in xrange(len(from_ids))]
+        g.add_edges_from(zip(from_ids, to_ids, attrs))
+
+        return g
 
-            # Replace NaNs with empty strings:
-            d = {k: (v if str(v) != 'nan' else '') \
-                 for k, v in self.interface.data.ix[t].to_dict().iteritems()}
+class StructuredPattern(Pattern):
+    """
+    Connectivity pattern defined by a connection generator.
+
+    Rather than storing every connection in a DataFrame, this class stores
+    the ports connected by the pattern and a description of the connectivity
+    between them. Connections are enumerated in blocks, each of which either
+    connects every source port in the block to every destination port in the
+    block (a product block) or connects the source and destination ports in
+    the block pairwise (a paired block). The following generators are
+    supported:
+
+    ==============  ===================================================
+    Generator       Connectivity
+    ==============  ===================================================
+    all_to_all      every source port to every destination port
+    one_to_one      source port i to destination port i
+    block_diagonal  all-to-all within consecutive blocks of ports
+    strided         source port `from_start+k*from_step` to
+                    destination port `to_start+k*to_step`
+    ==============  ===================================================
+
+    Source and destination ports, connection counts, and connectivity
+    between interfaces are computed from the generator without constructing
+    the connections. The `data` attribute is only created when it is first
+    accessed; `materialize()` returns an equivalent editable Pattern.
 
-            # Each node's name corresponds to the port identifier string:
-            g.add_node(id, d)
+    Examples
+    --------
+    >>> p = StructuredPattern.all_to_all('/x[0]', '/y[0:10000]',
+    ...                                  from_sel='/x[0]', to_sel='/y[0:10000]')
+    >>> len(p)
+    10000
 
-        # Add all of the connections as edges:
-        for t in self.data.index:
-            t_from = t[self.from_slice]
-            t_to = t[self.to_slice]
-            id_from = self.sel.tokens_to_str(t_from)
-            id_to = self.sel.tokens_to_str(t_to)
-            d = self.data.ix[t].to_dict()
+    Parameters
+    ----------
+    sel0, sel1, ...: str, unicode, or sequence
+        Selectors defining the sets of ports potentially connected by the 
+        pattern. These selectors must be disjoint, i.e., no identifier 
+        comprised by one selector may be in any other selector.
+    from_sel, to_sel : str
+        Selectors that describe the source and destination ports in the order
+        in which they are connected. All of the ports comprised by each
+        selector must be in a single interface. Either both or neither must
+        be specified; if neither is specified, the pattern contains no
+        connections.
+    gpot_sel, spike_sel : str
+        Selectors that describe the graded potential and spiking ports
+        in the pattern's interfaces.
+    blocks : sequence of sequence
+        Sequence of `(n_from, n_to)` pairs that specify the numbers of source
+        and destination ports in consecutive all-to-all blocks; only used
+        by the block_diagonal generator.
+    from_start, from_step, to_start, to_step : int
+        Positions of the first connected source and destination ports and the
+        increments between the positions of consecutive connected ports;
+        only used by the strided generator.
+    n : int
+        Number of connections; only used by the strided generator. If not
+        specified, ports are connected until the source or destination ports
+        are exhausted.
+    generator : str
+        Generator name.
+    data : scalar
+        Value of the 'conn' attribute of all connections.
+    columns : sequence of str
+        Data column names.
+    validate : bool
+        If True, prohibit fan-in connections to destination ports from
+        different blocks. The destination ports of a product block receive
+        connections from all of the block's source ports, so all_to_all and
+        block_diagonal patterns may contain fan-in connections.
+
+    See Also
+    --------
+    Pattern
+    """
+
+    def __init__(self, *selectors, **kwargs):
+        from_sel = kwargs['from_sel'] if kwargs.has_key('from_sel') else None
+        to_sel = kwargs['to_sel'] if kwargs.has_key('to_sel') else None
+        gpot_sel = kwargs['gpot_sel'] if kwargs.has_key('gpot_sel') else None
+        spike_sel = kwargs['spike_sel'] if kwargs.has_key('spike_sel') else None
+        generator = kwargs['generator'] if kwargs.has_key('generator') \
+                    else 'all_to_all'
+        value = kwargs['data'] if kwargs.has_key('data') else 1
+        columns = kwargs['columns'] if kwargs.has_key('columns') else ['conn']
+        validate = kwargs['validate'] if kwargs.has_key('validate') else True
+        if not np.isscalar(value):
+            raise ValueError('connection data must be a scalar')
+
+        super(StructuredPattern, self).__init__(*selectors, columns=columns)
+        self._columns = list(columns)
+        self._data = None
+        self.generator = generator
+        self._value = value
+
+        num_levels = self.interface.num_levels
+        if (from_sel is None) != (to_sel is None):
+            raise ValueError('from_sel and to_sel must either both be '
+                             'specified or both be omitted')
+        if from_sel is None:
+            self._from_ports = []
+            self._to_ports = []
+            self._from_int = self._to_int = None
+        else:
+            from_int = self.interface.which_int(from_sel)
+            to_int = self.interface.which_int(to_sel)
+            if len(from_int) != 1 or len(to_int) != 1 or from_int == to_int:
+                raise ValueError('source and destination ports must be in '
+                                 'two different interfaces')
+            self._from_int = from_int.pop()
+            self._to_int = to_int.pop()
+            self._from_ports = map(tuple, self.sel.expand(from_sel, num_levels))
+            self._to_ports = map(tuple, self.sel.expand(to_sel, num_levels))
+        self._from_index = self._make_port_index(self._from_ports)
+        self._to_index = self._make_port_index(self._to_ports)
+        n_from = len(self._from_ports)
+        n_to = len(self._to_ports)
+
+        # Describe the connections as a list of (kind, source port positions,
+        # destination port positions) blocks:
+        if generator == 'all_to_all':
+            self._blocks = [('prod', np.arange(n_from), np.arange(n_to))]
+        elif generator == 'one_to_one':
+            if n_from != n_to:
+                raise ValueError('one_to_one generator requires equal '
+                                 'numbers of source and destination ports')
+            self._blocks = [('pair', np.arange(n_from), np.arange(n_to))]
+        elif generator == 'block_diagonal':
+            blocks = kwargs['blocks'] if kwargs.has_key('blocks') else []
+            self._blocks = []
+            i = j = 0
+            for b_from, b_to in blocks:
+                self._blocks.append(('prod', np.arange(i, i+b_from),
+                                     np.arange(j, j+b_to)))
+                i += b_from
+                j += b_to
+            if i > n_from or j > n_to:
+                raise ValueError('blocks contain more ports than selectors')
+        elif generator == 'strided':
+            from_start = kwargs.get('from_start', 0)
+            from_step = kwargs.get('from_step', 1)
+            to_start = kwargs.get('to_start', 0)
+            to_step = kwargs.get('to_step', 1)
+            if from_step < 1 or to_step < 1:
+                raise ValueError('strides must be positive')
+            from_pos = np.arange(from_start, n_from, from_step)
+            to_pos = np.arange(to_start, n_to, to_step)
+            n = min(len(from_pos), len(to_pos))
+            if kwargs.get('n') is not None:
+                if kwargs['n'] > n:
+                    raise ValueError('too few ports for specified number '
+                                     'of connections')
+                n = kwargs['n']
+            self._blocks = [('pair', from_pos[:n], to_pos[:n])]
+        else:
+            raise ValueError('unrecognized generator %s' % generator)
+        if validate:
+            self.__validate_blocks__()
 
-            # Discard the 'conn' attribute because the existence of the edge
-            # indicates that the connection exists:
-            if d.has_key('conn'):
-                d.pop('conn')
+        # Update the `io` and `type` attributes of the pattern's interfaces:
+        if from_sel is not None:
+            self.interface[from_sel, 'io'] = 'in'
+            self.interface[to_sel, 'io'] = 'out'
+        if gpot_sel is not None:
+            self.interface[gpot_sel, 'type'] = 'gpot'
+        if spike_sel is not None:
+            self.interface[spike_sel, 'type'] = 'spike'
 
-            g.add_edge(id_from, id_to, d)
+    def _make_port_index(self, ports):
+        """
+        Create an index like that of the pattern's interface from port tuples.
+        """
 
-        return g
+        if isinstance(self.interface.index, pd.MultiIndex):
+            if not ports:
+                return pd.MultiIndex(levels=[[]]*self.interface.num_levels,
+                                     labels=[[]]*self.interface.num_levels)
+            return pd.MultiIndex.from_tuples(ports)
+        else:
+            return pd.Index([t[0] for t in ports], dtype=object)
+
+    def __validate_blocks__(self):
+        """
+        Raise an exception if the connection blocks contain fan-in connections.
+
+        Fan-in connections within a product block are permitted.
+        """
+
+        # Count the blocks and paired connections received by each
+        # destination port:
+        counts = np.zeros(len(self._to_ports), dtype=np.int64)
+        for kind, f, t in self._blocks:
+            if kind == 'prod':
+                if len(f):
+                    counts[t] += 1
+            else:
+                np.add.at(counts, t, 1)
+        if np.any(counts > 1):
+            raise ValueError('Fan-in pattern entries detected.')
+
+    @classmethod
+    def all_to_all(cls, *selectors, **kwargs):
+        """
+        Create pattern connecting every source port to every destination port.
+
+        See Also
+        --------
+        StructuredPattern
+        """
+
+        kwargs['generator'] = 'all_to_all'
+        return cls(*selectors, **kwargs)
+
+    @classmethod
+    def one_to_one(cls, *selectors, **kwargs):
+        """
+        Create pattern connecting each source port to one destination port.
+
+        See Also
+        --------
+        StructuredPattern
+        """
+
+        kwargs['generator'] = 'one_to_one'
+        return cls(*selectors, **kwargs)
+
+    @classmethod
+    def block_diagonal(cls, *selectors, **kwargs):
+        """
+        Create pattern connecting consecutive blocks of ports all-to-all.
+
+        See Also
+        --------
+        StructuredPattern
+        """
+
+        kwargs['generator'] = 'block_diagonal'
+        return cls(*selectors, **kwargs)
+
+    @classmethod
+    def strided(cls, *selectors, **kwargs):
+        """
+        Create pattern connecting evenly spaced source and destination ports.
+
+        See Also
+        --------
+        StructuredPattern
+        """
+
+        kwargs['generator'] = 'strided'
+        return cls(*selectors, **kwargs)
+
+    @classmethod
+    def from_product(cls, *selectors, **kwargs):
+        """
+        Create pattern from the product of identifiers comprised by two selectors.
+
+        Equivalent to `StructuredPattern.all_to_all()`.
+        """
+
+        return cls.all_to_all(*selectors, **kwargs)
+
+    @classmethod
+    def from_concat(cls, *selectors, **kwargs):
+        """
+        Create pattern from the concatenation of identifers in two selectors.
+
+        Equivalent to `StructuredPattern.one_to_one()`.
+        """
+
+        return cls.one_to_one(*selectors, **kwargs)
+
+    def _get_data(self):
+        if self._data is None:
+            self._data = self._make_data()
+        return self._data
+    data = property(_get_data, Pattern.data.fset, doc=Pattern.data.__doc__)
+
+    def __getstate__(self):
+
+        # Don't pickle connection data that can be regenerated:
+        state = self.__dict__.copy()
+        state['_data'] = None
+        return state
+
+    def _make_data(self):
+        """
+        Create a DataFrame containing all of the pattern's connections.
+        """
+
+        from_pos = []
+        to_pos = []
+        for kind, f, t in self._blocks:
+            if kind == 'prod':
+                from_pos.append(np.repeat(f, len(t)))
+                to_pos.append(np.tile(t, len(f)))
+            else:
+                from_pos.append(f)
+                to_pos.append(t)
+        from_pos = np.concatenate(from_pos) if from_pos else np.array([], int)
+        to_pos = np.concatenate(to_pos) if to_pos else np.array([], int)
+
+        num_levels = self.interface.num_levels
+        names = ['from_%s' % i for i in xrange(num_levels)]+ \
+                ['to_%s' % i for i in xrange(num_levels)]
+        if not len(from_pos):
+            levels = [[] for i in xrange(len(names))]
+            idx = pd.MultiIndex(levels=levels, labels=levels, names=names)
+        else:
+            from_levels, _ = _tuples_to_level_arrays(self._from_ports)
+            to_levels, _ = _tuples_to_level_arrays(self._to_ports)
+            idx = pd.MultiIndex.from_arrays([a[from_pos] for a in from_levels]+\
+                                            [a[to_pos] for a in to_levels],
+                                            names=names)
+        columns = self._columns
+        data = pd.DataFrame(index=idx, columns=columns, dtype=object)
+        data[columns[0]] = np.array([self._value]*len(idx), dtype=object)
+        return data
+
+    def materialize(self):
+        """
+        Create a Pattern instance containing the pattern's connections.
+
+        Returns
+        -------
+        p : Pattern
+            Pattern instance with the same interface and connections as this
+            instance.
+        """
+
+        # Create pattern with phony selectors:
+        p = Pattern('/foo[0]', '/bar[0]')
+        p.interface = Interface._from_valid_df(self.interface.data.copy(),
+                                               self.interface.num_levels)
+        p.num_levels = self.num_levels.copy()
+        p.data = self._make_data()
+        return p
+
+    def __setitem__(self, key, value):
+        raise TypeError('structured patterns cannot be modified; '
+                        'use materialize() to obtain a Pattern')
+
+    def clear(self):
+        raise TypeError('structured patterns cannot be modified; '
+                        'use materialize() to obtain a Pattern')
+
+    def __len__(self):
+        return sum([len(f)*len(t) if kind == 'prod' else len(f) \
+                    for kind, f, t in self._blocks])
+
+    def __repr__(self):
+        return 'StructuredPattern\n-----------------\n%s: %i connections '\
+            'from interface %s to interface %s' % \
+            (self.generator, len(self), self._from_int, self._to_int)
+
+    def _port_mask(self, idx, t, sel):
+        """
+        Find ports of the specified type comprised by a selector.
+
+        Parameters
+        ----------
+        idx : pandas.Index or pandas.MultiIndex
+            Index of source or destination ports.
+        t : str
+            Port type. If None, ports of all types are selected.
+        sel : str
+            Port selector. If None, all ports are selected.
+
+        Returns
+        -------
+        mask : numpy.ndarray of bool
+            Mask indicating which ports in `idx` are selected.
+        """
+
+        mask = np.ones(len(idx), dtype=np.bool_)
+        if t is not None:
+            rows = self.interface.index.get_indexer(idx)
+            mask &= self.interface.data['type'].values[rows] == t
+        if sel is not None:
+            mask &= self.interface[sel].index.get_indexer(idx) >= 0
+        return mask
+
+    def _select_blocks(self, src_int, dest_int, src_type, dest_type,
+                       src_ports=None, dest_ports=None):
+        """
+        Restrict the connection blocks to the specified ports.
+
+        Returns
+        -------
+        blocks : list
+            List of (kind, source port positions, destination port positions)
+            tuples; empty if no connections between the specified interfaces
+            exist.
+        """
+
+        assert src_int != dest_int
+        assert src_int in self.interface.interface_ids and \
+            dest_int in self.interface.interface_ids
+        if (src_int, dest_int) != (self._from_int, self._to_int):
+            return []
+        from_mask = self._port_mask(self._from_index, src_type, src_ports)
+        to_mask = self._port_mask(self._to_index, dest_type, dest_ports)
+        blocks = []
+        for kind, f, t in self._blocks:
+            if kind == 'prod':
+                f = f[from_mask[f]]
+                t = t[to_mask[t]]
+                if len(f) and len(t):
+                    blocks.append((kind, f, t))
+            else:
+                keep = from_mask[f] & to_mask[t]
+                if keep.any():
+                    blocks.append((kind, f[keep], t[keep]))
+        return blocks
+
+    @staticmethod
+    def _unique_in_order(x):
+        """
+        Remove duplicate entries without perturbing the order of the rest.
+        """
+
+        _, i = np.unique(x, return_index=True)
+        return x[np.sort(i)]
+
+    def src_idx(self, src_int, dest_int,
+                src_type=None, dest_type=None, dest_ports=None, duplicates=False):
+        blocks = self._select_blocks(src_int, dest_int, src_type, dest_type,
+                                     dest_ports=dest_ports)
+        if not blocks:
+            return []
+        if duplicates:
+            pos = np.concatenate([np.repeat(f, len(t)) if kind == 'prod' else f \
+                                  for kind, f, t in blocks])
+        else:
+            pos = self._unique_in_order(np.concatenate([f for kind, f, t in blocks]))
+        return [self._from_ports[i] for i in pos]
+    src_idx.__doc__ = Pattern.src_idx.__doc__
+
+    def dest_idx(self, src_int, dest_int, 
+                 src_type=None, dest_type=None, src_ports=None):
+        blocks = self._select_blocks(src_int, dest_int, src_type, dest_type,
+                                     src_ports=src_ports)
+        if not blocks:
+            return []
+        pos = self._unique_in_order(np.concatenate([t for kind, f, t in blocks]))
+        return [self._to_ports[i] for i in pos]
+    dest_idx.__doc__ = Pattern.dest_idx.__doc__
+
+    def is_connected(self, from_int, to_int):
+        assert from_int != to_int
+        assert from_int in self.interface.interface_ids
+        assert to_int in self.interface.interface_ids
+        return (from_int, to_int) == (self._from_int, self._to_int) and \
+            self._value != 0 and len(self) > 0
+    is_connected.__doc__ = Pattern.is_connected.__doc__
 
 def are_compatible(sel_in_0, sel_out_0, sel_spike_0, sel_gpot_0, 
                    sel_in_1, sel_out_1, sel_spike_1, sel_gpot_1,
@@ -2032,3 +2751,352 @@ def are_compatible(sel_in_0, sel_out_0, sel_spike_0, sel_gpot_0,
                                      sel_spike_1, sel_gpot_1, sel_1)
 
     return int_0.is_compatible(0, int_1, 0)
+
+def _index_to_arrays(idx):
+    """
+    Split an index into per-level category tables and int32 codes.
+
+    Parameters
+    ----------
+    idx : pandas.Index or pandas.MultiIndex
+        Index to split.
+
+    Returns
+    -------
+    levels : list of list
+        Distinct values in each level of the index.
+    codes : list of numpy.ndarray
+        Positions in the corresponding level of each index entry's values.
+    """
+
+    if isinstance(idx, pd.MultiIndex):
+        levels = [l.tolist() for l in idx.levels]
+        codes = [np.asarray(c, dtype=np.int32) for c in idx.labels]
+    else:
+        c, u = pd.factorize(idx)
+        levels = [list(u)]
+        codes = [np.asarray(c, dtype=np.int32)]
+    return levels, codes
+
+def _level_to_arrays(level):
+    """
+    Encode a list of integer or string index values as arrays.
+
+    Returns a string array containing the values and a boolean array indicating
+    which values are integers so that the level can be stored without pickling.
+    """
+
+    is_int = np.array([isinstance(v, (int, long, np.integer)) for v in level],
+                      dtype=np.bool_)
+    for v in level:
+        if not isinstance(v, (int, long, np.integer, str, unicode)):
+            raise ValueError('cannot save index value %s' % repr(v))
+    if any(isinstance(v, unicode) for v in level):
+        values = np.array([unicode(v) for v in level], dtype=np.unicode_)
+    else:
+        values = np.array([str(v) for v in level], dtype=np.string_)
+    if not len(level):
+        values = values.astype(np.string_)
+    return values, is_int
+
+def _arrays_to_level(values, is_int):
+    """
+    Decode index values encoded by `_level_to_arrays`.
+    """
+
+    values = values.tolist()
+    return [int(v) if i else v for v, i in zip(values, is_int.tolist())]
+
+def _column_to_arrays(s):
+    """
+    Encode a DataFrame column as typed arrays.
+
+    Parameters
+    ----------
+    s : pandas.Series
+        Column to encode.
+
+    Returns
+    -------
+    kind : str
+        Column encoding; one of 'array' (non-object column stored as is),
+        'null' (all entries null), 'bool', 'int', 'float', or 'str'.
+    arrays : dict of numpy.ndarray
+        Arrays containing the encoded column. Null entries in 'bool' and 'int'
+        columns are tracked by a mask; null entries in 'str' columns are
+        denoted by a code of -1.
+    """
+
+    if s.dtype != object:
+        return 'array', {'values': s.values}
+
+    values = s.values
+    null = np.asarray(pd.isnull(values), dtype=np.bool_)
+    non_null = values[~null].tolist()
+    if not len(non_null):
+        return 'null', {}
+    if all(isinstance(v, (bool, np.bool_)) for v in non_null):
+        kind, dtype = 'bool', np.bool_
+    elif all(isinstance(v, (int, long, np.integer)) and \
+             not isinstance(v, (bool, np.bool_)) for v in non_null):
+        kind, dtype = 'int', np.int64
+    elif all(isinstance(v, (int, long, float, np.integer, np.floating)) and \
+             not isinstance(v, (bool, np.bool_)) for v in non_null):
+        kind, dtype = 'float', np.float64
+    elif all(isinstance(v, (str, unicode)) for v in non_null):
+        codes, categories = pd.factorize(values)
+        level, _ = _level_to_arrays(list(categories))
+        return 'str', {'codes': np.asarray(codes, dtype=np.int32),
+                       'categories': level}
+    else:
+        raise ValueError('cannot save column %s with mixed or '
+                         'unsupported value types' % s.name)
+    result = np.zeros(len(values), dtype=dtype)
+    result[~null] = non_null
+    if kind == 'float':
+        result[null] = np.nan
+    return kind, {'values': result, 'null': null}
+
+def _arrays_to_column(kind, arrays, n):
+    """
+    Decode a column encoded by `_column_to_arrays` into an array.
+
+    Columns that were originally of object dtype are restored as object arrays
+    containing Python scalars and NaN in place of null entries.
+    """
+
+    if kind == 'array':
+        return arrays['values']
+    result = np.empty(n, dtype=object)
+    result[:] = np.nan
+    if kind == 'null':
+        return result
+    elif kind == 'str':
+        codes = np.asarray(arrays['codes'])
+        categories = np.array(arrays['categories'].tolist()+[np.nan],
+                              dtype=object)
+        return categories[codes]
+    else:
+        null = np.asarray(arrays['null'])
+        result[~null] = arrays['values'][~null].tolist()
+        return result
+
+def _df_to_arrays(df, prefix):
+    """
+    Encode a DataFrame as a header dict and a dict of named arrays.
+    """
+
+    arrays = {}
+    levels, codes = _index_to_arrays(df.index)
+    for n, (level, c) in enumerate(zip(levels, codes)):
+        values, is_int = _level_to_arrays(level)
+        arrays['%slevel_%i' % (prefix, n)] = values
+        arrays['%sis_int_%i' % (prefix, n)] = is_int
+        arrays['%scodes_%i' % (prefix, n)] = c
+    columns = []
+    for n, col in enumerate(df.columns):
+        kind, col_arrays = _column_to_arrays(df[col])
+        for k, v in col_arrays.iteritems():
+            arrays['%scol_%i_%s' % (prefix, n, k)] = v
+        columns.append([col, kind])
+    header = {'multi': isinstance(df.index, pd.MultiIndex),
+              'names': list(df.index.names),
+              'num_levels': len(levels),
+              'columns': columns,
+              'len': len(df)}
+    return header, arrays
+
+def _unjson(x):
+    """
+    Convert unicode strings decoded from JSON back to str if possible.
+    """
+
+    if isinstance(x, unicode):
+        try:
+            return str(x)
+        except UnicodeEncodeError:
+            return x
+    return x
+
+def _arrays_to_df(header, arrays, prefix):
+    """
+    Decode a DataFrame encoded by `_df_to_arrays`.
+    """
+
+    names = [_unjson(x) for x in header['names']]
+    levels = []
+    codes = []
+    for n in xrange(header['num_levels']):
+        levels.append(_arrays_to_level(arrays['%slevel_%i' % (prefix, n)],
+                                       arrays['%sis_int_%i' % (prefix, n)]))
+        codes.append(arrays['%scodes_%i' % (prefix, n)])
+    if header['multi']:
+        idx = pd.MultiIndex(levels=levels, labels=codes, names=names,
+                            verify_integrity=False)
+    else:
+        idx = pd.Index(np.array(levels[0], dtype=object)[codes[0]],
+                       name=names[0], dtype=object)
+    data = OrderedDict()
+    columns = []
+    for n, (col, kind) in enumerate(header['columns']):
+        col = _unjson(col)
+        col_prefix = '%scol_%i_' % (prefix, n)
+        col_arrays = {k[len(col_prefix):]: v for k, v in arrays.iteritems() \
+                      if k.startswith(col_prefix)}
+        data[col] = _arrays_to_column(kind, col_arrays, header['len'])
+        columns.append(col)
+    return pd.DataFrame(data, index=idx, columns=columns)
+
+def _save_arrays(file_name, header, arrays):
+    """
+    Save a header and named arrays to an uncompressed .npz file.
+    """
+
+    arrays = arrays.copy()
+    arrays['header'] = np.array(json.dumps(header))
+
+    # Pass a file object to prevent numpy from appending '.npz' to the file
+    # name:
+    with open(file_name, 'wb') as f:
+        np.savez(f, **arrays)
+
+def _load_arrays(file_name, mmap=True):
+    """
+    Load a header and named arrays from an uncompressed .npz file.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of file written by `_save_arrays`.
+    mmap : bool
+        If True, memory-map the arrays stored in the file rather than reading
+        them into memory.
+
+    Returns
+    -------
+    header : dict
+        Header describing the stored data.
+    arrays : dict of numpy.ndarray
+        Stored arrays.
+    """
+
+    arrays = {}
+    with zipfile.ZipFile(file_name) as z, open(file_name, 'rb') as f:
+        for info in z.infolist():
+            if not info.filename.endswith('.npy'):
+                continue
+            name = info.filename[:-4]
+            if name == 'header' or not mmap or \
+               info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.lib.format.read_array(z.open(info))
+                continue
+
+            # Find the start of the member's data by skipping its local file
+            # header, whose variable-length fields may differ from those in the
+            # central directory:
+            f.seek(info.header_offset)
+            h = f.read(30)
+            if h[:4] != 'PK\x03\x04':
+                raise ValueError('invalid file header for %s' % info.filename)
+            name_len, extra_len = struct.unpack('<HH', h[26:30])
+            f.seek(info.header_offset+30+name_len+extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = \
+                    np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = \
+                    np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject or not np.prod(shape) or shape == ():
+                f.seek(info.header_offset+30+name_len+extra_len)
+                arrays[name] = np.lib.format.read_array(f)
+            else:
+                arrays[name] = np.memmap(file_name, dtype=dtype, mode='r',
+                                         offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    header = json.loads(str(arrays.pop('header')[()]))
+    return header, arrays
+
+# Regular expressions matching the tokens of a single port identifier, i.e.,
+# the STRING, INTEGER, and single-integer INTEGER_SET tokens recognized by
+# plsel.SelectorParser:
+_id_token = r'/([^*/\[\]\(\):,\.\d][^+*/\[\]\(\):,\.]*)|/?(\d+)|/?\[(\d+)\]'
+_id_token_re = re.compile(_id_token)
+_id_re = re.compile(r'(?:%s)+\Z' % _id_token)
+
+def _identifier_to_tuple(s):
+    """
+    Convert a port identifier string to a tuple of tokens.
+
+    Simple identifiers such as '/foo/bar[0]' are tokenized with a regular
+    expression; other identifiers are expanded by the selector parser.
+
+    Parameters
+    ----------
+    s : str or unicode
+        Port identifier.
+
+    Returns
+    -------
+    t : tuple
+        Tokens comprised by the identifier, e.g., ('foo', 'bar', 0).
+    """
+
+    if type(s) in [str, unicode] and _id_re.match(s):
+        return tuple(a if a else int(b or c) for a, b, c in \
+                     _id_token_re.findall(s))
+    s_exp = SelectorMethods.expand(s)
+    if len(s_exp) != 1:
+        raise ValueError('%s is not a port identifier' % s)
+    return tuple(s_exp[0])
+
+def _tuples_to_level_arrays(tuples):
+    """
+    Convert port identifier tuples into per-level object arrays.
+
+    Identifiers with fewer levels than the longest identifier are padded with
+    blank entries.
+
+    Returns
+    -------
+    level_arrays : list of numpy.ndarray
+        Values of each level of the identifiers.
+    num_levels : int
+        Maximum number of levels.
+    """
+
+    num_levels = max(len(t) for t in tuples) if tuples else 0
+    level_arrays = []
+    for j in xrange(num_levels):
+        a = np.empty(len(tuples), dtype=object)
+        a[:] = [t[j] if j < len(t) else '' for t in tuples]
+        level_arrays.append(a)
+    return level_arrays, num_levels
+
+def _pad_index(idx, n):
+    """
+    Pad an index with blank levels.
+
+    Parameters
+    ----------
+    idx : pandas.Index or pandas.MultiIndex
+        Index to pad.
+    n : int
+        Number of levels in the padded index.
+
+    Returns
+    -------
+    result : pandas.MultiIndex
+        Index with `n` levels whose trailing levels are blank.
+    """
+
+    if isinstance(idx, pd.MultiIndex):
+        levels = list(idx.levels)
+        labels = list(idx.labels)
+    else:
+        labels, uniques = pd.factorize(idx)
+        levels = [uniques]
+        labels = [labels]
+    levels += [['']]*(n-len(levels))
+    labels += [np.zeros(len(idx), dtype=np.int8)]*(n-len(labels))
+    return pd.MultiIndex(levels=levels, labels=labels, verify_integrity=False)
@@ -275,6 +275,9 @@ class PortMapper(BasePortMapper):
         1D data array to map to ports. If no data array is specified, port
         identifiers will still be mapped to their sequential indices but 
         __getitem__() and __setitem__() will raise exceptions if invoked.
+        A 2D array may also be specified, in which case each row is mapped to
+        a port (e.g., to map the data of several replicas of an emulation to
+        the same ports); the port identifiers then select entire rows.
     portmap : sequence of int
         Integer indices to map to port identifiers. If no map is specified,
         it is assumed to be an array of consecutive integers from 0
@@ -308,8 +311,9 @@ class PortMapper(BasePortMapper):
         if data is None:
             return True
         try:
-            # Cannot handle more than 1 dimension:
-            assert np.ndim(data) <= 1
+            # Cannot handle more than 2 dimensions; the first dimension always
+            # corresponds to the ports:
+            assert np.ndim(data) <= 2
 
             # The integers in the port map must be valid indices into the
             # data array:
@@ -378,8 +382,39 @@ class PortMapper(BasePortMapper):
         return c
 
     @classmethod
-    def from_index(cls, idx, data, portmap=None):
-        raise NotImplementedError
+    def from_index(cls, idx, data, portmap=None, make_copy=True):
+        """
+        Create port mapper from a Pandas index, data, and integer indices.
+
+        Parameters
+        ----------
+        idx : pandas.MultiIndex
+            Index containing selector data.
+        data : numpy.ndarray
+            1D or 2D data array to map to ports.
+        portmap : sequence of int
+            Integer indices to map to port identifiers. If no map is specified,
+            it is assumed to be an array of consecutive integers from 0
+            through one less than the number of ports.
+        make_copy : bool
+            If True, map a copy of the specified data array to the specified
+            port identifiers.
+
+        Returns
+        -------
+        result : neurokernel.plsel.PortMapper
+            New port mapper instance.
+        """
+
+        pm = super(PortMapper, cls).from_index(idx, portmap)
+        if data is not None:
+            if np.ndim(data) == 0:
+                pm.data = np.full(len(pm), data)
+            elif make_copy:
+                pm.data = data.copy()
+            else:
+                pm.data = data
+        return pm
 
     @classmethod
     def from_pm(cls, pm):
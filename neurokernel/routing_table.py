@@ -57,6 +57,8 @@ class RoutingTable(object):
         Check whether the routing table contains the specified identifier.
     ids()
         IDs currently in routing
+    neighborhood(id)
+        Return subtable containing only those connections to or from the specified identifier.
     src_ids(dest_id)
         Source identifiers connected to the specified destination identifier.
     subtable(ids)
@@ -171,6 +173,22 @@ class RoutingTable(object):
         
         return RoutingTable(self.data.subgraph(ids))
 
+    def neighborhood(self, id):
+        """
+        Return subtable containing only those connections to or from the specified identifier.
+
+        The data dicts of the connections in the subtable are copies of those
+        in the original table.
+        """
+
+        r = self.__class__()
+        if self.data.has_node(id):
+            r.data.add_node(id)
+            for src_id, dest_id, data in self.data.in_edges(id, data=True)+\
+                    self.data.out_edges(id, data=True):
+                r.data.add_edge(src_id, dest_id, dict(data))
+        return r
+
     def to_df(self):
         """
         Return a pandas DataFrame listing all of the connections.
@@ -10,6 +10,7 @@ import os.path
 import re
 
 import networkx as nx
+import numpy as np
 
 # Work around bug in networkx < 1.9 that causes networkx to choke on GEXF 
 # files with boolean attributes that contain the strings 'True' or 'False'
@@ -23,6 +24,11 @@ import pandas
 
 from .. import core
 
+try:
+    import pymetis
+except ImportError:
+    pymetis = None
+
 def graph_to_df(g):
     """
     Convert a directed multigraph into pandas DataFrames.
@@ -86,3 +92,209 @@ def graph_to_df(g):
 
     return df_node, df_edge
 
+def _refine_partition(w, parts, n_parts, max_part_size):
+    """
+    Reduce the weight of the edges cut by a partition.
+
+    Repeatedly applies the move of a single node to a part with free capacity
+    or the swap of two nodes in different parts that most reduces the weight
+    of the cut edges until no such move or swap exists.
+
+    Parameters
+    ----------
+    w : numpy.ndarray
+        Symmetric weighted adjacency matrix with zero diagonal.
+    parts : numpy.ndarray
+        Part index of each node; modified in place.
+    n_parts : int
+        Number of parts.
+    max_part_size : int
+        Maximum number of nodes in each part.
+    """
+
+    N = len(w)
+    if N < 2:
+        return
+
+    # conn[i, p] is the total weight of the edges between node i and the
+    # nodes in part p:
+    conn = w.dot(np.eye(n_parts)[parts])
+    sizes = np.bincount(parts, minlength=n_parts)
+    tol = 1e-9*max(w.max(), 1.0)
+    r = np.arange(N)
+    for i in xrange(10*N):
+        own = conn[r, parts]
+
+        # Gain of swapping nodes u and v:
+        a = conn[:, parts]-own[:, np.newaxis]
+        swap_gain = a+a.T-2*w
+        swap_gain[parts[:, np.newaxis] == parts[np.newaxis, :]] = -np.inf
+        u, v = np.unravel_index(np.argmax(swap_gain), swap_gain.shape)
+
+        # Gain of moving node u to part p:
+        move_gain = conn-own[:, np.newaxis]
+        move_gain[:, sizes >= max_part_size] = -np.inf
+        move_gain[r, parts] = -np.inf
+        m, p = np.unravel_index(np.argmax(move_gain), move_gain.shape)
+
+        if move_gain[m, p] >= swap_gain[u, v] and move_gain[m, p] > tol:
+            sizes[parts[m]] -= 1
+            sizes[p] += 1
+            conn[:, parts[m]] -= w[:, m]
+            conn[:, p] += w[:, m]
+            parts[m] = p
+        elif swap_gain[u, v] > tol:
+            pu, pv = parts[u], parts[v]
+            conn[:, pu] += w[:, v]-w[:, u]
+            conn[:, pv] += w[:, u]-w[:, v]
+            parts[u], parts[v] = pv, pu
+        else:
+            break
+
+def partition(mat, n_parts, max_part_size=None):
+    """
+    Partition a weighted graph so as to minimize the weight of cut edges.
+
+    Parameters
+    ----------
+    mat : numpy.ndarray
+        Square weighted connectivity matrix of a directed graph; the weights
+        of the edges in both directions between two nodes are combined.
+    n_parts : int
+        Number of parts.
+    max_part_size : int
+        Maximum number of nodes in each part. If None, the nodes are divided as
+        evenly as possible between the parts.
+
+    Returns
+    -------
+    parts : numpy.ndarray
+        Part index of each node.
+
+    Notes
+    -----
+    The partition is computed with METIS via pymetis if the latter is
+    installed and greedily otherwise; in both cases, the partition is adjusted
+    to satisfy `max_part_size` and refined by moving and swapping nodes
+    between parts.
+    """
+
+    mat = np.asarray(mat, np.double)
+    if mat.ndim != 2 or mat.shape[0] != mat.shape[1]:
+        raise ValueError('connectivity matrix must be square')
+    N = len(mat)
+    if max_part_size is None:
+        max_part_size = int(np.ceil(N/float(n_parts)))
+    if n_parts < 1 or n_parts*max_part_size < N:
+        raise ValueError('insufficient capacity to partition graph')
+
+    # Combine weights of directed edges to obtain undirected graph:
+    w = mat+mat.T
+    np.fill_diagonal(w, 0)
+
+    parts = None
+    if pymetis is not None and n_parts > 1 and N > n_parts and w.any():
+
+        # Convert matrix into METIS-compatible form with integer weights:
+        if not np.all(w == np.round(w)):
+            w_int = np.round(w*1e6/w.max()).astype(int)
+        else:
+            w_int = w.astype(int)
+        xadj = [0]
+        adjncy = []
+        eweights = []
+        for i in xrange(N):
+            j = np.flatnonzero(w_int[i])
+            adjncy.extend(j)
+            eweights.extend(w_int[i, j])
+            xadj.append(len(adjncy))
+        _, parts = pymetis.part_graph(n_parts, xadj=xadj, adjncy=adjncy,
+                                      eweights=eweights)
+        parts = np.asarray(parts, int)
+
+        # Move the most weakly attached nodes out of parts that exceed the
+        # maximum size:
+        sizes = np.bincount(parts, minlength=n_parts)
+        for p in np.flatnonzero(sizes > max_part_size):
+            nodes = np.flatnonzero(parts == p)
+            attach = w[np.ix_(nodes, nodes)].sum(axis=1)
+            for i in nodes[np.argsort(attach, kind='mergesort')]:
+                if sizes[p] <= max_part_size:
+                    break
+                conn = np.array([w[i, parts == q].sum() for q in xrange(n_parts)])
+                conn[sizes >= max_part_size] = -np.inf
+                q = np.argmax(conn)
+                parts[i] = q
+                sizes[p] -= 1
+                sizes[q] += 1
+    if parts is None:
+
+        # Assign the nodes in order of decreasing total edge weight to the part
+        # with free capacity to which they are most strongly connected,
+        # preferring smaller parts in case of ties:
+        parts = np.empty(N, int)
+        sizes = np.zeros(n_parts, int)
+        conn = np.zeros((N, n_parts))
+        for i in np.argsort(-w.sum(axis=1), kind='mergesort'):
+            score = np.where(sizes < max_part_size, conn[i], -np.inf)
+            best = np.flatnonzero(score == score.max())
+            p = best[np.argmin(sizes[best])]
+            parts[i] = p
+            sizes[p] += 1
+            conn[:, p] += w[:, i]
+
+    _refine_partition(w, parts, n_parts, max_part_size)
+    return parts
+
+def greedy_order(x):
+    """
+    Order nodes so as to greedily maximize the connectivity of visited nodes.
+
+    Starting with the nodes `i` and `j` for which `x[i, j]+x[j, i]` is maximal,
+    repeatedly append the node whose connections to the nodes already in the
+    order have the largest total weight.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        Square weighted connectivity matrix of a directed graph; diagonal
+        entries are ignored.
+
+    Returns
+    -------
+    order : numpy.ndarray
+        Node indices in the computed order. Ties are broken in favor of nodes
+        with lower indices.
+
+    Notes
+    -----
+    The total weights of the connections between each remaining node and the
+    nodes already in the order are updated incrementally, so the order is
+    computed in O(N^2) time.
+    """
+
+    x = np.asarray(x)
+    if x.ndim != 2 or x.shape[0] != x.shape[1]:
+        raise ValueError('connectivity matrix must be square')
+    N = x.shape[0]
+    if N < 2:
+        return np.arange(N)
+    s = (x+x.T).astype(np.double)
+    np.fill_diagonal(s, 0)
+
+    # Find the pair of nodes (i, j), i > j, whose connections have the largest
+    # total weight:
+    s_lower = np.where(np.tri(N, k=-1, dtype=bool), s, -np.inf)
+    i, j = np.unravel_index(np.argmax(s_lower), s_lower.shape)
+    order = [i, j]
+
+    # gain[k] is the total weight of the connections between node k and the
+    # nodes already in the order:
+    gain = s[:, i]+s[:, j]
+    gain[[i, j]] = -np.inf
+    for n in xrange(N-2):
+        k = np.argmax(gain)
+        order.append(k)
+        gain += s[:, k]
+        gain[k] = -np.inf
+    return np.asarray(order)
@@ -4,9 +4,34 @@
 MPI utilities.
 """
 
+import atexit
+
 from mpi4py import MPI
 import twiggy
 
+def init():
+    """
+    Initialize MPI if it has not already been initialized.
+
+    Importing neurokernel prevents mpi4py from initializing MPI when it is
+    imported (see `neurokernel/__init__.py`) so that processes may be forked by
+    the multiprocessing backend without MPI having been initialized; this
+    function must therefore be invoked before MPI is used. MPI is finalized
+    when the process exits.
+    """
+
+    if not MPI.Is_initialized():
+        MPI.Init_thread()
+        atexit.register(finalize)
+
+def finalize():
+    """
+    Finalize MPI if it has been initialized and not already been finalized.
+    """
+
+    if MPI.Is_initialized() and not MPI.Is_finalized():
+        MPI.Finalize()
+
 class MPIOutput(twiggy.outputs.Output):
     """
     Output messages to a file via MPI I/O.
@@ -15,6 +40,7 @@ class MPIOutput(twiggy.outputs.Output):
     def __init__(self, name, format, comm,
                  mode=MPI.MODE_CREATE | MPI.MODE_WRONLY,
                  close_atexit=True):
+        init()
         self.filename = name
         self._format = format if format is not None else self._noop_format
         self.comm = comm
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+
+"""
+Shared memory transport for data transmitted between processes on one machine.
+"""
+
+import errno
+import mmap
+import os
+import platform
+import time
+
+import numpy as np
+
+# Directory in which POSIX shared memory segments are created on Linux:
+SHM_DIR = '/dev/shm'
+
+# Alignment (in bytes) of the header and of the arrays in each slot:
+_ALIGN = 64
+
+# Machine types of the processors whose store ordering guarantees that the
+# consumer of a segment observes the writes to its slots before the write to
+# its sequence counter (and the producer those to the release counter):
+_X86_MACHINES = ['x86_64', 'amd64', 'i386', 'i486', 'i586', 'i686', 'x86']
+
+# Word written to the header of a segment after it has been initialized:
+_MAGIC = 0x6e6b73686d6c6e6b
+
+def _align(n):
+    return (n+_ALIGN-1)//_ALIGN*_ALIGN
+
+def wait_until(cond, timeout=None, spins=1000, max_interval=0.001):
+    """
+    Wait until a condition becomes true.
+
+    The condition is first polled continuously `spins` times, which suffices
+    when the awaited process is only slightly behind; afterwards, it is
+    polled with exponentially increasing sleep intervals so as to not occupy
+    the processor.
+
+    Parameters
+    ----------
+    cond : callable
+        Function that returns True when the condition is satisfied.
+    timeout : float
+        Maximum time (in seconds) to wait. If None, wait indefinitely.
+    spins : int
+        Number of times to poll the condition before sleeping.
+    max_interval : float
+        Maximum time (in seconds) between polls.
+
+    Returns
+    -------
+    result : bool
+        True if the condition was satisfied, False if the timeout elapsed.
+    """
+
+    for i in xrange(spins):
+        if cond():
+            return True
+    if timeout is not None:
+        deadline = time.time()+timeout
+    interval = 1e-6
+    while not cond():
+        if timeout is not None and time.time() >= deadline:
+            return False
+        time.sleep(interval)
+        interval = min(2*interval, max_interval)
+    return True
+
+def supported():
+    """
+    Check whether shared memory segments can be used on the current machine.
+
+    Python provides no memory barriers; the ordering of the writes to the
+    slots and counters of the segments is therefore only guaranteed on x86
+    processors.
+
+    Returns
+    -------
+    result : bool
+        True if the current machine has an x86 processor.
+    """
+
+    return platform.machine().lower() in _X86_MACHINES
+
+class SharedLink(object):
+    """
+    Double-buffered shared memory segment carrying the data of a connection.
+
+    The segment contains a header with a magic word and two counters followed
+    by two slots, each of which holds one array per transmitted buffer. During
+    step `n` (starting with 1), the producer waits until the consumer has
+    released the data of step `n-2`, writes its data into slot `n % 2`, and
+    sets the sequence counter to `n`; the consumer waits until the sequence
+    counter reaches `n`, reads the data directly from the slot, and then sets
+    the release counter to `n`.
+
+    Parameters
+    ----------
+    name : str
+        Name of the segment; the segment is mapped from the file with that
+        name in `SHM_DIR`.
+    dtypes : sequence of numpy.dtype
+        Data types of the transmitted buffers.
+    shapes : sequence of int or tuple
+        Shapes of the transmitted buffers.
+    create : bool
+        If True, the segment is created by the current process (which must be
+        the producer); creation fails if a file with the specified name
+        already exists. If False, the segment is attached to when it is first
+        accessed after the producer has created and initialized it.
+
+    Notes
+    -----
+    Both the producer and the consumer should invoke `close()` when they
+    finish (see the latter for when the segment's file is removed).
+
+    The ordering of the writes to the slots and counters relies on the
+    store ordering guarantees of x86 processors; a RuntimeError is raised if
+    a segment is opened on any other processor (see `supported()`).
+    """
+
+    def __init__(self, name, dtypes, shapes, create=False):
+        if not supported():
+            raise RuntimeError('shared memory links are not supported on %s '
+                               'processors' % platform.machine())
+        self.name = name
+        self.path = os.path.join(SHM_DIR, name)
+        self._dtypes = [np.dtype(dtype) for dtype in dtypes]
+        self._shapes = [tuple(np.atleast_1d(shape)) for shape in shapes]
+        self._offsets = []
+        self._slot_size = 0
+        for dtype, shape in zip(self._dtypes, self._shapes):
+            self._offsets.append(self._slot_size)
+            self._slot_size += _align(dtype.itemsize*int(np.prod(shape)))
+        self.nbytes = _ALIGN+2*self._slot_size
+
+        self._mmap = None
+        self._header = None
+        self._counters = None
+        self.slots = []
+        if create:
+
+            # A file left over by a run that was not shut down cleanly must
+            # not be reused, as its counters would not be valid:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+            try:
+                os.ftruncate(fd, self.nbytes)
+                self._map(fd)
+            finally:
+                os.close(fd)
+
+            # The consumer only attaches to the segment after the magic word
+            # has been written:
+            self._counters[:] = 0
+            self._header[0] = _MAGIC
+
+    def _map(self, fd):
+        """
+        Map the segment from an open file descriptor.
+        """
+
+        self._mmap = mmap.mmap(fd, self.nbytes)
+        self._header = np.frombuffer(self._mmap, np.int64, 3)
+
+        # Sequence and release counters:
+        self._counters = self._header[1:]
+        for i in xrange(2):
+            self.slots.append([np.frombuffer(self._mmap, dtype,
+                                             int(np.prod(shape)),
+                                             _ALIGN+i*self._slot_size+offset).\
+                               reshape(shape) \
+                               for dtype, shape, offset in \
+                               zip(self._dtypes, self._shapes, self._offsets)])
+
+    def _attach(self):
+        """
+        Attach to the segment if the producer has initialized it.
+
+        Returns
+        -------
+        result : bool
+            True if the segment is attached.
+        """
+
+        if self._mmap is not None:
+            return True
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return False
+        try:
+            if os.fstat(fd).st_size != self.nbytes:
+                return False
+            self._map(fd)
+        finally:
+            os.close(fd)
+        if self._header[0] != _MAGIC:
+            self.slots = []
+            self._counters = None
+            self._header = None
+            self._mmap.close()
+            self._mmap = None
+            return False
+        return True
+
+    @property
+    def seq(self):
+        """
+        Last step whose data was written by the producer.
+        """
+
+        if not self._attach():
+            return 0
+        return int(self._counters[0])
+
+    @property
+    def released(self):
+        """
+        Last step whose data was read by the consumer.
+        """
+
+        if not self._attach():
+            return 0
+        return int(self._counters[1])
+
+    def acquire_write(self, n, timeout=None):
+        """
+        Wait until the slot for step `n` can be written.
+
+        Returns
+        -------
+        slot : list of numpy.ndarray
+            Arrays into which to write the data of step `n`, or None if the
+            timeout elapsed.
+        """
+
+        if not wait_until(lambda: self._attach() and \
+                          self._counters[1] >= n-2, timeout):
+            return None
+        return self.slots[n % 2]
+
+    def publish(self, n):
+        """
+        Make the data written for step `n` available to the consumer.
+        """
+
+        self._counters[0] = n
+
+    def acquire_read(self, n, timeout=None):
+        """
+        Wait until the data of step `n` is available.
+
+        Returns
+        -------
+        slot : list of numpy.ndarray
+            Arrays containing the data of step `n`, or None if the timeout
+            elapsed. The arrays must not be accessed after `release()` is
+            invoked.
+        """
+
+        if not wait_until(lambda: self._attach() and \
+                          self._counters[0] >= n, timeout):
+            return None
+        return self.slots[n % 2]
+
+    def release(self, n):
+        """
+        Allow the producer to overwrite the slot containing the data of step `n`.
+        """
+
+        self._counters[1] = n
+
+    def close(self):
+        """
+        Unmap the segment and unlink its file.
+
+        If the segment contains data that has not been read, the consumer may
+        not have opened it yet; the file is then left for the consumer to
+        unlink. A consumer that never attached to the segment attaches to it
+        first if it has been created.
+        """
+
+        if not self._attach():
+            return
+        unlink = self._counters[1] >= self._counters[0]
+        self.slots = []
+        self._counters = None
+        self._mmap.close()
+        if unlink:
+            try:
+                os.unlink(self.path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
@@ -1,7 +1,240 @@
 #!/usr/bin/env python
 
+import json
 import time
 
+import numpy as np
+
+class LogHistogram(object):
+    """
+    Histogram of durations with logarithmically spaced buckets.
+
+    As with HDR histograms, the relative error of the values recovered from the
+    histogram is bounded over the entire range of recorded values rather than
+    the absolute error; each power of 2 is divided into `sub_buckets`
+    logarithmically spaced buckets.
+
+    Parameters
+    ----------
+    min_value, max_value : float
+        Smallest and largest distinguishable values; values outside of this
+        range are counted in the first or last bucket.
+    sub_buckets : int
+        Number of buckets per power of 2.
+
+    Attributes
+    ----------
+    counts : numpy.ndarray
+        Number of values in each bucket.
+    count : int
+        Number of recorded values.
+    total : float
+        Sum of the recorded values.
+    min, max : float
+        Smallest and largest recorded values.
+    """
+
+    def __init__(self, min_value=1e-7, max_value=1e3, sub_buckets=16):
+        if not 0 < min_value < max_value:
+            raise ValueError('invalid value range')
+        self.min_value = min_value
+        self.max_value = max_value
+        self.sub_buckets = sub_buckets
+        n = int(np.ceil(np.log2(max_value/min_value)*sub_buckets))+1
+        self.counts = np.zeros(n, np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def edges(self):
+        """
+        Upper edges of the buckets.
+        """
+
+        return self.min_value*\
+            2.0**(np.arange(1, len(self.counts)+1)/float(self.sub_buckets))
+
+    @property
+    def mean(self):
+        """
+        Mean of the recorded values.
+        """
+
+        return self.total/self.count if self.count else np.nan
+
+    def add(self, values):
+        """
+        Record values.
+
+        Parameters
+        ----------
+        values : array_like
+            Values to record.
+        """
+
+        values = np.asarray(values, np.double).ravel()
+        if not len(values):
+            return
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inds = np.floor(np.log2(values/self.min_value)*self.sub_buckets)
+        inds = np.clip(np.nan_to_num(inds), 0, len(self.counts)-1).astype(int)
+        self.counts += np.bincount(inds, minlength=len(self.counts))
+        self.count += len(values)
+        self.total += values.sum()
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    def merge(self, other):
+        """
+        Add the values recorded by another histogram with the same buckets.
+
+        Parameters
+        ----------
+        other : LogHistogram
+            Histogram to merge.
+        """
+
+        if len(other.counts) != len(self.counts) or \
+           other.min_value != self.min_value or \
+           other.sub_buckets != self.sub_buckets:
+            raise ValueError('incompatible histogram buckets')
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """
+        Estimate percentiles of the recorded values.
+
+        Parameters
+        ----------
+        q : float or sequence of float
+            Percentiles to compute; must be between 0 and 100.
+
+        Returns
+        -------
+        p : float or numpy.ndarray
+            Upper edges of the buckets containing the percentiles, clipped to
+            the range of the recorded values.
+        """
+
+        if not self.count:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        cum = np.cumsum(self.counts)
+        inds = np.searchsorted(cum, np.asarray(q, np.double)/100.0*self.count)
+        inds = np.minimum(inds, len(self.counts)-1)
+        return np.clip(self.edges[inds], self.min, self.max)
+
+    def summary(self, q=[50, 90, 99]):
+        """
+        Summarize the recorded values.
+
+        Parameters
+        ----------
+        q : sequence of float
+            Percentiles to include.
+
+        Returns
+        -------
+        summary : dict
+            Number, mean, minimum, maximum, and the specified percentiles
+            (keyed by 'p<percentile>') of the recorded values.
+        """
+
+        result = {'count': self.count, 'mean': self.mean,
+                  'min': self.min, 'max': self.max}
+        for k, v in zip(q, np.atleast_1d(self.percentile(q))):
+            result['p%s' % k] = v
+        return result
+
+class Tracer(object):
+    """
+    In-memory recorder of timed events.
+
+    The recorded events can be exported in the Chrome trace event format
+    (viewable in chrome://tracing or Perfetto) with `write_chrome_trace()`.
+
+    Parameters
+    ----------
+    pid : int
+        Process identifier (e.g., MPI rank) associated with the events.
+    name : str
+        Process name to display with the events.
+
+    Attributes
+    ----------
+    events : list of tuple
+        Recorded events; each event is a tuple containing the event's name,
+        category, start and stop times (in seconds since the epoch), and
+        execution step.
+    """
+
+    def __init__(self, pid=0, name=None):
+        self.pid = pid
+        self.name = name
+        self.events = []
+
+    def add(self, name, cat, start, stop, step=None):
+        """
+        Record an event.
+
+        Parameters
+        ----------
+        name, cat : str
+            Event name and category.
+        start, stop : float
+            Event start and stop times (in seconds since the epoch, e.g., as
+            returned by `time.time()`).
+        step : int
+            Execution step during which the event occurred.
+        """
+
+        self.events.append((name, cat, start, stop, step))
+
+    def to_trace_events(self):
+        """
+        Convert the recorded events to Chrome trace events.
+
+        Returns
+        -------
+        events : list of dict
+            Complete ('X') events with times in microseconds, preceded by a
+            metadata event containing the process name if one was specified.
+        """
+
+        result = []
+        if self.name is not None:
+            result.append({'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+                           'tid': 0, 'args': {'name': str(self.name)}})
+        for name, cat, start, stop, step in self.events:
+            e = {'name': name, 'cat': cat, 'ph': 'X', 'pid': self.pid,
+                 'tid': 0, 'ts': start*1e6, 'dur': (stop-start)*1e6}
+            if step is not None:
+                e['args'] = {'step': step}
+            result.append(e)
+        return result
+
+def write_chrome_trace(tracers, file_name):
+    """
+    Merge the events recorded by several tracers into a Chrome trace file.
+
+    Parameters
+    ----------
+    tracers : sequence of Tracer
+        Tracers whose events should be merged.
+    file_name : str
+        Name of JSON file to write.
+    """
+
+    events = []
+    for tracer in tracers:
+        events.extend(tracer.to_trace_events())
+    with open(file_name, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
 
 class Timer(object):
     def __init__(self, name=None):
@@ -2,17 +2,26 @@
 
 import neurokernel.mpi_relaunch
 
+import collections
 import cPickle as pickle
+import json
 import os
+import subprocess
+import sys
 import tempfile
+import uuid
 
 from mpi4py import MPI
 import numpy as np
 
-from neurokernel.pattern import Pattern
+from neurokernel.pattern import Pattern, StructuredPattern
 from neurokernel.plsel import Selector, SelectorMethods
-from neurokernel.core import Module, Manager, CTRL_TAG, GPOT_TAG, SPIKE_TAG
+from neurokernel.core import Module, Manager, LocalManager, CTRL_TAG, \
+    GPOT_TAG, SPIKE_TAG, STEP_PHASES
+import neurokernel.core as core
 import neurokernel.mpi as mpi
+from neurokernel.mpi_proc import ProcessPool
+from neurokernel.tools.shm import SharedLink
 
 class MyModule1(Module):
     """
@@ -64,8 +73,7 @@ class MyModule2(Module):
                  routing_table, rank_to_id,
                  debug, time_sync)
         self.out_file_name = out_file_name
-            
-    out_buf = []
+        self.out_buf = []
 
     def run_step(self):
         super(MyModule2, self).run_step()
@@ -168,6 +176,12 @@ class test_core_gpu(TestCase):
 
         os.remove(out_file_name)
         self.assertSequenceEqual(list(output), [0, 0, 1, 1])
+        self.assertItemsEqual(self.man.spawn_nbytes.keys(), [0, 1])
+        self.assertTrue(all(n > 0 for n in self.man.spawn_nbytes.values()))
+        self.assertItemsEqual(self.man.startup_latency.keys(), [0, 1])
+        for path, load_time, total_time in self.man.startup_latency.values():
+            self.assertIn(path, ['ref', 'dill'])
+            self.assertTrue(0 <= load_time <= total_time)
 
     def test_transmit_spikes_one_to_many(self):
         m1_sel_in_gpot = Selector('')
@@ -234,6 +248,630 @@ class test_core_gpu(TestCase):
         os.remove(out_file_name)
         self.assertSequenceEqual(list(output), [1, 1, 1, 1])
 
+    def test_transmit_spikes_structured(self):
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels('', '', '', '/m1/out/spike[0:4]')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels('', '', '/m2/in/spike[0:4]', '')
+
+        m1_id = 'm1'
+        self.man.add(MyModule1, m1_id,
+                     m1_sel, m1_sel_in, m1_sel_out,
+                     m1_sel_gpot, m1_sel_spike,
+                     np.zeros(0, dtype=np.double),
+                     np.zeros(4, dtype=int),
+                     device=0, debug=debug, out_spike_data=[0, 1, 0, 0])
+
+        f, out_file_name = tempfile.mkstemp()
+        os.close(f)
+
+        m2_id = 'm2'
+        self.man.add(MyModule2, m2_id,
+                     m2_sel, m2_sel_in, m2_sel_out,
+                     m2_sel_gpot, m2_sel_spike,
+                     np.zeros(0, dtype=np.double),
+                     np.zeros(4, dtype=int),
+                     device=1, debug=debug, out_file_name=out_file_name)
+
+        # Connect a single output port of m1 to all of the input ports of m2:
+        pat12 = StructuredPattern.all_to_all(m1_sel, m2_sel,
+                                             from_sel='/m1/out/spike[1]',
+                                             to_sel='/m2/in/spike[0:4]',
+                                             spike_sel=m1_sel+m2_sel)
+        self.man.connect(m1_id, m2_id, pat12, 0, 1)
+
+        # Run emulation for 2 steps:
+        self.man.spawn()
+        self.man.start(2)
+        self.man.wait()
+
+        # Get output of m2:
+        with open(out_file_name, 'r') as f:
+            output = pickle.load(f)
+
+        os.remove(out_file_name)
+        self.assertSequenceEqual(list(output), [1, 1, 1, 1])
+
+    def test_pool(self):
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels('', '', '', '/m1/out/spike[0:4]')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels('', '', '/m2/in/spike[0:4]', '')
+
+        # Run two emulations on the same processes; the pool contains more
+        # processes than modules:
+        pool = ProcessPool(3)
+        for out_spike_data in [[0, 0, 1, 1], [1, 0, 1, 0]]:
+            man = Manager(pool=pool)
+            man.add(MyModule1, 'm1',
+                    m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike,
+                    np.zeros(0, dtype=np.double), np.zeros(4, dtype=int),
+                    debug=debug, out_spike_data=out_spike_data)
+
+            f, out_file_name = tempfile.mkstemp()
+            os.close(f)
+            man.add(MyModule2, 'm2',
+                    m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike,
+                    np.zeros(0, dtype=np.double), np.zeros(4, dtype=int),
+                    debug=debug, out_file_name=out_file_name)
+
+            pat12 = Pattern(m1_sel, m2_sel)
+            pat12.interface[m1_sel_out] = [0, 'in', 'spike']
+            pat12.interface[m2_sel_in] = [1, 'out', 'spike']
+            for i in xrange(4):
+                pat12['/m1/out/spike[%i]' % i, '/m2/in/spike[%i]' % i] = 1
+            man.connect('m1', 'm2', pat12, 0, 1)
+
+            man.spawn()
+
+            # The modules cannot finish before they are started:
+            self.assertFalse(man.wait(0.1))
+            man.start(2, ctrl_interval=3)
+            self.assertTrue(man.wait())
+
+            # Control messages sent after the modules finished must not be
+            # received by the modules of the next run:
+            man.quit()
+
+            with open(out_file_name, 'r') as f:
+                output = pickle.load(f)
+            os.remove(out_file_name)
+            self.assertSequenceEqual(list(output), out_spike_data)
+        self.assertEqual(pool.runs, 2)
+        pool.close()
+        self.assertEqual(pool.intercomm, MPI.COMM_NULL)
+
+    def test_time_sync(self):
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels('', '', '', '/m1/out/spike[0:4]')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels('', '', '/m2/in/spike[0:4]', '')
+        self.man.add(MyModule1, 'm1',
+                     m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike,
+                     np.zeros(0, dtype=np.double), np.zeros(4, dtype=int),
+                     time_sync=True, out_spike_data=[0, 0, 1, 1])
+        self.man.add(MyModule2, 'm2',
+                     m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike,
+                     np.zeros(0, dtype=np.double), np.zeros(4, dtype=int),
+                     time_sync=True)
+        pat12 = Pattern(m1_sel, m2_sel)
+        pat12.interface[m1_sel_out] = [0, 'in', 'spike']
+        pat12.interface[m2_sel_in] = [1, 'out', 'spike']
+        for i in xrange(4):
+            pat12['/m1/out/spike[%i]' % i, '/m2/in/spike[%i]' % i] = 1
+        self.man.connect('m1', 'm2', pat12, 0, 1)
+
+        # Flush the timing data accumulated by the modules several times
+        # during the emulation:
+        for rank in [0, 1]:
+            self.man._attrs[rank] = {'sync_flush_steps': 3}
+        self.man.record_step_stats = True
+        self.man.record_link_waits = True
+        self.man.record_comm = True
+        f, trace_file_name = tempfile.mkstemp()
+        os.close(f)
+        self.man.trace_file = trace_file_name
+        self.man.spawn()
+        self.man.start(8)
+        self.man.wait()
+
+        # The first step is excluded from the statistics:
+        self.assertEqual(self.man.counter, 7)
+        self.assertEqual(self.man.total_sync_nbytes,
+                         7*4*np.dtype(int).itemsize)
+        self.assertTrue(self.man.average_step_sync_time > 0)
+        self.assertAlmostEqual(self.man.total_sync_time,
+                               7*self.man.average_step_sync_time)
+        self.assertItemsEqual(self.man.step_sync_time_percentiles.keys(),
+                              [50, 90, 99])
+        self.assertTrue(self.man.start_time <= self.man.stop_time)
+
+        self.assertItemsEqual(self.man.step_stats.keys(), ['m1', 'm2'])
+        for step_stats in self.man.step_stats.values():
+            self.assertItemsEqual(step_stats.keys(), STEP_PHASES)
+            for h in step_stats.values():
+                self.assertEqual(h.count, 8)
+
+        with open(trace_file_name, 'r') as f:
+            trace = json.load(f)
+        os.remove(trace_file_name)
+        names = collections.Counter((e['pid'], e['name']) \
+                                    for e in trace['traceEvents'])
+        for pid in [0, 1]:
+            self.assertEqual(names[pid, 'process_name'], 1)
+            self.assertEqual(names[pid, 'step'], 8)
+            self.assertEqual(names[pid, 'run_step'], 8)
+        self.assertEqual(names[0, 'send m2'], 8)
+        self.assertEqual(names[1, 'recv m1'], 8)
+        self.assertEqual(names[1, 'unpack m1'], 8)
+        self.assertTrue(all(e['dur'] >= 0 for e in trace['traceEvents'] \
+                            if e['ph'] == 'X'))
+
+        self.assertEqual(self.man.link_wait_times['m1'], {})
+        self.assertItemsEqual(self.man.link_wait_times['m2'].keys(), ['m1'])
+        m = self.man.link_wait_matrix
+        self.assertEqual(m.loc['m1', 'm1'], 0.0)
+        self.assertEqual(m.loc['m2', 'm1'], self.man.link_wait_times['m2']['m1'])
+        report = self.man.straggler_report()
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0][0], 'm1')
+        self.assertEqual(report[0][2], 'm2')
+
+        nbytes = 4*np.dtype(int).itemsize
+        self.assertEqual(self.man.comm_bytes, {'m1': {'m2': 8*nbytes}, 'm2': {}})
+        self.assertEqual(self.man.comm_msgs, {'m1': {'m2': 8}, 'm2': {}})
+        i, j = self.man.rank_to_id.inv['m1'], self.man.rank_to_id.inv['m2']
+        m = np.zeros((2, 2))
+        m[i, j] = nbytes
+        self.assertTrue(np.array_equal(self.man.comm_matrix(per_step=True), m))
+        self.assertEqual(self.man.comm_matrix('msgs')[i, j], 8)
+        f, csv_file_name = tempfile.mkstemp()
+        os.close(f)
+        self.man.write_comm_matrix(csv_file_name, 'msgs')
+        with open(csv_file_name, 'r') as f:
+            lines = f.read().splitlines()
+        os.remove(csv_file_name)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1+i].split(',')[1+j], '8.0')
+
+    def test_place(self):
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels('', '', '', '/m1/out/spike[0:4]')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels('', '', '/m2/in/spike[0:4]', '')
+        m3_sel, m3_sel_in, m3_sel_out, m3_sel_gpot, m3_sel_spike = \
+            make_sels('', '', '', '/m3/out/spike[0:2]')
+        self.man.add(MyModule1, 'm1',
+                     m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike,
+                     np.zeros(0, dtype=np.double), np.zeros(4, dtype=int),
+                     out_spike_data=[0, 1, 1, 0])
+        self.man.add(MyModule1, 'm3',
+                     m3_sel, m3_sel_in, m3_sel_out, m3_sel_gpot, m3_sel_spike,
+                     np.zeros(0, dtype=np.double), np.zeros(2, dtype=int))
+        f, out_file_name = tempfile.mkstemp()
+        os.close(f)
+        self.man.add(MyModule2, 'm2',
+                     m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike,
+                     np.zeros(0, dtype=np.double), np.zeros(4, dtype=int),
+                     out_file_name=out_file_name)
+        pat12 = Pattern(m1_sel, m2_sel)
+        pat12.interface[m1_sel_out] = [0, 'in', 'spike']
+        pat12.interface[m2_sel_in] = [1, 'out', 'spike']
+        for i in xrange(4):
+            pat12['/m1/out/spike[%i]' % i, '/m2/in/spike[%i]' % i] = 1
+        self.man.connect('m1', 'm2', pat12, 0, 1)
+
+        m = self.man.connectivity_matrix()
+        self.assertEqual(m[0, 2], 4)
+        self.assertEqual(m.sum(), 4)
+
+        # The connected modules must be placed on the same node and assigned
+        # consecutive ranks (importing neurokernel defers the initialization
+        # of MPI, which must be initialized before it is queried):
+        core.init_mpi()
+        host = MPI.Get_processor_name()
+        placement = self.man.place(2, 2, hosts=[host, host])
+        self.assertItemsEqual(map(sorted, placement), [['m1', 'm2'], ['m3']])
+        self.assertEqual(abs(self.man.rank_to_id.inv['m1']-
+                             self.man.rank_to_id.inv['m2']), 1)
+        self.assertEqual(sorted(n for h, n in self.man.hosts), [1, 2])
+
+        self.man.spawn()
+        self.man.start(2)
+        self.man.wait()
+        with open(out_file_name, 'r') as f:
+            output = pickle.load(f)
+        os.remove(out_file_name)
+        self.assertSequenceEqual(list(output), [0, 1, 1, 0])
+
+    def test_group(self):
+        a1_sel, a1_sel_in, a1_sel_out, a1_sel_gpot, a1_sel_spike = \
+            make_sels('', '', '', '/a1/out/spike[0:4]')
+        a2_sel, a2_sel_in, a2_sel_out, a2_sel_gpot, a2_sel_spike = \
+            make_sels('', '', '', '/a2/out/spike[0:2]')
+        b1_sel, b1_sel_in, b1_sel_out, b1_sel_gpot, b1_sel_spike = \
+            make_sels('', '', '/b1/in/spike[0:4]', '')
+        b2_sel, b2_sel_in, b2_sel_out, b2_sel_gpot, b2_sel_spike = \
+            make_sels('', '', '/b2/in/spike[0:4]', '')
+
+        # a1, a2, and b1 are run by the same process; b2 receives data from
+        # both a1 and a2 over separate connections from that process:
+        self.man.add(MyModule1, 'a1',
+                     a1_sel, a1_sel_in, a1_sel_out, a1_sel_gpot, a1_sel_spike,
+                     np.zeros(0, dtype=np.double), np.zeros(4, dtype=int),
+                     debug=debug, out_spike_data=[1, 0, 1, 0], group='g')
+        self.man.add(MyModule1, 'a2',
+                     a2_sel, a2_sel_in, a2_sel_out, a2_sel_gpot, a2_sel_spike,
+                     np.zeros(0, dtype=np.double), np.zeros(2, dtype=int),
+                     debug=debug, out_spike_data=[1, 1], group='g')
+        out_file_names = []
+        for i, (sel, sel_in, sel_out, sel_gpot, sel_spike) in \
+                enumerate([(b1_sel, b1_sel_in, b1_sel_out, b1_sel_gpot, b1_sel_spike),
+                           (b2_sel, b2_sel_in, b2_sel_out, b2_sel_gpot, b2_sel_spike)]):
+            f, out_file_name = tempfile.mkstemp()
+            os.close(f)
+            out_file_names.append(out_file_name)
+            self.man.add(MyModule2, 'b%i' % (i+1),
+                         sel, sel_in, sel_out, sel_gpot, sel_spike,
+                         np.zeros(0, dtype=np.double), np.zeros(4, dtype=int),
+                         debug=debug, out_file_name=out_file_name,
+                         group='g' if i == 0 else None)
+        self.assertEqual(len(self.man), 2)
+        self.assertEqual(self.man.groups, {'g': ['a1', 'a2', 'b1']})
+        self.assertEqual(self.man.id_to_rank,
+                         {'a1': 0, 'a2': 0, 'b1': 0, 'b2': 1})
+        self.assertRaises(ValueError, self.man.add, MyModule1, 'a1',
+                          a1_sel, a1_sel_in, a1_sel_out, a1_sel_gpot,
+                          a1_sel_spike, np.zeros(0, dtype=np.double),
+                          np.zeros(4, dtype=int))
+
+        def connect(src_id, dest_id, src_sel, dest_sel, src_sel_out,
+                    dest_sel_in, conns):
+            pat = Pattern(src_sel, dest_sel)
+            pat.interface[src_sel_out] = [0, 'in', 'spike']
+            pat.interface[dest_sel_in] = [1, 'out', 'spike']
+            for i, j in conns:
+                pat['/%s/out/spike[%i]' % (src_id, i),
+                    '/%s/in/spike[%i]' % (dest_id, j)] = 1
+            self.man.connect(src_id, dest_id, pat, 0, 1)
+        connect('a1', 'b1', a1_sel, b1_sel, a1_sel_out, b1_sel_in,
+                [(0, 0), (1, 1), (2, 2), (3, 3)])
+        connect('a1', 'b2', a1_sel, b2_sel, a1_sel_out, b2_sel_in,
+                [(0, 0), (1, 1)])
+        connect('a2', 'b2', a2_sel, b2_sel, a2_sel_out, b2_sel_in,
+                [(0, 2), (1, 3)])
+
+        # Transmit the data between the processes via MPI:
+        self.man.use_shm = False
+
+        self.man.spawn()
+        self.man.start(2)
+        self.man.wait()
+        outputs = []
+        for out_file_name in out_file_names:
+            with open(out_file_name, 'r') as f:
+                outputs.append(list(pickle.load(f)))
+            os.remove(out_file_name)
+        self.assertSequenceEqual(outputs[0], [1, 0, 1, 0])
+        self.assertSequenceEqual(outputs[1], [1, 0, 1, 1])
+
+    def _transmit(self, out_spike_data=[0, 1, 1, 0]):
+        """
+        Transmit data between two modules and return the received spikes.
+        """
+
+        batch_shape = np.shape(out_spike_data)[1:]
+
+        a_sel, a_sel_in, a_sel_out, a_sel_gpot, a_sel_spike = \
+            make_sels('', '/a/out/gpot[0:2]', '', '/a/out/spike[0:4]')
+        b_sel, b_sel_in, b_sel_out, b_sel_gpot, b_sel_spike = \
+            make_sels('/b/in/gpot[0:2]', '', '/b/in/spike[0:4]', '')
+        self.man.add(MyModule1, 'a',
+                     a_sel, a_sel_in, a_sel_out, a_sel_gpot, a_sel_spike,
+                     np.zeros((2,)+batch_shape, dtype=np.double),
+                     np.zeros((4,)+batch_shape, dtype=int),
+                     debug=debug, out_spike_data=out_spike_data)
+        f, out_file_name = tempfile.mkstemp()
+        os.close(f)
+        self.man.add(MyModule2, 'b',
+                     b_sel, b_sel_in, b_sel_out, b_sel_gpot, b_sel_spike,
+                     np.zeros((2,)+batch_shape, dtype=np.double),
+                     np.zeros((4,)+batch_shape, dtype=int),
+                     debug=debug, out_file_name=out_file_name)
+        pat = Pattern(a_sel, b_sel)
+        pat.interface['/a/out/gpot[0:2]'] = [0, 'in', 'gpot']
+        pat.interface['/a/out/spike[0:4]'] = [0, 'in', 'spike']
+        pat.interface['/b/in/gpot[0:2]'] = [1, 'out', 'gpot']
+        pat.interface['/b/in/spike[0:4]'] = [1, 'out', 'spike']
+        for i in xrange(2):
+            pat['/a/out/gpot[%i]' % i, '/b/in/gpot[%i]' % i] = 1
+        for i in xrange(4):
+            pat['/a/out/spike[%i]' % i, '/b/in/spike[%i]' % (3-i)] = 1
+        self.man.connect('a', 'b', pat, 0, 1)
+
+        self.man.spawn()
+        self.man.start(2)
+        self.assertTrue(self.man.wait(30))
+        with open(out_file_name, 'r') as f:
+            output = pickle.load(f)
+        os.remove(out_file_name)
+        return np.asarray(output).tolist()
+
+    def test_multiprocessing(self):
+        self.man = Manager(backend='multiprocessing')
+        self.assertSequenceEqual(self._transmit(), [0, 1, 1, 0][::-1])
+        self.assertItemsEqual(self.man.startup_latency.keys(), [0, 1])
+        for path, load_time, total_time in self.man.startup_latency.values():
+            self.assertEqual(path, 'fork')
+        self.assertRaises(ValueError, Manager, backend='foo')
+        self.assertRaises(ValueError, Manager, pool=ProcessPool(1),
+                          backend='multiprocessing')
+
+    def test_multiprocessing_without_mpi(self):
+        script = """
+import sys
+
+import numpy as np
+
+from neurokernel.core import Manager, Module
+from neurokernel.pattern import Pattern
+from mpi4py import MPI
+
+class InitModule(Module):
+    def post_run(self):
+        super(InitModule, self).post_run()
+        with open('%s.%s' % (sys.argv[1], self.id), 'w') as f:
+            f.write(str(MPI.Is_initialized()))
+
+man = Manager(backend='multiprocessing')
+man.add(InitModule, 'a', '/a/out/spike[0:2]', '', '/a/out/spike[0:2]', '',
+        '/a/out/spike[0:2]', np.zeros(0, np.double), np.zeros(2, int))
+man.add(InitModule, 'b', '/b/in/spike[0:2]', '/b/in/spike[0:2]', '', '',
+        '/b/in/spike[0:2]', np.zeros(0, np.double), np.zeros(2, int))
+pat = Pattern('/a/out/spike[0:2]', '/b/in/spike[0:2]')
+pat.interface['/a/out/spike[0:2]'] = [0, 'in', 'spike']
+pat.interface['/b/in/spike[0:2]'] = [1, 'out', 'spike']
+for i in xrange(2):
+    pat['/a/out/spike[%i]' % i, '/b/in/spike[%i]' % i] = 1
+man.connect('a', 'b', pat, 0, 1)
+man.spawn()
+man.start(2)
+assert man.wait(30)
+with open(sys.argv[1], 'w') as f:
+    f.write(str(MPI.Is_initialized()))
+"""
+        f, name = tempfile.mkstemp()
+        os.close(f)
+        try:
+
+            # Neither the manager nor the forked processes may initialize MPI
+            # (the script is run in a separate process because the other tests
+            # initialize MPI):
+            subprocess.check_call([sys.executable, '-c', script, name])
+            for ext in ['', '.a', '.b']:
+                with open(name+ext, 'r') as f:
+                    self.assertEqual(f.read(), 'False')
+        finally:
+            for ext in ['', '.a', '.b']:
+                if os.path.exists(name+ext):
+                    os.remove(name+ext)
+
+    def test_local_manager(self):
+        self.man = LocalManager()
+        self.assertSequenceEqual(self._transmit(), [0, 1, 1, 0][::-1])
+        self.assertSequenceEqual(self.man.modules.keys(), ['a', 'b'])
+        self.assertEqual(self.man.modules['b'].steps, 2)
+        self.assertEqual(len(self.man._local_links), 2)
+
+    def test_batch(self):
+        out_spike_data = [[0, 1, 1], [1, 1, 0], [0, 0, 1], [1, 0, 0]]
+        for use_shm in [False, True]:
+            self.man = Manager()
+            self.man.use_shm = use_shm
+            self.assertSequenceEqual(self._transmit(out_spike_data),
+                                     out_spike_data[::-1])
+        self.man = LocalManager()
+        self.assertSequenceEqual(self._transmit(out_spike_data),
+                                 out_spike_data[::-1])
+
+        # Connected modules must have the same number of replicas:
+        self.man = Manager()
+        sel, sel_in, sel_out, sel_gpot, sel_spike = \
+            make_sels('', '', '', '/a/out/spike[0:2]')
+        self.man.add(MyModule1, 'a', sel, sel_in, sel_out, sel_gpot, sel_spike,
+                     np.zeros(0, dtype=np.double), np.zeros((2, 3), dtype=int))
+        sel, sel_in, sel_out, sel_gpot, sel_spike = \
+            make_sels('', '', '/b/in/spike[0:2]', '')
+        self.man.add(MyModule2, 'b', sel, sel_in, sel_out, sel_gpot, sel_spike,
+                     np.zeros(0, dtype=np.double), np.zeros((2, 2), dtype=int))
+        pat = Pattern('/a/out/spike[0:2]', '/b/in/spike[0:2]')
+        self.assertRaises(ValueError, self.man.connect, 'a', 'b', pat)
+        self.assertRaises(ValueError, MyModule2, sel, sel_in, sel_out,
+                          sel_gpot, sel_spike, np.zeros((0, 2), dtype=np.double),
+                          np.zeros((2, 3, 1), dtype=int))
+
+    def test_group_time_sync(self):
+        sel, sel_in, sel_out, sel_gpot, sel_spike = \
+            make_sels('', '', '', '/a/out/spike[0:2]')
+        self.man.add(MyModule1, 'a', sel, sel_in, sel_out, sel_gpot, sel_spike,
+                     np.zeros(0, dtype=np.double), np.zeros(2, dtype=int),
+                     time_sync=True, group='g')
+
+        # Synchronization times are not recorded by module groups:
+        self.assertRaises(ValueError, self.man.spawn)
+
+    def test_shm_unsupported(self):
+        supported = core.shm_supported
+        core.shm_supported = lambda: False
+        try:
+            self.man = Manager()
+            self.assertFalse(self.man.use_shm)
+            sel, sel_in, sel_out, sel_gpot, sel_spike = \
+                make_sels('', '', '', '/a/out/spike[0:2]')
+            self.man.add(MyModule1, 'a', sel, sel_in, sel_out, sel_gpot,
+                         sel_spike, np.zeros(0, dtype=np.double),
+                         np.zeros(2, dtype=int))
+
+            # Shared memory cannot be requested on processors that don't
+            # guarantee the ordering of the writes to the segments:
+            self.man.use_shm = True
+            self.assertRaises(ValueError, self.man.spawn)
+        finally:
+            core.shm_supported = supported
+
+    def test_shm_timeout(self):
+        sel, sel_in, sel_out, sel_gpot, sel_spike = \
+            make_sels('', '', '/b/in/spike[0:2]', '')
+        m = MyModule2(sel, sel_in, sel_out, sel_gpot, sel_spike,
+                      np.zeros(0, dtype=np.double), np.zeros(2, dtype=int))
+        m._in_ids = []
+        m._shm_timeout = 0.01
+        name = 'neurokernel-test-%s' % uuid.uuid4().hex
+        link = SharedLink(name, [np.int_], [2], create=True)
+        try:
+
+            # A module must not wait indefinitely for data that is never
+            # written to a shared memory link:
+            m._shm_in = [('a', ['spike'], SharedLink(name, [np.int_], [2]))]
+            self.assertRaises(RuntimeError, m._unpack_data)
+        finally:
+            link.close()
+
+    def test_compile_link_plans(self):
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels('', '/m1/out/gpot[0:3]', '/m1/in/spike[0:2]', '')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels('/m2/in/gpot[0:4]', '', '', '/m2/out/spike[0:2]')
+        m3_sel, m3_sel_in, m3_sel_out, m3_sel_gpot, m3_sel_spike = \
+            make_sels('', '', '/m3/in/spike[0:2]', '')
+        args = {'m1': (m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike,
+                       np.zeros(3, dtype=np.double), np.zeros(2, dtype=int)),
+                'm2': (m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike,
+                       np.zeros(4, dtype=np.double), np.zeros(2, dtype=int)),
+                'm3': (m3_sel, m3_sel_in, m3_sel_out, m3_sel_gpot, m3_sel_spike,
+                       np.zeros(0, dtype=np.double), np.zeros(2, dtype=int))}
+        for id in ['m1', 'm2', 'm3']:
+            self.man.add(Module, id, *args[id])
+
+        # Connections in both directions with fan-out:
+        pat12 = Pattern(m1_sel, m2_sel)
+        pat12.interface['/m1/out/gpot[0:3]'] = [0, 'in', 'gpot']
+        pat12.interface['/m1/in/spike[0:2]'] = [0, 'out', 'spike']
+        pat12.interface['/m2/in/gpot[0:4]'] = [1, 'out', 'gpot']
+        pat12.interface['/m2/out/spike[0:2]'] = [1, 'in', 'spike']
+        pat12['/m1/out/gpot[0]', '/m2/in/gpot[1]'] = 1
+        pat12['/m1/out/gpot[0]', '/m2/in/gpot[0]'] = 1
+        pat12['/m1/out/gpot[2]', '/m2/in/gpot[3]'] = 1
+        pat12['/m2/out/spike[1]', '/m1/in/spike[0]'] = 1
+        pat12['/m2/out/spike[0]', '/m1/in/spike[1]'] = 1
+        self.man.connect('m1', 'm2', pat12, 0, 1)
+        pat23 = StructuredPattern.one_to_one(m2_sel, m3_sel,
+                                             from_sel='/m2/out/spike[0:2]',
+                                             to_sel='/m3/in/spike[0:2]',
+                                             spike_sel=m2_sel+m3_sel)
+        self.man.connect('m2', 'm3', pat23, 0, 1)
+
+        plans = self.man.compile_link_plans(2)
+        self.assertItemsEqual(plans.keys(),
+                              [('m1', 'm2'), ('m2', 'm1'), ('m2', 'm3')])
+
+        # Small patterns are compiled in the current process by default, as
+        # are all patterns once MPI has been initialized; the plans must not
+        # depend on where they are compiled:
+        executor = core.ProcessPoolExecutor
+        core.ProcessPoolExecutor = None
+        try:
+            all_local_plans = [self.man.compile_link_plans()]
+            core.init_mpi()
+            all_local_plans.append(self.man.compile_link_plans(2))
+        finally:
+            core.ProcessPoolExecutor = executor
+        for local_plans in all_local_plans:
+            self.assertItemsEqual(local_plans.keys(), plans.keys())
+            for k in plans:
+                for part in ['src', 'dest', 'buf']:
+                    for t in ['gpot', 'spike']:
+                        self.assertSequenceEqual(list(local_plans[k][part][t]),
+                                                 list(plans[k][part][t]))
+
+        # Each module only receives its own connections without patterns:
+        r = self.man._routing_table_for(self.man.rank_to_id.inv['m3'],
+                                        self.man.routing_table)
+        self.assertSequenceEqual(r.connections, [('m2', 'm3')])
+        self.assertNotIn('pattern', r['m2', 'm3'])
+
+        # The compiled plans must yield the same port indices as those
+        # computed by the modules from the patterns:
+        for id in ['m1', 'm2', 'm3']:
+            m = Module(*args[id], id=id, routing_table=self.man.routing_table,
+                       rank_to_id=self.man.rank_to_id)
+            m._init_port_dicts()
+            expected = [m._out_port_dict_ids, m._in_port_dict_ids,
+                        m._in_port_dict_buf_ids, m._in_buf_len]
+            m._link_plans = {k: v for k, v in plans.iteritems() if id in k}
+            for k in m._link_plans:
+                self.assertIsNotNone(m._get_link_plan(*k))
+            m._init_port_dicts()
+            result = [m._out_port_dict_ids, m._in_port_dict_ids,
+                      m._in_port_dict_buf_ids, m._in_buf_len]
+            for d_exp, d_res in zip(expected, result):
+                for t in ['gpot', 'spike']:
+                    self.assertItemsEqual(d_exp[t].keys(), d_res[t].keys())
+                    for k in d_exp[t]:
+                        self.assertSequenceEqual(list(np.atleast_1d(d_exp[t][k])),
+                                                 list(np.atleast_1d(d_res[t][k])))
+
+        # Plans compiled for ports in a different order than that of a
+        # module's port mappers must not be used:
+        args_m2 = list(args['m2'])
+        args_m2[3] = ','.join(['/m2/in/gpot[%i]' % i for i in [3, 2, 1, 0]])
+        m = Module(*args_m2, id='m2', routing_table=self.man.routing_table,
+                   rank_to_id=self.man.rank_to_id)
+        m._link_plans = {k: v for k, v in plans.iteritems() if 'm2' in k}
+        self.assertIsNone(m._get_link_plan('m1', 'm2'))
+        self.assertIsNotNone(m._get_link_plan('m2', 'm3'))
+        m.routing_table = r
+        m._link_plans = {('m2', 'm3'): plans['m2', 'm3']}
+        self.assertIsNotNone(m._get_link_plan('m2', 'm3'))
+        m.routing_table = self.man._routing_table_for(
+            self.man.rank_to_id.inv['m2'], self.man.routing_table)
+        m._link_plans = {('m1', 'm2'): plans['m1', 'm2']}
+        self.assertRaises(ValueError, m._get_link_plan, 'm1', 'm2')
+
+    def test_port_classes(self):
+        sel, sel_in, sel_out, sel_gpot, sel_spike = \
+            make_sels('/m/in/gpot[0:2]', '/m/out/gpot[0:2]',
+                      '/m/in/spike[0:2]', '/m/out/spike[0:3]')
+        m = Module(sel, sel_in, sel_out, sel_gpot, sel_spike,
+                   np.arange(4, dtype=np.double), np.arange(5, dtype=int))
+
+        self.assertSequenceEqual(m.in_ports, m.interface.in_ports().to_tuples())
+        self.assertSequenceEqual(m.out_ports, m.interface.out_ports().to_tuples())
+        self.assertSequenceEqual(m.gpot_ports, m.interface.gpot_ports().to_tuples())
+        self.assertSequenceEqual(m.spike_ports, m.interface.spike_ports().to_tuples())
+        self.assertSequenceEqual(m.in_gpot_ports,
+                                 [('m', 'in', 'gpot', 0), ('m', 'in', 'gpot', 1)])
+        self.assertSequenceEqual(m.out_spike_ports,
+                                 [('m', 'out', 'spike', 0), ('m', 'out', 'spike', 1),
+                                  ('m', 'out', 'spike', 2)])
+
+        # The port positions must index the data of the port mappers:
+        self.assertSequenceEqual(list(m.in_gpot_inds), [0, 1])
+        self.assertSequenceEqual(list(m.out_gpot_inds), [2, 3])
+        self.assertSequenceEqual(list(m.in_spike_inds), [0, 1])
+        self.assertSequenceEqual(list(m.out_spike_inds), [2, 3, 4])
+        self.assertSequenceEqual(list(m.pm['spike'][m.out_spike_ports]), [2, 3, 4])
+        self.assertSequenceEqual(list(m.interface.data['io']),
+                                 ['in']*2+['out']*2+['in']*2+['out']*3)
+
+        # Invalid selectors:
+        self.assertRaises(ValueError, Module, sel, sel_in+sel_out, sel_out,
+                          sel_gpot, sel_spike, np.zeros(4), np.zeros(5))
+        self.assertRaises(ValueError, Module, sel, sel_in, '/m/foo[0]',
+                          sel_gpot, sel_spike, np.zeros(4), np.zeros(5))
+        self.assertRaises(ValueError, Module, sel, sel_in, sel_out,
+                          sel_gpot, sel_spike, np.zeros(3), np.zeros(5))
+
 if __name__ == '__main__':
     logger = mpi.setup_logger(screen=False,
                               mpi_comm=MPI.COMM_WORLD, multiline=True)
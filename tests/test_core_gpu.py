@@ -237,6 +237,44 @@ class test_core_gpu(TestCase):
         os.remove(out_file_name)
         self.assertSequenceEqual(list(output), [1, 1, 1, 1])
 
+    def test_link_plan_inds_on_gpu(self):
+        import pycuda.autoinit
+
+        m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike = \
+            make_sels('', '/m1/out/gpot[0:2]', '', '')
+        m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike = \
+            make_sels('/m2/in/gpot[0:2]', '', '', '')
+        args = {'m1': (m1_sel, m1_sel_in, m1_sel_out, m1_sel_gpot, m1_sel_spike,
+                       np.zeros(2, dtype=np.double), np.zeros(0, dtype=int)),
+                'm2': (m2_sel, m2_sel_in, m2_sel_out, m2_sel_gpot, m2_sel_spike,
+                       np.zeros(2, dtype=np.double), np.zeros(0, dtype=int))}
+        for id in ['m1', 'm2']:
+            self.man.add(Module, id, *args[id])
+        pat = Pattern(m1_sel, m2_sel)
+        pat.interface['/m1/out/gpot[0:2]'] = [0, 'in', 'gpot']
+        pat.interface['/m2/in/gpot[0:2]'] = [1, 'out', 'gpot']
+        pat['/m1/out/gpot[0]', '/m2/in/gpot[1]'] = 1
+        pat['/m1/out/gpot[1]', '/m2/in/gpot[0]'] = 1
+        self.man.connect('m1', 'm2', pat, 0, 1)
+        plans = self.man.compile_link_plans()
+
+        # The port indices obtained from the compiled plans must reside on the
+        # GPU so that they are not transferred during every step:
+        m1 = Module(*args['m1'], id='m1', routing_table=self.man.routing_table,
+                    rank_to_id=self.man.rank_to_id)
+        m1._link_plans = plans
+        m1._init_port_dicts()
+        self.assertIsInstance(m1._out_port_dict_ids['gpot']['m2'],
+                              gpuarray.GPUArray)
+        m2 = Module(*args['m2'], id='m2', routing_table=self.man.routing_table,
+                    rank_to_id=self.man.rank_to_id)
+        m2._link_plans = plans
+        m2._init_port_dicts()
+        self.assertIsInstance(m2._in_port_dict_ids['gpot']['m1'],
+                              gpuarray.GPUArray)
+        self.assertSequenceEqual(list(m2._in_port_dict_ids['gpot']['m1'].get()),
+                                 list(plans[('m1', 'm2')]['dest']['gpot']))
+
 if __name__ == '__main__':
     logger = mpi.setup_logger(screen=False,
                               mpi_comm=MPI.COMM_WORLD, multiline=True)
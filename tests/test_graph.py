@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import itertools
+from unittest import main, TestCase
+
+import numpy as np
+
+import neurokernel.tools.graph as graph
+
+def cut_weight(mat, parts):
+    w = mat+mat.T
+    return w[parts[:, np.newaxis] != parts[np.newaxis, :]].sum()/2
+
+def get_index_order(x):
+    """
+    Reference implementation of greedy_order().
+    """
+
+    N = x.shape[0]
+    pairs = [(i, j) for i, j in itertools.product(xrange(N), xrange(N)) \
+             if i > j]
+    i, j = pairs[np.argmax([x[i, j]+x[j, i] for i, j in pairs])]
+    added = [i, j]
+    remaining = [k for k in xrange(N) if k not in added]
+    while remaining:
+        sums = [sum([x[k, j]+x[j, k] for j in added]) for k in remaining]
+        added.append(remaining.pop(np.argmax(sums)))
+    return np.asarray(added)
+
+class test_greedy_order(TestCase):
+    def test_greedy_order(self):
+        np.random.seed(0)
+        for N in [2, 3, 10, 25]:
+            x = np.random.randint(0, 20, (N, N))
+            np.fill_diagonal(x, 0)
+            self.assertSequenceEqual(list(graph.greedy_order(x)),
+                                     list(get_index_order(x)))
+
+        # Ties are broken in favor of lower indices:
+        x = np.ones((5, 5), int)
+        self.assertSequenceEqual(list(graph.greedy_order(x)),
+                                 list(get_index_order(x)))
+        self.assertSequenceEqual(list(graph.greedy_order(np.zeros((1, 1)))),
+                                 [0])
+        self.assertRaises(ValueError, graph.greedy_order, np.zeros((2, 3)))
+
+class test_partition(TestCase):
+    def setUp(self):
+        np.random.seed(0)
+
+        # Two densely connected clusters with a single weak connection
+        # between them, in random order:
+        mat = np.zeros((8, 8))
+        mat[:4, :4] = 5
+        mat[4:, 4:] = 5
+        mat[0, 5] = 1
+        self.perm = np.random.permutation(8)
+        self.mat = mat[np.ix_(self.perm, self.perm)]
+
+    def test_partition_clusters(self):
+        parts = graph.partition(self.mat, 2)
+        self.assertEqual(cut_weight(self.mat, parts), 1)
+        self.assertSequenceEqual(sorted(np.bincount(parts)), [4, 4])
+
+    def test_partition_max_part_size(self):
+        mat = np.random.rand(30, 30)
+        parts = graph.partition(mat, 4, 8)
+        self.assertTrue(np.bincount(parts).max() <= 8)
+        self.assertEqual(len(parts), 30)
+        self.assertRaises(ValueError, graph.partition, mat, 3, 8)
+        self.assertRaises(ValueError, graph.partition, np.zeros((2, 3)), 2)
+
+    def test_partition_no_pymetis(self):
+        pymetis = graph.pymetis
+        graph.pymetis = None
+        try:
+            parts = graph.partition(self.mat, 2)
+        finally:
+            graph.pymetis = pymetis
+        self.assertEqual(cut_weight(self.mat, parts), 1)
+
+if __name__ == '__main__':
+    main()
@@ -10,8 +10,9 @@ import sys
 from unittest import main, TestCase
 
 from mpi4py import MPI
+import numpy as np
 
-from neurokernel.mpi_proc import Process, ProcessManager
+from neurokernel.mpi_proc import Process, ProcessManager, ProcessPool
 
 import logging
 
@@ -23,6 +24,21 @@ class MyProc(Process):
     def run(self):
         self.send_parent(self.response)
 
+class MyArrayProc(Process):
+    def __init__(self, x, y, routing_table=None):
+        super(MyArrayProc, self).__init__()
+        self.response = (x, y)
+
+    def run(self):
+        self.send_parent(self.response)
+
+class MyPidProc(Process):
+    def __init__(self, routing_table=None):
+        super(MyPidProc, self).__init__()
+
+    def run(self):
+        self.send_parent((self.rank, os.getpid()))
+
 class test_mpi_proc(TestCase):
     def test_process(self):
         man = ProcessManager()
@@ -30,6 +46,37 @@ class test_mpi_proc(TestCase):
         man.spawn()
         results=man.recv()
         self.assertEqual(results,'a=x b=y c=1')
-    
+
+    def test_process_array_args(self):
+        man = ProcessManager()
+        x0 = np.arange(6, dtype=np.float32).reshape((2, 3))
+        x1 = np.array([(1, 2.0)], dtype=[('a', np.int32), ('b', np.double)])
+        man.add(MyArrayProc, x0, [1, 2])
+        man.add(MyArrayProc, x1[::-1], 'y')
+        man.spawn()
+        results = sorted([man.recv() for i in xrange(2)],
+                         key=lambda r: r[1] == 'y')
+        self.assertEqual(results[0][0].dtype, x0.dtype)
+        self.assertTrue(np.array_equal(results[0][0], x0))
+        self.assertEqual(results[0][1], [1, 2])
+        self.assertEqual(results[1][0].dtype, x1.dtype)
+        self.assertTrue(np.array_equal(results[1][0], x1))
+        self.assertTrue(man.spawn_nbytes[0] > x0.nbytes)
+
+    def test_process_pool(self):
+        pool = ProcessPool(2)
+        pids = []
+        for n in [2, 1, 2]:
+            man = ProcessManager(pool)
+            for i in xrange(n):
+                man.add(MyPidProc)
+            man.spawn()
+            pids.append(dict([man.recv() for i in xrange(n)]))
+        pool.close()
+        self.assertEqual(pool.runs, 3)
+        self.assertEqual(pids[0], pids[2])
+        self.assertEqual(pids[1], {0: pids[0][0]})
+        self.assertTrue(man.spawn_nbytes[0] > 0)
+
 if __name__ == '__main__':
     main()
@@ -1,14 +1,19 @@
 #!/usr/bin/env python
 
+import os
+import pickle
+import tempfile
 from unittest import main, TestCase
 
 import numpy as np
 import pandas as pd
 import networkx as nx
+from numpy.testing import assert_array_equal
 from pandas.util.testing import assert_frame_equal, assert_index_equal, \
     assert_series_equal
 
-from neurokernel.pattern import Interface, Pattern, are_compatible
+from neurokernel.pattern import Interface, Pattern, StructuredPattern, \
+    are_compatible
 
 class test_interface(TestCase):
     def setUp(self):
@@ -122,6 +127,15 @@ class test_interface(TestCase):
         self.assertItemsEqual(i.get_common_ports(0, j, 0, 'spike'),
                               [('foo', 3), ('foo', 4)])
 
+    def test_get_rows(self):
+        i = Interface('/foo[0:3],/bar[0:2]')
+        assert_array_equal(i.get_rows('/bar[1],/foo[0],/baz[0]'), [4, 0, -1])
+        assert_array_equal(i.get_rows('/foo[0]/qux'), [-1])
+        assert_array_equal(i.get_rows(''), [])
+
+        i = Interface('/foo,/bar')
+        assert_array_equal(i.get_rows('/bar,/foo'), [1, 0])
+
     def test_to_selectors(self):
         # Selector with multiple levels:
         i = Interface('/foo[0:4]')
@@ -580,6 +594,41 @@ class test_interface(TestCase):
         assert i.is_compatible(0, j, 1, True)
         assert i.is_compatible(0, k, 1, True) == False
 
+    def test_port_class_cache(self):
+        i = Interface('/foo[0:4]')
+        i['/foo[0:2]'] = [0, 'in', 'gpot']
+        i['/foo[2:4]'] = [1, 'out', 'spike']
+        self.assertSequenceEqual(i.in_ports(tuples=True), [('foo', 0), ('foo', 1)])
+        assert i.interface_ids == {0, 1}
+
+        # Modifying port attributes must be reflected in subsequent queries:
+        i['/foo[1]', 'io'] = 'out'
+        self.assertSequenceEqual(i.in_ports(tuples=True), [('foo', 0)])
+        self.assertSequenceEqual(i.out_ports(1, tuples=True),
+                                 [('foo', 2), ('foo', 3)])
+
+        # Reordering the ports must also be reflected:
+        i.data.sort_index(ascending=False, inplace=True)
+        self.assertSequenceEqual(i.spike_ports(tuples=True),
+                                 [('foo', 3), ('foo', 2)])
+        assert_frame_equal(i.gpot_ports(0).data, i.data.ix[[('foo', 1), ('foo', 0)]])
+
+    def test_is_compatible_unequal_levels(self):
+        df_i = pd.DataFrame([[0, 'out', 'gpot'], [0, 'in', 'spike']],
+                            index=pd.MultiIndex.from_tuples([('foo', 0, ''),
+                                                             ('foo', 1, 'x')]),
+                            columns=['interface', 'io', 'type'], dtype=object)
+        df_j = pd.DataFrame([[1, 'in', 'gpot'], [1, 'out', 'spike']],
+                            index=pd.MultiIndex.from_tuples([('foo', 0),
+                                                             ('foo', 1)]),
+                            columns=['interface', 'io', 'type'], dtype=object)
+        i = Interface.from_df(df_i)
+        j = Interface.from_df(df_j)
+        assert i.is_compatible(0, j, 1, True)
+        assert not i.is_compatible(0, j, 1)
+        self.assertItemsEqual(i.get_common_ports(0, j, 1), [('foo', 0)])
+        self.assertItemsEqual(j.get_common_ports(1, i, 0, 'gpot'), [('foo', 0)])
+
     def test_are_compatible(self):
         assert are_compatible('/foo[2:4]', '/foo[0:2]', '/foo[2:4]', '/foo[0:2]',
                               '/foo[0:2]', '/foo[2:4]', '/foo[2:4]', '/foo[0:2]')
@@ -597,6 +646,22 @@ class test_interface(TestCase):
         assert i.which_int('/foo[0:2]') == {0}
         assert i.which_int('/foo[0:4]') == {0, 1}
 
+    def test_save_load(self):
+        i = Interface('/foo[0:4],/bar[0:2]')
+        i['/foo[0:2]', 'interface', 'io', 'type'] = [0, 'in', 'spike']
+        i['/foo[2:4]', 'interface', 'io'] = [1, 'out']
+        f, file_name = tempfile.mkstemp()
+        os.close(f)
+        try:
+            i.save(file_name)
+            for mmap in [True, False]:
+                j = Interface.load(file_name, mmap)
+                assert_frame_equal(i.data, j.data)
+                assert j.num_levels == i.num_levels
+                assert_frame_equal(i.in_ports(0).data, j.in_ports(0).data)
+        finally:
+            os.remove(file_name)
+
 class test_pattern(TestCase):
     def setUp(self):
         self.df_p = pd.DataFrame(data={'conn': np.ones(6, dtype='object'),
@@ -1229,5 +1294,133 @@ class test_pattern(TestCase):
                           dtype=object)
         assert_frame_equal(p[[('aaa', 0)], [('bbb', 0)]], df)
 
+    def test_from_graph_to_graph(self):
+        g = nx.DiGraph()
+        g.add_node('/x/a0[0]', interface=2, type='spike')
+        g.add_node('/x/a0/1', interface=2, type='gpot')
+        g.add_node('/y/b[0]', interface=5, type='spike')
+        g.add_node('/y/b[1]', interface=5, type='gpot')
+        g.add_edge('/x/a0[0]', '/y/b[0]')
+        g.add_edge('/y/b[1]', '/x/a0/1')
+        p = Pattern.from_graph(g)
+        self.assertItemsEqual(p.connected_port_pairs(),
+                              [(('x', 'a0', 0), ('y', 'b', 0)),
+                               (('y', 'b', 1), ('x', 'a0', 1))])
+        assert p.interface_ids == {0, 1}
+        self.assertItemsEqual(p.spike_ports(0, True), [('x', 'a0', 0)])
+        self.assertItemsEqual(p.in_ports(1, True), [('y', 'b', 1)])
+
+        h = p.to_graph()
+        self.assertItemsEqual(h.edges(), [('/x/a0/0', '/y/b/0'),
+                                          ('/y/b/1', '/x/a0/1')])
+        q = Pattern.from_graph(h)
+        assert_frame_equal(p.data, q.data)
+        assert_frame_equal(p.interface.data, q.interface.data)
+
+        g.add_edge('/y/b[0]', '/x/a0/1')
+        self.assertRaises(ValueError, Pattern.from_graph, g)
+
+    def test_save_load(self):
+        p = Pattern('/foo[0:5]', '/bar[0:5]', columns=['conn', 'syn'])
+        p['/foo[0]', '/bar[0]', 'conn', 'syn'] = [1, 'exc']
+        p['/foo[1]', '/bar[1]', 'conn', 'syn'] = [1, 'inh']
+        p['/bar[3]', '/foo[2]', 'conn'] = 1
+        p.interface['/foo[0:2]', 'type'] = 'spike'
+        p.interface['/bar[0:2]', 'type'] = 'spike'
+        f, file_name = tempfile.mkstemp()
+        os.close(f)
+        try:
+            p.save(file_name)
+            for mmap in [True, False]:
+                q = Pattern.load(file_name, mmap)
+                assert_frame_equal(p.data, q.data)
+                assert_frame_equal(p.interface.data, q.interface.data)
+                assert q.is_connected(0, 1)
+                self.assertItemsEqual(q.src_idx(0, 1), [('foo', 0), ('foo', 1)])
+            self.assertRaises(ValueError, Interface.load, file_name)
+        finally:
+            os.remove(file_name)
+
+class test_structured_pattern(TestCase):
+    def test_one_to_one(self):
+        p = StructuredPattern.one_to_one('/foo[0:4]', '/bar[0:4]',
+                                         from_sel='/foo[0:4]', to_sel='/bar[0:4]',
+                                         gpot_sel='/foo[0:2],/bar[0:2]',
+                                         spike_sel='/foo[2:4],/bar[2:4]')
+        q = Pattern.from_concat('/foo[0:4]', '/bar[0:4]',
+                                from_sel='/foo[0:4]', to_sel='/bar[0:4]',
+                                gpot_sel='/foo[0:2],/bar[0:2]',
+                                spike_sel='/foo[2:4],/bar[2:4]', data=1)
+        assert len(p) == 4
+        assert_frame_equal(p.interface.data, q.interface.data)
+        assert_frame_equal(p.materialize().data, q.data)
+        assert p.is_connected(0, 1) and not p.is_connected(1, 0)
+        for t in ['gpot', 'spike']:
+            self.assertSequenceEqual(p.src_idx(0, 1, t, t), q.src_idx(0, 1, t, t))
+            self.assertSequenceEqual(p.dest_idx(0, 1, t, t), q.dest_idx(0, 1, t, t))
+        self.assertSequenceEqual(p.src_idx(0, 1, dest_ports='/bar[1:3]'),
+                                 [('foo', 1), ('foo', 2)])
+        self.assertSequenceEqual(p.dest_idx(1, 0), [])
+
+    def test_sels(self):
+        p = StructuredPattern.one_to_one('/foo[0:4]', '/bar[0:4]')
+        assert len(p) == 0 and not p.is_connected(0, 1)
+        self.assertRaises(ValueError, StructuredPattern.one_to_one,
+                          '/foo[0:4]', '/bar[0:4]', from_sel='/foo[0:4]')
+        self.assertRaises(ValueError, StructuredPattern.one_to_one,
+                          '/foo[0:4]', '/bar[0:4]', to_sel='/bar[0:4]')
+
+    def test_all_to_all(self):
+        p = StructuredPattern.all_to_all('/foo[0]', '/bar[0:3]',
+                                         from_sel='/foo[0]', to_sel='/bar[0:3]')
+        assert len(p) == 3
+        self.assertSequenceEqual(p.src_idx(0, 1, duplicates=True), [('foo', 0)]*3)
+        self.assertSequenceEqual(p.src_idx(0, 1), [('foo', 0)])
+        self.assertSequenceEqual(p.dest_idx(0, 1),
+                                 [('bar', 0), ('bar', 1), ('bar', 2)])
+
+        # Fan-in connections are permitted within product blocks:
+        p = StructuredPattern.all_to_all('/foo[0:2]', '/bar[0:3]',
+                                         from_sel='/foo[0:2]', to_sel='/bar[0:3]')
+        q = Pattern.from_product('/foo[0:2]', '/bar[0:3]',
+                                 from_sel='/foo[0:2]', to_sel='/bar[0:3]',
+                                 data=1, validate=False)
+        assert len(p) == 6
+        self.assertItemsEqual(p.materialize().connected_port_pairs(),
+                              q.connected_port_pairs())
+        self.assertSequenceEqual(p.src_idx(0, 1), [('foo', 0), ('foo', 1)])
+
+    def test_block_diagonal(self):
+        p = StructuredPattern.block_diagonal('/foo[0:2]', '/bar[0:3]',
+                                             from_sel='/foo[0:2]',
+                                             to_sel='/bar[0:3]',
+                                             blocks=[(1, 1), (1, 2)])
+        self.assertItemsEqual(p.materialize().connected_port_pairs(),
+                              [(('foo', 0), ('bar', 0)),
+                               (('foo', 1), ('bar', 1)),
+                               (('foo', 1), ('bar', 2))])
+        self.assertSequenceEqual(p.src_idx(0, 1, duplicates=True),
+                                 [('foo', 0), ('foo', 1), ('foo', 1)])
+
+    def test_strided(self):
+        p = StructuredPattern.strided('/foo[0:6]', '/bar[0:6]',
+                                      from_sel='/foo[0:6]', to_sel='/bar[0:6]',
+                                      from_start=1, from_step=2, to_step=3)
+        self.assertItemsEqual(p.materialize().connected_port_pairs(),
+                              [(('foo', 1), ('bar', 0)),
+                               (('foo', 3), ('bar', 3))])
+
+    def test_lazy_data(self):
+        p = StructuredPattern.one_to_one('/foo[0:4]', '/bar[0:4]',
+                                         from_sel='/foo[0:4]', to_sel='/bar[0:4]')
+        assert p._data is None
+        assert len(p.data) == 4
+        q = pickle.loads(pickle.dumps(p))
+        assert q._data is None
+        self.assertSequenceEqual(q.dest_idx(0, 1), p.dest_idx(0, 1))
+        self.assertRaises(TypeError, p.__setitem__,
+                          ('/foo[0]', '/bar[1]'), 1)
+        self.assertRaises(TypeError, p.clear)
+
 if __name__ == '__main__':
     main()
@@ -175,6 +175,18 @@ class test_port_mapper(TestCase):
         assert_array_equal(pm2.data, pm1.data)
         assert_series_equal(pm2.portmap, pm1.portmap)
 
+    def test_from_index(self):
+        data = np.random.rand(5)
+        pm0 = PortMapper('/foo[0:5]', data)
+        pm1 = PortMapper.from_index(pm0.index, data)
+        assert pm0.equals(pm1)
+
+        # Ensure that the data is only shared when no copy is made:
+        pm1 = PortMapper.from_index(pm0.index, data, make_copy=False)
+        data[0] = 2.0
+        assert pm1.data[0] == 2.0
+        assert pm0.data[0] != 2.0
+
     def test_copy(self):
         # Ensure that modifying pm0 doesn't modify any other mapper created from it:
         data = np.random.rand(5)
@@ -295,5 +307,16 @@ class test_port_mapper(TestCase):
         pm.set_by_inds([0, 1], new_data)
         assert_array_equal(new_data, pm.get_by_inds([0, 1]))
 
+    def test_2d(self):
+        data = np.random.rand(3, 4)
+        pm = PortMapper('/foo[0:3]', data)
+        assert_array_equal(data[[0, 2]], pm['/foo[0,2]'])
+        pm['/foo[1]'] = np.arange(4)
+        assert_array_equal(np.arange(4), pm.data[1])
+        pm['/foo[0:2]'] = 1.0
+        assert_array_equal(np.ones((2, 4)), pm.get_by_inds([0, 1]))
+        self.assertRaises(ValueError, PortMapper, '/foo[0:3]',
+                          np.zeros((3, 4, 2)))
+
 if __name__ == '__main__':
     main()
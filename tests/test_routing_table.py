@@ -70,5 +70,20 @@ class test_routingtable(TestCase):
         assert set(s.ids) == set(['a', 'b', 'c'])
         assert set(s.connections) == set([('a', 'b'), ('b', 'c')])
 
+    def test_neighborhood(self):
+        t = RoutingTable()
+        t['a', 'b'] = 1
+        t['b', 'c'] = 1
+        t['c', 'd'] = 1
+        t['d', 'b'] = 1
+        s = t.neighborhood('b')
+        assert set(s.ids) == set(['a', 'b', 'c', 'd'])
+        assert set(s.connections) == set([('a', 'b'), ('b', 'c'), ('d', 'b')])
+
+        # Modifying the subtable's connection data must not modify the table:
+        s.data.edge['a']['b']['data'] = 2
+        assert t['a', 'b'] == 1
+        assert t.neighborhood('e').ids == []
+
 if __name__ == '__main__':
     main()
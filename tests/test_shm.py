@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+import os
+import uuid
+from unittest import main, TestCase
+
+import numpy as np
+
+import neurokernel.tools.shm as shm
+from neurokernel.tools.shm import SharedLink, supported, wait_until
+
+class test_shared_link(TestCase):
+    def setUp(self):
+        self.name = 'neurokernel-test-%s' % uuid.uuid4().hex
+        self.dtypes = [np.double, np.int32]
+        self.shapes = [3, (5, 2)]
+
+    def tearDown(self):
+        if os.path.exists(os.path.join('/dev/shm', self.name)):
+            os.remove(os.path.join('/dev/shm', self.name))
+
+    def test_transmit(self):
+        prod = SharedLink(self.name, self.dtypes, self.shapes, create=True)
+        cons = SharedLink(self.name, self.dtypes, self.shapes)
+        for n in xrange(1, 5):
+            slot = prod.acquire_write(n, 0)
+            slot[0][:] = np.arange(3)*n
+            slot[1][:] = np.arange(10).reshape(5, 2)+n
+            prod.publish(n)
+            self.assertEqual(cons.seq, n)
+            slot = cons.acquire_read(n, 0)
+            self.assertEqual(slot[0].dtype, np.double)
+            self.assertEqual(slot[1].dtype, np.int32)
+            self.assertTrue(np.array_equal(slot[0], np.arange(3)*n))
+            self.assertTrue(np.array_equal(slot[1],
+                                           np.arange(10).reshape(5, 2)+n))
+            cons.release(n)
+            self.assertEqual(prod.released, n)
+        prod.close()
+        cons.close()
+        self.assertFalse(os.path.exists(os.path.join('/dev/shm', self.name)))
+
+    def test_double_buffering(self):
+        prod = SharedLink(self.name, self.dtypes, self.shapes, create=True)
+        cons = SharedLink(self.name, self.dtypes, self.shapes)
+
+        # The producer may run one step ahead of the consumer:
+        for n in [1, 2]:
+            self.assertIsNotNone(prod.acquire_write(n, 0))
+            prod.publish(n)
+        self.assertIsNone(prod.acquire_write(3, 0.01))
+        self.assertIsNone(cons.acquire_read(3, 0.01))
+        self.assertIsNotNone(cons.acquire_read(1, 0))
+        cons.release(1)
+        self.assertIsNotNone(prod.acquire_write(3, 0))
+
+        # The file must be left for the consumer to remove if it contains
+        # unread data:
+        prod.close()
+        self.assertTrue(os.path.exists(os.path.join('/dev/shm', self.name)))
+        self.assertIsNotNone(cons.acquire_read(2, 0))
+        cons.release(2)
+        cons.close()
+        self.assertFalse(os.path.exists(os.path.join('/dev/shm', self.name)))
+
+    def test_attach(self):
+
+        # The consumer only attaches to the segment after the producer has
+        # created it:
+        cons = SharedLink(self.name, self.dtypes, self.shapes)
+        self.assertIsNone(cons.acquire_read(1, 0.01))
+        prod = SharedLink(self.name, self.dtypes, self.shapes, create=True)
+        self.assertEqual(cons.seq, 0)
+        self.assertIsNotNone(prod.acquire_write(1, 0))
+        prod.publish(1)
+        self.assertIsNotNone(cons.acquire_read(1, 0))
+        cons.release(1)
+        prod.close()
+        cons.close()
+        self.assertFalse(os.path.exists(os.path.join('/dev/shm', self.name)))
+
+    def test_stale(self):
+
+        # Segments left over by previous runs must not be reused:
+        prod = SharedLink(self.name, self.dtypes, self.shapes, create=True)
+        prod.acquire_write(1, 0)
+        prod.publish(1)
+        self.assertRaises(OSError, SharedLink, self.name, self.dtypes,
+                          self.shapes, create=True)
+
+        # A consumer does not attach to a segment whose initialization is
+        # incomplete:
+        os.remove(os.path.join('/dev/shm', self.name))
+        with open(os.path.join('/dev/shm', self.name), 'wb') as f:
+            f.write('\0'*prod.nbytes)
+        cons = SharedLink(self.name, self.dtypes, self.shapes)
+        self.assertIsNone(cons.acquire_read(1, 0.01))
+
+    def test_supported(self):
+        machine = shm.platform.machine
+        shm.platform.machine = lambda: 'aarch64'
+        try:
+            self.assertFalse(supported())
+            self.assertRaises(RuntimeError, SharedLink, self.name, self.dtypes,
+                              self.shapes, create=True)
+        finally:
+            shm.platform.machine = machine
+        self.assertFalse(os.path.exists(os.path.join('/dev/shm', self.name)))
+
+    def test_wait_until(self):
+        x = []
+        self.assertTrue(wait_until(lambda: True))
+        self.assertFalse(wait_until(lambda: False, 0.01, spins=10))
+        self.assertTrue(wait_until(lambda: x.append(0) or len(x) > 20,
+                                   spins=10))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+import json
+import os
+import tempfile
+from unittest import main, TestCase
+
+import numpy as np
+
+from neurokernel.tools.timing import LogHistogram, Tracer, write_chrome_trace
+
+class test_log_histogram(TestCase):
+    def test_add(self):
+        h = LogHistogram()
+        h.add([1e-3, 2e-3, 1e-9, 1e5])
+        self.assertEqual(h.count, 4)
+        self.assertEqual(h.counts.sum(), 4)
+        self.assertEqual(h.counts[0], 1)
+        self.assertEqual(h.counts[-1], 1)
+        self.assertEqual(h.min, 1e-9)
+        self.assertEqual(h.max, 1e5)
+        self.assertAlmostEqual(h.mean, (1e-3+2e-3+1e-9+1e5)/4)
+
+    def test_percentile(self):
+        h = LogHistogram(sub_buckets=32)
+        x = np.random.uniform(1e-4, 1e-2, 10000)
+        h.add(x)
+        for q in [50, 90, 99]:
+            p = h.percentile(q)
+            self.assertTrue(abs(p-np.percentile(x, q))/np.percentile(x, q) <
+                            2**(1.0/32))
+        self.assertEqual(len(h.percentile([50, 90])), 2)
+        self.assertTrue(np.isnan(LogHistogram().percentile(50)))
+
+    def test_merge(self):
+        h0 = LogHistogram()
+        h0.add([1e-3, 2e-3])
+        h1 = LogHistogram()
+        h1.add([3e-3])
+        h0.merge(h1)
+        self.assertEqual(h0.count, 3)
+        self.assertEqual(h0.max, 3e-3)
+        self.assertRaises(ValueError, h0.merge, LogHistogram(sub_buckets=8))
+
+    def test_summary(self):
+        h = LogHistogram()
+        h.add([1e-3]*10)
+        s = h.summary([50])
+        self.assertEqual(s['count'], 10)
+        self.assertAlmostEqual(s['p50'], 1e-3)
+
+class test_tracer(TestCase):
+    def test_write_chrome_trace(self):
+        t0 = Tracer(0, 'm0')
+        t0.add('run_step', 'compute', 1.0, 1.5, 0)
+        t1 = Tracer(1)
+        t1.add('recv m0', 'recv', 1.25, 2.0)
+        f, file_name = tempfile.mkstemp()
+        os.close(f)
+        write_chrome_trace([t0, t1], file_name)
+        with open(file_name, 'r') as f:
+            trace = json.load(f)
+        os.remove(file_name)
+        events = trace['traceEvents']
+        self.assertEqual(len(events), 3)
+        self.assertEqual(events[0], {'name': 'process_name', 'ph': 'M',
+                                     'pid': 0, 'tid': 0,
+                                     'args': {'name': 'm0'}})
+        self.assertEqual(events[1]['ph'], 'X')
+        self.assertAlmostEqual(events[1]['ts'], 1e6)
+        self.assertAlmostEqual(events[1]['dur'], 5e5)
+        self.assertEqual(events[1]['args'], {'step': 0})
+        self.assertEqual(events[2]['pid'], 1)
+        self.assertNotIn('args', events[2])
+
+if __name__ == '__main__':
+    main()